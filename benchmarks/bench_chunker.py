@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+章节切块基准测试：对比旧版 split_text_into_chunks（re.split 全量列表 + 字符串拼接）
+与生成器版 iter_chunk_spans / iter_chunks 的耗时与峰值内存。
+
+用法:
+  python benchmarks/bench_chunker.py            # 1/2/5/10 MB 合成章节
+  python benchmarks/bench_chunker.py --sizes 10 20 --max-size 8000
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from gui.core.pipeline import iter_chunk_spans, iter_chunks  # noqa: E402
+
+
+def legacy_split_text_into_chunks(text, max_size=8000):
+    """旧实现（原 txt2json_openrouter.py），作为对照。"""
+    sentences = re.split(r'([。！？!?\n]+)', text)
+    chunks = []
+    current_chunk = ""
+    for i in range(0, len(sentences), 2):
+        sentence_text = sentences[i]
+        punctuation = sentences[i+1] if i+1 < len(sentences) else ""
+        full_sentence = sentence_text + punctuation
+        if len(current_chunk) + len(full_sentence) > max_size:
+            if current_chunk:
+                chunks.append(current_chunk)
+            current_chunk = full_sentence
+        else:
+            current_chunk += full_sentence
+    if current_chunk:
+        chunks.append(current_chunk)
+    return chunks
+
+
+def make_chapter(size_mb, seed=0):
+    """生成约 size_mb MB（UTF-8）的合成中文章节。"""
+    rng = random.Random(seed)
+    words = ["他说", "夜色如墨", "冷雨敲打着窗棂", "房间里", "唯一的光源", "来自桌上", "那盏昏黄的台灯", "她笑了"]
+    ends = ["。", "！", "？", "。\n", "……\n\n", "，"]
+    target_chars = int(size_mb * 1024 * 1024 / 3)
+    parts = []
+    n = 0
+    while n < target_chars:
+        piece = rng.choice(words) + rng.choice(ends)
+        parts.append(piece)
+        n += len(piece)
+    return "".join(parts)
+
+
+def measure(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    n_chunks = fn()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, n_chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="章节切块基准测试")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 2, 5, 10], help="章节大小（MB）")
+    parser.add_argument("--max-size", type=int, default=8000, help="每块最大字符数")
+    args = parser.parse_args()
+
+    print(f"{'大小(MB)':>8} {'实现':<12} {'耗时(s)':>8} {'s/MB':>7} {'峰值内存(MB)':>12} {'块数':>6}")
+    for size in args.sizes:
+        text = make_chapter(size)
+        runs = {
+            "legacy": lambda: len(legacy_split_text_into_chunks(text, args.max_size)),
+            "iter_spans": lambda: sum(1 for _ in iter_chunk_spans(text, args.max_size)),
+            "iter_chunks": lambda: sum(1 for _ in iter_chunks(text, args.max_size)),
+        }
+        for name, fn in runs.items():
+            elapsed, peak, n_chunks = measure(fn)
+            print(f"{size:>8g} {name:<12} {elapsed:>8.3f} {elapsed / size:>7.3f} {peak / 1e6:>12.2f} {n_chunks:>6}")
+
+
+if __name__ == "__main__":
+    main()
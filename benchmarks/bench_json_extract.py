@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+JSON 提取基准测试：对比旧版正则兜底（re.search(r"(\\[.*\\])", re.S) + json.loads）
+与线性扫描版 extract_json_from_response（括号/字符串感知 + raw_decode）的耗时。
+
+用法:
+  python benchmarks/bench_json_extract.py                  # 合成的大响应（几百 KB）
+  python benchmarks/bench_json_extract.py --entries 5000 --repeat 5
+  python benchmarks/bench_json_extract.py --files responses/*.txt   # 录制的真实响应
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from gui.core.pipeline import extract_json_from_response  # noqa: E402
+
+
+def legacy_extract_json_from_response(content):
+    """旧实现，作为对照。"""
+    try:
+        return json.loads(content)
+    except Exception:
+        pass
+    m = re.search(r"(\[.*\])", content, flags=re.S)
+    if m:
+        try:
+            return json.loads(m.group(1))
+        except Exception:
+            pass
+    return None
+
+
+def make_entries(n, seed=0):
+    """生成 n 条合成条目，content 中混有零散的括号。"""
+    rng = random.Random(seed)
+    words = ["他说", "夜色如墨", "冷雨敲打着窗棂", "[注]", "她笑了", "（括号）", "]", "["]
+    entries = []
+    for _ in range(n):
+        content = "".join(rng.choice(words) for _ in range(rng.randint(5, 15))) + "。"
+        entries.append({
+            "speaker": rng.choice(["旁白", "张三", "李四"]),
+            "content": content,
+            "emo_vector": [0.0] * 8,
+            "delay": rng.randint(300, 1200),
+        })
+    return entries
+
+
+def make_cases(n_entries):
+    """几类典型的大响应：名称 -> 文本。"""
+    body = json.dumps(make_entries(n_entries), ensure_ascii=False, indent=2)
+    prose = "以下是转换结果，其中[注]为译注，[1] 为出处：\n"
+    return {
+        "clean": body,
+        "fenced": "```json\n" + body + "\n```",
+        "prose+junk": prose + body + "\n以上共 ] 条，如需调整请告诉我 [完]",
+        "truncated": "```json\n" + body[: len(body) * 2 // 3],
+        "no_array": "抱歉，无法处理。" + "[未闭合的括号 " * (n_entries * 4),
+    }
+
+
+def measure(fn, text, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def describe(result):
+    if result is None:
+        return "None"
+    if isinstance(result, list):
+        return f"{len(result)} 条"
+    return type(result).__name__
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON 提取基准测试")
+    parser.add_argument("--entries", type=int, default=3000, help="合成响应的条目数")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数（取最快一次）")
+    parser.add_argument("--files", nargs="*", help="录制的响应文件，替代合成数据")
+    args = parser.parse_args()
+
+    if args.files:
+        cases = {Path(f).name: Path(f).read_text(encoding="utf-8") for f in args.files}
+    else:
+        cases = make_cases(args.entries)
+
+    print(f"{'响应':<14} {'大小(KB)':>9} {'实现':<8} {'耗时(ms)':>10} {'结果':>10}")
+    for name, text in cases.items():
+        size_kb = len(text.encode("utf-8")) / 1024
+        for impl, fn in (("legacy", legacy_extract_json_from_response), ("linear", extract_json_from_response)):
+            elapsed, result = measure(fn, text, args.repeat)
+            print(f"{name:<14} {size_kb:>9.0f} {impl:<8} {elapsed * 1000:>10.2f} {describe(result):>10}")
+
+
+if __name__ == "__main__":
+    main()
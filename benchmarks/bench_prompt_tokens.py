@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+提示协议 token 基准测试：对比标准协议（完整 SPEC_PROMPT 作为固定系统消息，输出缩进 JSON）
+与紧凑协议（精简规范作为固定系统消息，输出 "编号|停顿|情感|文本" 行）的输入/输出 token。
+两种协议的系统消息都逐字节不变，首个请求之后计为可命中服务商前缀缓存的 token。
+
+不调用任何 API：按句子与引号把样本章节切成与模型输出相当的条目，
+分别编码成两种协议的回复，再用服务商的 token 估算器计数。
+
+用法:
+  python benchmarks/bench_prompt_tokens.py                       # 仓库自带的 人性的弱点.txt
+  python benchmarks/bench_prompt_tokens.py --files 章节1.txt 章节2.txt --chunk-size 4000
+  python benchmarks/bench_prompt_tokens.py --provider qwen --max-chars 100000
+"""
+
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from gui.core.compact_protocol import (  # noqa: E402
+    COMPACT_SPEC_PROMPT,
+    build_compact_messages,
+    encode_compact,
+)
+from gui.core.pipeline import SPEC_PROMPT, iter_chunks  # noqa: E402
+from gui.core.postprocess import split_content  # noqa: E402
+from gui.core.tokens import get_token_estimator  # noqa: E402
+
+# 标准协议每条消息的额外开销（role 等），两种协议都计入
+_MESSAGE_OVERHEAD = 4
+
+_DIALOGUE = re.compile(r"(“[^”]*”|「[^」]*」)")
+_SENTENCE = re.compile(r"[^。！？\n]*(?:[。！？]+|\n|$)")
+
+
+def standard_messages(chunk_text):
+    """GUI 与 txt2json_openrouter.py 的标准协议消息。"""
+    return [
+        {
+            "role": "system",
+            "content": (
+                "你是一个严格的格式化器。\n"
+                "根据下述【规范】将用户提供的【小说片段】转换为 index-tts v2 有声书 JSON。\n"
+                "注意：每个片段只是小说的一小部分，请只处理这段文字，不要编造开头或结尾，直接输出 JSON 数组。\n\n"
+                "【规范】如下：\n" + SPEC_PROMPT
+            ),
+        },
+        {"role": "user", "content": f"【小说片段】如下：\n'''\n{chunk_text}\n'''\n\n请直接输出 JSON 数组："},
+    ]
+
+
+def make_entries(chunk_text):
+    """模拟模型输出：引号内为角色对白（带轻微情感），其余为旁白；同一说话者的连续文字合并。"""
+    merged = []
+    for k, part in enumerate(_DIALOGUE.split(chunk_text)):
+        text = part.strip()
+        if not text:
+            continue
+        if k % 2:
+            speaker, vector, delay = "角色", [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.1], 900
+        else:
+            speaker, vector, delay = "旁白", [0.0] * 8, 600
+        if merged and merged[-1]["speaker"] == speaker:
+            merged[-1]["content"] += text
+        else:
+            merged.append({"speaker": speaker, "content": text, "emo_vector": vector, "delay": delay})
+    return merged
+
+
+def split_entries(entries, max_len=80):
+    """标准协议要求模型自己把长段落拆成 80 字以内。"""
+    result = []
+    for entry in entries:
+        for piece in split_content(entry["content"], max_len):
+            result.append(dict(entry, content=piece))
+    return result
+
+
+def measure(text, chunk_size, estimator):
+    totals = {
+        "standard": {"input": 0, "output": 0, "cached": 0, "entries": 0},
+        "compact": {"input": 0, "output": 0, "cached": 0, "entries": 0},
+    }
+    system_tokens = {
+        "standard": estimator.count(standard_messages("")[0]["content"]) + _MESSAGE_OVERHEAD,
+        "compact": estimator.count(COMPACT_SPEC_PROMPT) + _MESSAGE_OVERHEAD,
+    }
+    requests = {"standard": standard_messages, "compact": build_compact_messages}
+    n_chunks = 0
+    for chunk in iter_chunks(text, chunk_size):
+        if not chunk.strip():
+            continue
+        n_chunks += 1
+        entries = make_entries(chunk)
+
+        std_entries = split_entries(entries)
+        outputs = {
+            "standard": (json.dumps(std_entries, ensure_ascii=False, indent=2), len(std_entries)),
+            "compact": (encode_compact(entries), len(entries)),
+        }
+        for name, t in totals.items():
+            for message in requests[name](chunk):
+                t["input"] += estimator.count(message["content"]) + _MESSAGE_OVERHEAD
+            text, n_entries = outputs[name]
+            t["output"] += estimator.count(text)
+            t["entries"] += n_entries
+            # 系统消息是固定前缀，首个请求之后可命中服务商的前缀缓存
+            if n_chunks > 1:
+                t["cached"] += system_tokens[name]
+    return n_chunks, totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="提示协议 token 基准测试")
+    parser.add_argument("--files", nargs="*", help="样本章节（默认使用仓库自带的 人性的弱点.txt）")
+    parser.add_argument("--chunk-size", type=int, default=8000, help="切块字符数")
+    parser.add_argument("--max-chars", type=int, default=0, help="每个文件最多取多少字符（0 表示全部）")
+    parser.add_argument("--provider", default="openrouter", help="使用哪个服务商的 token 估算器")
+    args = parser.parse_args()
+
+    files = [Path(f) for f in args.files] if args.files else [ROOT / "人性的弱点.txt"]
+    estimator = get_token_estimator(args.provider)
+
+    print(f"{'文件':<20} {'协议':<9} {'片段':>5} {'条目':>7} {'输入':>10} {'可缓存':>9} {'输出':>10} {'合计':>10}")
+    for path in files:
+        text = path.read_text(encoding="utf-8", errors="replace")
+        if args.max_chars:
+            text = text[:args.max_chars]
+        n_chunks, totals = measure(text, args.chunk_size, estimator)
+        base = totals["standard"]["input"] + totals["standard"]["output"]
+        for name, t in totals.items():
+            total = t["input"] + t["output"]
+            print(
+                f"{path.name[:20]:<20} {name:<9} {n_chunks:>5} {t['entries']:>7} "
+                f"{t['input']:>10} {t['cached']:>9} {t['output']:>10} {total:>10}"
+                + (f"  ({total / base:.0%})" if name == "compact" else "")
+            )
+
+
+if __name__ == "__main__":
+    main()
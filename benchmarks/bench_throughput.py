@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+端到端吞吐基准测试：在本地模拟服务（benchmarks/mock_llm_server.py）上驱动
+- worker：GUI 的 JsonGenWorker（需要 PyQt6）；
+- cli：txt2json_openrouter.py 的 main()；
+- speaker：GUI 的角色提取 / AI 分类 / 替换三步（需要 PyQt6），
+统计片段/秒、单片段 p50/p99 耗时（含重试）、请求数与重试数、注入的故障数和峰值内存。
+
+每个场景在独立子进程中运行，峰值内存（ru_maxrss）互不影响；模拟服务运行在本进程。
+不调用任何真实 API。
+
+用法:
+  python benchmarks/bench_throughput.py                                   # 全部场景
+  python benchmarks/bench_throughput.py --scenarios worker --chapters 40 --workers 128
+  python benchmarks/bench_throughput.py --error-rate 0.02 --throttle-rate 0.05 --malformed-rate 0.05
+  python benchmarks/bench_throughput.py --scenarios worker --streaming --compact
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mock_llm_server import add_server_arguments, make_entries, server_from_args  # noqa: E402
+
+SCENARIOS = ["worker", "cli", "speaker"]
+
+# Prefix of the result line the child process prints
+_RESULT_MARK = "@@result "
+
+
+def load_book(path, chapters, chapter_chars):
+    """把样本书切成 *chapters* 个约 *chapter_chars* 字的章节（不够时循环使用）。"""
+    text = path.read_text(encoding="utf-8", errors="replace")
+    text = "".join(line for line in text.splitlines(keepends=True) if line.strip())
+    while len(text) < chapters * chapter_chars:
+        text += text
+    return [
+        {"index": k + 1, "title": f"第{k + 1}章", "content": text[k * chapter_chars:(k + 1) * chapter_chars]}
+        for k in range(chapters)
+    ]
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def peak_rss_mb():
+    """本进程的峰值常驻内存（MB）；Windows 上不可用时返回 None。"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def timed(latencies, fn):
+    """包装一个处理单个片段的协程函数，记录每次调用的耗时（含其中的重试）。"""
+    async def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - t0)
+    return wrapper
+
+
+# ---------------------------------------------------------------------------
+# Scenarios (run in the child process)
+# ---------------------------------------------------------------------------
+
+def run_worker(args, chapters):
+    from gui.workers.json_gen_worker import JsonGenWorker
+
+    latencies = []
+    JsonGenWorker._process_chunk = timed(latencies, JsonGenWorker._process_chunk)
+    logs = []
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        worker = JsonGenWorker(
+            chapters=chapters,
+            selected_indices=[ch["index"] for ch in chapters],
+            provider="openrouter",
+            api_key="mock",
+            base_url=args.base_url,
+            model="mock",
+            max_workers=args.workers,
+            chunk_size=args.chunk_size,
+            use_cache=False,
+            journal_path=str(Path(tmp) / "journal.jsonl"),
+            resume=False,
+            streaming=args.streaming,
+            compact=args.compact,
+        )
+        worker.log_batch.connect(logs.extend)
+        worker.finished.connect(results.append)
+        worker.error.connect(logs.append)
+        t0 = time.perf_counter()
+        worker.run()
+        elapsed = time.perf_counter() - t0
+    retries = sum(1 for line in logs if "次API错误" in line or "次解析失败" in line or "重新请求剩余" in line)
+    failed = sum(1 for line in logs if "处理失败，已跳过" in line)
+    return {"chunks": len(latencies), "elapsed": elapsed, "latencies": latencies,
+            "retries": retries, "failed": failed}
+
+
+def run_cli(args, chapters):
+    with tempfile.TemporaryDirectory() as tmp:
+        chapters_dir = Path(tmp) / "chapters"
+        chapters_dir.mkdir()
+        for ch in chapters:
+            (chapters_dir / f"P{ch['index']:03d}_{ch['title']}.txt").write_text(ch["content"], encoding="utf-8")
+        # txt2json_openrouter.py 在导入时读取 config.py，这里换成指向模拟服务的配置
+        sys.modules["config"] = types.SimpleNamespace(
+            openrouter_api_key="mock",
+            openrouter_base_url=args.base_url,
+            openrouter_model="mock",
+            input_dir=str(chapters_dir),
+            max_workers=args.workers,
+            llm_cache=False,
+            compact_protocol=args.compact,
+        )
+        import txt2json_openrouter as cli
+
+        cli.MAX_CHUNK_SIZE = args.chunk_size
+        latencies = []
+        cli.process_chunk = timed(latencies, cli.process_chunk)
+        output = io.StringIO()
+        cwd = os.getcwd()
+        os.chdir(tmp)  # error_logs.txt 写在临时目录
+        try:
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(output):
+                asyncio.run(cli.main())
+            elapsed = time.perf_counter() - t0
+        finally:
+            os.chdir(cwd)
+    log = output.getvalue()
+    retries = log.count("次 API 调用出错") + log.count("次解析失败")
+    failed = log.count("处理彻底失败")
+    return {"chunks": len(latencies), "elapsed": elapsed, "latencies": latencies,
+            "retries": retries, "failed": failed}
+
+
+def run_speaker(args, chapters):
+    import random
+
+    from gui.workers.speaker_worker import (
+        SpeakerClassifyWorker,
+        SpeakerExtractWorker,
+        SpeakerReplaceWorker,
+    )
+
+    rng = random.Random(args.seed)
+    chapter_results = [
+        {"chapter_index": ch["index"], "entries": make_entries(ch["content"], rng)} for ch in chapters
+    ]
+    latencies = []
+    out = {}
+    t0 = time.perf_counter()
+
+    step = time.perf_counter()
+    extract = SpeakerExtractWorker(chapter_results)
+    extract.finished.connect(lambda speakers: out.update(speakers=speakers))
+    extract.run()
+    latencies.append(time.perf_counter() - step)
+
+    step = time.perf_counter()
+    names = [name for name, _ in out.get("speakers", [])]
+    classify = SpeakerClassifyWorker(names, "mock", args.base_url, "mock")
+    classify.finished.connect(lambda result: out.update(classifications=result))
+    classify.error.connect(lambda message: out.update(error=message))
+    classify.run()
+    latencies.append(time.perf_counter() - step)
+
+    step = time.perf_counter()
+    replace = SpeakerReplaceWorker(chapter_results, out.get("classifications", {}))
+    replace.run()
+    latencies.append(time.perf_counter() - step)
+
+    return {"chunks": len(chapters), "elapsed": time.perf_counter() - t0, "latencies": latencies,
+            "retries": 0, "failed": int("error" in out)}
+
+
+def run_scenario(args):
+    chapters = load_book(Path(args.book), args.chapters, args.chapter_chars)
+    runner = {"worker": run_worker, "cli": run_cli, "speaker": run_speaker}[args.run]
+    try:
+        result = runner(args, chapters)
+    except ImportError as e:
+        result = {"skipped": f"缺少依赖: {e.name}"}
+    result["peak_mb"] = peak_rss_mb()
+    print(_RESULT_MARK + json.dumps(result))
+
+
+# ---------------------------------------------------------------------------
+# Driver (parent process)
+# ---------------------------------------------------------------------------
+
+def child_command(args, scenario, base_url):
+    command = [
+        sys.executable, str(Path(__file__).resolve()), "--run", scenario, "--base-url", base_url,
+        "--book", args.book, "--chapters", str(args.chapters), "--chapter-chars", str(args.chapter_chars),
+        "--chunk-size", str(args.chunk_size), "--workers", str(args.workers), "--seed", str(args.seed),
+    ]
+    if args.streaming:
+        command.append("--streaming")
+    if args.compact:
+        command.append("--compact")
+    return command
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端吞吐基准测试（本地模拟服务）")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS, help="要运行的场景")
+    parser.add_argument("--book", default=str(ROOT / "人性的弱点.txt"), help="样本书（默认仓库自带的 人性的弱点.txt）")
+    parser.add_argument("--chapters", type=int, default=20, help="章节数")
+    parser.add_argument("--chapter-chars", type=int, default=20000, help="每章字数")
+    parser.add_argument("--chunk-size", type=int, default=4000, help="切块字符数")
+    parser.add_argument("--workers", type=int, default=64, help="并发请求数")
+    parser.add_argument("--streaming", action="store_true", help="worker 使用流式响应")
+    parser.add_argument("--compact", action="store_true", help="使用紧凑协议")
+    parser.add_argument("--run", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    args = add_server_arguments(parser).parse_args()
+
+    if args.run:
+        run_scenario(args)
+        return
+
+    server = server_from_args(args).start()
+    print(f"模拟服务: {server.url}  延迟中位数 {args.latency_ms:g}ms  并发 {args.workers}  "
+          f"{args.chapters} 章 x {args.chapter_chars} 字")
+    print(f"{'场景':<8} {'片段':>5} {'耗时(s)':>8} {'片段/秒':>8} {'p50(s)':>7} {'p99(s)':>7} "
+          f"{'请求':>5} {'重试':>5} {'失败':>4} {'注入故障':>8} {'峰值内存(MB)':>12}")
+    try:
+        for scenario in args.scenarios:
+            server.reset_stats()
+            proc = subprocess.run(
+                child_command(args, scenario, server.url), capture_output=True, text=True, encoding="utf-8",
+            )
+            lines = [line for line in proc.stdout.splitlines() if line.startswith(_RESULT_MARK)]
+            if not lines:
+                print(f"{scenario:<8} 运行失败:\n{proc.stderr[-2000:]}")
+                continue
+            result = json.loads(lines[-1][len(_RESULT_MARK):])
+            if "skipped" in result:
+                print(f"{scenario:<8} 跳过（{result['skipped']}）")
+                continue
+            stats = dict(server.stats)
+            injected = sum(v for k, v in stats.items() if k.startswith("injected_"))
+            latencies = result["latencies"]
+            peak = f"{result['peak_mb']:.1f}" if result["peak_mb"] is not None else "-"
+            print(
+                f"{scenario:<8} {result['chunks']:>5} {result['elapsed']:>8.2f} "
+                f"{result['chunks'] / result['elapsed']:>8.2f} {percentile(latencies, 0.5):>7.2f} "
+                f"{percentile(latencies, 0.99):>7.2f} {stats.get('requests', 0):>5} {result['retries']:>5} "
+                f"{result['failed']:>4} {injected:>8} {peak:>12}"
+            )
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
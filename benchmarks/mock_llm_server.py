@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+"""
+本地 OpenAI 兼容模拟服务：不花钱地压测生成流水线。
+
+POST .../chat/completions 按请求内容返回看起来合理的结果：
+- 小说片段（标准协议或紧凑协议）：按引号切出旁白与角色对白，生成对应的 JSON 数组或紧凑行；
+- 角色分类（build_classify_prompt）：把人物列表分到六个类别。
+
+可配置的延迟分布与故障注入：
+- 延迟 = 对数正态（中位数 --latency-ms，离散度 --latency-sigma）+ 每输出字符 --ms-per-char，
+  以 --tail-rate 的概率再乘以 --tail-factor（长尾）；
+- --error-rate 返回 500，--throttle-rate 返回 429（带 Retry-After），
+  --truncate-rate 截断输出（finish_reason=length），--malformed-rate 输出可修复的坏 JSON，
+  --drop-rate 漏掉片段中的一句话（触发覆盖校验补请求）；
+- 支持 stream=True（SSE，stream_options.include_usage 时最后附带 usage）；
+- usage 中按字符数估算 token，重复出现的系统消息计为前缀缓存命中。
+
+GET /stats 返回请求与故障计数。
+
+用法:
+  python benchmarks/mock_llm_server.py --port 8000
+  python benchmarks/mock_llm_server.py --latency-ms 2000 --tail-rate 0.02 --throttle-rate 0.05
+然后把 config.py 中的 openrouter_base_url 设为 http://127.0.0.1:8000/v1
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from gui.core.compact_protocol import encode_compact  # noqa: E402
+
+_CHUNK = re.compile(r"'''\n(.*)\n'''", re.S)
+_DIALOGUE = re.compile(r"(“[^”]*”|「[^」]*」|\"[^\"]*\")")
+_SENTENCE = re.compile(r"[^。！？]+[。！？]+")
+_CLASSIFY_MARK = "人物列表："
+_COMPACT_MARK = "@正文"
+_CATEGORIES = ["少男", "少女", "中男", "中女", "老男", "老女"]
+_SPEAKERS = ["林冲", "鲁智深", "林娘子", "高衙内", "王伦"]
+
+# Characters per streamed delta
+_STREAM_PIECE = 24
+
+
+def make_entries(chunk_text, rng):
+    """模拟模型输出：引号内为角色对白，其余为旁白；角色轮流出场，偶尔带情感。"""
+    entries = []
+    turn = 0
+    for k, part in enumerate(_DIALOGUE.split(chunk_text)):
+        text = part.strip()
+        if not text:
+            continue
+        if k % 2:
+            speaker = _SPEAKERS[turn % len(_SPEAKERS)]
+            turn += 1
+            vector = [0.0] * 8
+            if rng.random() < 0.4:
+                vector[rng.randrange(8)] = rng.choice([0.1, 0.2, 0.3])
+            entries.append({"speaker": speaker, "content": text, "emo_vector": vector,
+                            "delay": rng.choice([600, 900, 1200])})
+        else:
+            entries.append({"speaker": "旁白", "content": text, "emo_vector": [0.0] * 8,
+                            "delay": rng.choice([300, 500, 800])})
+    return entries
+
+
+def drop_sentence(chunk_text, rng):
+    """去掉片段中间的一句话，模拟模型漏写。"""
+    sentences = _SENTENCE.findall(chunk_text)
+    if len(sentences) < 5:
+        return chunk_text
+    victim = sentences[rng.randrange(1, len(sentences) - 1)]
+    return chunk_text.replace(victim, "", 1)
+
+
+def malform(body, rng):
+    """把合法 JSON 改成几类常见的可修复错误之一。"""
+    kind = rng.randrange(3)
+    if kind == 0 and "},\n" in body:
+        return body.replace("},\n", "}\n", 1)                  # 对象之间缺逗号
+    if kind == 1 and body.rstrip().endswith("]"):
+        return body.rstrip()[:-1].rstrip() + ",\n]"            # 尾随逗号
+    return "好的，以下是转换结果：\n```json\n" + body + "\n```"  # 代码块与前缀杂文
+
+
+def classify(names, rng):
+    result = {category: [] for category in _CATEGORIES}
+    for name in names:
+        result[rng.choice(_CATEGORIES)].append(name)
+    return result
+
+
+class MockLLMServer:
+    """在后台线程中运行的模拟服务，参数含义见模块说明。"""
+
+    def __init__(
+        self,
+        port=0,
+        latency_ms=800.0,
+        latency_sigma=0.3,
+        ms_per_char=0.2,
+        tail_rate=0.01,
+        tail_factor=8.0,
+        error_rate=0.0,
+        throttle_rate=0.0,
+        retry_after=1.0,
+        truncate_rate=0.0,
+        malformed_rate=0.0,
+        drop_rate=0.0,
+        seed=0,
+    ):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.ms_per_char = ms_per_char
+        self.tail_rate = tail_rate
+        self.tail_factor = tail_factor
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.truncate_rate = truncate_rate
+        self.malformed_rate = malformed_rate
+        self.drop_rate = drop_rate
+        self.stats = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._seen_prefixes = set()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats.clear()
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def _draw(self):
+        """一次请求的随机数：故障类型、延迟系数与专用的 Random。"""
+        with self._lock:
+            roll = self._rng.random()
+            noise = self._rng.gauss(0.0, 1.0)
+            tail = self._rng.random() < self.tail_rate
+            seed = self._rng.getrandbits(32)
+        fault = None
+        for name, rate in (
+            ("error", self.error_rate), ("throttle", self.throttle_rate),
+            ("truncate", self.truncate_rate), ("malformed", self.malformed_rate),
+            ("drop", self.drop_rate),
+        ):
+            if roll < rate:
+                fault = name
+                break
+            roll -= rate
+        factor = math.exp(self.latency_sigma * noise) * (self.tail_factor if tail else 1.0)
+        return fault, factor, random.Random(seed)
+
+    def _cached_tokens(self, messages):
+        if len(messages) < 2 or messages[0].get("role") != "system":
+            return 0
+        prefix = messages[0].get("content") or ""
+        with self._lock:
+            hit = prefix in self._seen_prefixes
+            self._seen_prefixes.add(prefix)
+        return len(prefix) if hit else 0
+
+    def respond(self, body):
+        """返回 (状态码, 额外响应头, 回复文本, finish_reason, usage, 延迟秒数)。"""
+        messages = body.get("messages") or []
+        prompt = (messages[-1].get("content") or "") if messages else ""
+        system = (messages[0].get("content") or "") if len(messages) > 1 else ""
+        fault, factor, rng = self._draw()
+        self._count("requests")
+
+        if fault == "error":
+            self._count("injected_error")
+            return 500, {}, None, None, None, 0.05 * factor
+        if fault == "throttle":
+            self._count("injected_throttle")
+            return 429, {"Retry-After": f"{self.retry_after:g}"}, None, None, None, 0.01
+
+        if _CLASSIFY_MARK in prompt:
+            self._count("classify")
+            names = [line[2:].strip() for line in prompt.split(_CLASSIFY_MARK, 1)[1].splitlines()
+                     if line.startswith("- ")]
+            text = json.dumps(classify(names, rng), ensure_ascii=False, indent=2)
+        else:
+            self._count("chunk")
+            m = _CHUNK.search(prompt)
+            chunk_text = m.group(1) if m else prompt
+            if fault == "drop":
+                self._count("injected_drop")
+                chunk_text = drop_sentence(chunk_text, rng)
+            entries = make_entries(chunk_text, rng)
+            if _COMPACT_MARK in system:
+                text = encode_compact(entries)
+            else:
+                text = json.dumps(entries, ensure_ascii=False, indent=2)
+                if fault == "malformed":
+                    self._count("injected_malformed")
+                    text = malform(text, rng)
+
+        finish = "stop"
+        if fault == "truncate":
+            self._count("injected_truncate")
+            text = text[:int(len(text) * rng.uniform(0.3, 0.9))]
+            finish = "length"
+
+        prompt_tokens = sum(len(m.get("content") or "") for m in messages)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(text),
+            "total_tokens": prompt_tokens + len(text),
+            "prompt_tokens_details": {"cached_tokens": self._cached_tokens(messages)},
+        }
+        delay = (self.latency_ms + self.ms_per_char * len(text)) / 1000 * factor
+        return 200, {}, text, finish, usage, delay
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("stats"):
+                    with server._lock:
+                        payload = dict(server.stats)
+                    self._send_json(200, payload)
+                else:
+                    self._send_json(404, {"error": {"message": "not found"}})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.rstrip("/").endswith("chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+                status, headers, text, finish, usage, delay = server.respond(body)
+                model = body.get("model", "mock")
+                if status != 200:
+                    time.sleep(delay)
+                    message = "rate limited" if status == 429 else "injected server error"
+                    self._send_json(status, {"error": {"message": message, "type": "mock"}}, headers)
+                    return
+                if body.get("stream"):
+                    include_usage = (body.get("stream_options") or {}).get("include_usage")
+                    self._stream(model, text, finish, usage if include_usage else None, delay)
+                    return
+                time.sleep(delay)
+                self._send_json(200, {
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": text},
+                        "finish_reason": finish,
+                    }],
+                    "usage": usage,
+                })
+
+            def _send_json(self, status, payload, headers=None):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    for key, value in (headers or {}).items():
+                        self.send_header(key, value)
+                    self.end_headers()
+                    self.wfile.write(data)
+                except OSError:
+                    pass  # the client gave up (e.g. the losing side of a hedge)
+
+            def _event(self, payload):
+                data = f"data: {payload}\n\n".encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def _stream(self, model, text, finish, usage, delay):
+                pieces = [text[i:i + _STREAM_PIECE] for i in range(0, len(text), _STREAM_PIECE)] or [""]
+                pause = delay / len(pieces)
+
+                def chunk(delta, finish_reason=None):
+                    return json.dumps({
+                        "id": "chatcmpl-mock",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                    }, ensure_ascii=False)
+
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    self._event(chunk({"role": "assistant", "content": ""}))
+                    for piece in pieces:
+                        time.sleep(pause)
+                        self._event(chunk({"content": piece}))
+                    self._event(chunk({}, finish))
+                    if usage is not None:
+                        self._event(json.dumps({
+                            "id": "chatcmpl-mock", "object": "chat.completion.chunk",
+                            "created": int(time.time()), "model": model,
+                            "choices": [], "usage": usage,
+                        }))
+                    self._event("[DONE]")
+                    self.wfile.write(b"0\r\n\r\n")
+                except OSError:
+                    pass
+
+        return Handler
+
+
+def add_server_arguments(parser):
+    """把模拟服务的参数加到 *parser*（基准测试脚本共用）。"""
+    group = parser.add_argument_group("模拟服务")
+    group.add_argument("--latency-ms", type=float, default=800.0, help="每个请求的延迟中位数（毫秒）")
+    group.add_argument("--latency-sigma", type=float, default=0.3, help="延迟对数正态分布的离散度")
+    group.add_argument("--ms-per-char", type=float, default=0.2, help="每输出字符额外的生成时间（毫秒）")
+    group.add_argument("--tail-rate", type=float, default=0.01, help="长尾请求的比例")
+    group.add_argument("--tail-factor", type=float, default=8.0, help="长尾请求的延迟倍数")
+    group.add_argument("--error-rate", type=float, default=0.0, help="返回 500 的比例")
+    group.add_argument("--throttle-rate", type=float, default=0.0, help="返回 429 的比例")
+    group.add_argument("--retry-after", type=float, default=1.0, help="429 响应的 Retry-After（秒）")
+    group.add_argument("--truncate-rate", type=float, default=0.0, help="截断输出的比例")
+    group.add_argument("--malformed-rate", type=float, default=0.0, help="输出坏 JSON 的比例")
+    group.add_argument("--drop-rate", type=float, default=0.0, help="漏掉一句原文的比例")
+    group.add_argument("--seed", type=int, default=0, help="随机种子")
+    return parser
+
+
+def server_from_args(args, port=0):
+    return MockLLMServer(
+        port=port,
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        ms_per_char=args.ms_per_char,
+        tail_rate=args.tail_rate,
+        tail_factor=args.tail_factor,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        truncate_rate=args.truncate_rate,
+        malformed_rate=args.malformed_rate,
+        drop_rate=args.drop_rate,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容模拟服务")
+    parser.add_argument("--port", type=int, default=8000, help="监听端口")
+    args = add_server_arguments(parser).parse_args()
+    server = server_from_args(args, port=args.port).start()
+    print(f"模拟服务已启动: {server.url} （Ctrl+C 退出）")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 """Allow running the GUI with ``python -m gui``."""
 
+import multiprocessing
 import sys
 
 from gui.app import main
 
-sys.exit(main())
+if __name__ == "__main__":
+    # Process pools re-import the main module in child processes
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -1 +1 @@
-"""Core modules: config, models, pipeline."""
+"""Core modules: config, models, pipeline, stream_split, tokens, llm_engine, rate_limit, response_cache, journal, json_stream, json_repair, alignment, postprocess, compact_protocol, usage, router, metrics, budget, ui_batch."""
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Alignment of generated entries back to their source chunk.
+
+The ``content`` fields of a chunk's entries are concatenated and aligned
+to the chunk text, both reduced to word characters (the spec rewrites
+punctuation, so it cannot be compared).  The alignment walks both
+strings once, extending exact matches and, on a mismatch, jumping ahead
+in the source to the next occurrence of the following few output
+characters — text the model dropped — or skipping output characters
+that occur nowhere ahead — text it rephrased or made up.
+
+:func:`align_entries` returns the coverage and the source spans nobody
+covered, so callers can send just those spans back to the model and
+:meth:`Alignment.splice` the answers into place.
+"""
+
+from __future__ import annotations
+
+import unicodedata
+
+# Output characters used to re-synchronise after a mismatch
+_ANCHOR_CHARS = 8
+
+# Uncovered runs shorter than this are rewording, not dropped text
+MIN_MISSING_CHARS = 6
+
+# Uncovered runs closer than this are requested together
+_MERGE_GAP = 12
+
+
+def _normalize(text: str) -> tuple[str, list[int]]:
+    """Word characters of *text* (NFKC, lower case) and their offsets."""
+    chars = []
+    offsets = []
+    for pos, c in enumerate(text):
+        if c.isalnum():
+            folded = unicodedata.normalize("NFKC", c).lower()
+            chars.append(folded if len(folded) == 1 else c)
+            offsets.append(pos)
+    return "".join(chars), offsets
+
+
+class Alignment:
+    """Result of :func:`align_entries`.
+
+    Attributes
+    ----------
+    coverage : float
+        Fraction of the chunk's word characters matched by some entry.
+    missing : list[tuple[int, int]]
+        ``(start, end)`` offsets into the chunk text of uncovered spans,
+        in order, each at least :data:`MIN_MISSING_CHARS` word characters.
+    """
+
+    def __init__(
+        self,
+        coverage: float,
+        missing: list[tuple[int, int]],
+        entry_positions: list[int],
+        gap_ends: list[int],
+    ) -> None:
+        self.coverage = coverage
+        self.missing = missing
+        # Normalized source indices: where each entry starts matching,
+        # and where each missing span ends
+        self._entry_positions = entry_positions
+        self._gap_ends = gap_ends
+
+    def splice(self, entries: list[dict], fills: list[list[dict] | None]) -> list[dict]:
+        """Insert ``fills[k]`` where ``missing[k]`` belongs among *entries*.
+
+        A fill of None (its request failed) leaves that gap as it is.
+        """
+        result = []
+        k = 0
+        for entry, pos in zip(entries, self._entry_positions):
+            while k < len(fills) and self._gap_ends[k] <= pos:
+                result.extend(fills[k] or [])
+                k += 1
+            result.append(entry)
+        for fill in fills[k:]:
+            result.extend(fill or [])
+        return result
+
+
+def align_entries(
+    chunk_text: str,
+    entries: list[dict],
+    min_missing: int = MIN_MISSING_CHARS,
+) -> Alignment:
+    """Align *entries* to *chunk_text*; see the module docstring."""
+    src, offsets = _normalize(chunk_text)
+    pieces = []
+    bounds = []  # start of each entry in the concatenated output
+    length = 0
+    for entry in entries:
+        content = entry.get("content", "") if isinstance(entry, dict) else ""
+        piece = _normalize(str(content))[0]
+        bounds.append(length)
+        pieces.append(piece)
+        length += len(piece)
+    out = "".join(pieces)
+
+    n, m = len(src), len(out)
+    covered = bytearray(n)
+    positions = []
+    i = j = b = 0
+    entry_j = 0  # start of the current entry in the output
+    while j < m:
+        while b < len(bounds) and bounds[b] <= j:
+            positions.append(i)
+            entry_j = bounds[b]
+            b += 1
+        if i < n and src[i] == out[j]:
+            if j == entry_j:
+                positions[-1] = i
+            covered[i] = 1
+            i += 1
+            j += 1
+            continue
+        # An entry that fails within its first few characters matched
+        # by accident (a dropped sentence starting the same way), so it
+        # is re-synchronised from its start
+        back = j - entry_j
+        if 0 < back < _ANCHOR_CHARS:
+            p = src.find(out[entry_j:entry_j + _ANCHOR_CHARS], i - back + 1)
+            if p != -1:
+                covered[i - back:i] = bytes(back)
+                i, j = p, entry_j
+                continue
+        p = src.find(out[j:j + _ANCHOR_CHARS], i)
+        if p != -1:
+            i = p       # the source text in between was dropped
+        else:
+            j += 1      # this output character is not in the source
+    positions.extend([i] * (len(bounds) - len(positions)))
+
+    # Uncovered runs in normalized coordinates, close runs merged
+    runs: list[list[int]] = []
+    start = None
+    for k in range(n + 1):
+        if k < n and not covered[k]:
+            if start is None:
+                start = k
+            continue
+        if start is not None:
+            if runs and start - runs[-1][1] < _MERGE_GAP:
+                runs[-1][1] = k
+            else:
+                runs.append([start, k])
+            start = None
+    runs = [r for r in runs if r[1] - r[0] >= min_missing]
+
+    missing = []
+    for a, z in runs:
+        end = offsets[z - 1] + 1
+        # Keep the punctuation that closes the span
+        while end < len(chunk_text) and not chunk_text[end].isalnum():
+            end += 1
+        missing.append((offsets[a], end))
+
+    coverage = sum(covered) / n if n else 1.0
+    return Alignment(coverage, missing, positions, [z for _, z in runs])
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+Cost estimation and a spend ceiling for book conversion runs.
+
+* :func:`estimate_run` is the pre-flight check: chunk count, expected
+  input tokens (and how many of them the provider's prefix cache should
+  serve), expected output tokens, and :meth:`RunEstimate.cost` under any
+  provider's :class:`Price` from the local price table.
+* :func:`max_tokens_for` sizes each request's ``max_tokens`` from the
+  chunk's expected output instead of a blanket million, so a runaway
+  completion is cut off (and its truncated tail re-requested) rather
+  than billed in full.
+* :class:`BudgetGovernor` tracks the actual cost from response usage.
+  Each request reserves its worst case (prompt plus ``max_tokens``)
+  before it is sent; near the budget requests go out one at a time, and
+  once the next one could overshoot it, :meth:`BudgetGovernor.acquire`
+  raises :class:`BudgetExceeded` so the workers stop scheduling.
+  Finished chunks stay in the generation journal, so a resumed run with
+  a larger budget only requests the rest.
+
+Prices are approximate list prices in USD; override them with
+:func:`register_price` for your account or model.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import deque
+from typing import Callable, Iterable
+
+from gui.core.rate_limit import _future_waker
+from gui.core.tokens import TokenEstimator
+
+# Spend ratio from which requests are sent one at a time
+SLOW_DOWN_AT = 0.8
+
+# max_tokens = expected output * OUTPUT_HEADROOM + MIN_OUTPUT_TOKENS
+OUTPUT_HEADROOM = 1.5
+MIN_OUTPUT_TOKENS = 256
+
+# Per-message overhead (role etc.) in the token estimates
+_MESSAGE_OVERHEAD = 4
+
+
+class BudgetExceeded(RuntimeError):
+    """Raised instead of sending a request that could exceed the budget."""
+
+
+class Price:
+    """USD per million input, cached-input and output tokens."""
+
+    def __init__(self, input: float, output: float, cached: float | None = None) -> None:
+        self.input = input
+        self.output = output
+        self.cached = cached if cached is not None else input
+
+    def cost(self, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+        """USD for one or more requests with these token counts."""
+        return (
+            (prompt_tokens - cached_tokens) * self.input
+            + cached_tokens * self.cached
+            + completion_tokens * self.output
+        ) / 1_000_000
+
+
+# Keyed by model first, then provider (whose entry prices its default model)
+_PRICES: dict[str, Price] = {
+    "openrouter": Price(input=0.15, output=0.60, cached=0.075),      # openai/gpt-4o-mini
+    "gemini": Price(input=0.30, output=2.50, cached=0.075),          # gemini-2.5-flash
+    "qwen": Price(input=0.07, output=0.28, cached=0.028),            # qwen-long (¥0.5 / ¥2)
+    "gemini-2.5-pro": Price(input=1.25, output=10.0, cached=0.31),
+}
+
+
+def register_price(name: str, price: Price) -> None:
+    """Install or replace the price of a provider or model *name*."""
+    _PRICES[name.lower()] = price
+
+
+def get_price(provider: str, model: str | None = None) -> Price:
+    """Price of *model* if listed, else of *provider* (OpenRouter's if unknown)."""
+    if model and model.lower() in _PRICES:
+        return _PRICES[model.lower()]
+    return _PRICES.get(provider.lower(), _PRICES["openrouter"])
+
+
+def max_tokens_for(text: str, estimator: TokenEstimator) -> int:
+    """``max_tokens`` for converting *text*: its expected output plus headroom."""
+    expected = estimator.expected_output(text)
+    return min(estimator.max_output_tokens, int(expected * OUTPUT_HEADROOM) + MIN_OUTPUT_TOKENS)
+
+
+def count_messages(messages: list[dict], estimator: TokenEstimator) -> int:
+    """Estimated prompt tokens of a chat ``messages`` list."""
+    return sum(estimator.count(m.get("content") or "") + _MESSAGE_OVERHEAD for m in messages)
+
+
+class RunEstimate:
+    """Expected chunks and tokens of a run."""
+
+    def __init__(self, chunks: int, input_tokens: int, cached_tokens: int, output_tokens: int) -> None:
+        self.chunks = chunks
+        self.input_tokens = input_tokens
+        self.cached_tokens = cached_tokens
+        self.output_tokens = output_tokens
+
+    def cost(self, price: Price) -> float:
+        return price.cost(self.input_tokens, self.output_tokens, self.cached_tokens)
+
+    def report(self, provider: str, price: Price) -> str:
+        """Chinese one-line summary for the log."""
+        return (
+            f"预估 {provider}: {self.chunks} 个片段，输入约 {self.input_tokens} token"
+            f"（可缓存 {self.cached_tokens}），输出约 {self.output_tokens} token，"
+            f"费用约 ${self.cost(price):.2f}"
+        )
+
+
+def estimate_run(
+    chunk_texts: Iterable[str],
+    build_request: Callable[[str], list[dict]],
+    estimator: TokenEstimator,
+) -> RunEstimate:
+    """Expected tokens for requesting every chunk once.
+
+    *build_request* turns a chunk into its chat messages; a leading
+    system message is the invariant prefix, served from the provider's
+    cache on every request after the first.  Retries and gap-filling
+    requests are not included.
+    """
+    chunks = input_tokens = cached_tokens = output_tokens = 0
+    for text in chunk_texts:
+        messages = build_request(text)
+        input_tokens += count_messages(messages, estimator)
+        if chunks and messages and messages[0].get("role") == "system":
+            cached_tokens += count_messages(messages[:1], estimator)
+        output_tokens += estimator.expected_output(text)
+        chunks += 1
+    return RunEstimate(chunks, input_tokens, cached_tokens, output_tokens)
+
+
+class BudgetGovernor:
+    """Stop sending requests once the run's spend would exceed *budget* USD.
+
+    Parameters
+    ----------
+    budget : float
+        Ceiling in USD; ``0`` or less means unlimited (spend is still tracked).
+    slow_down_at : float
+        Fraction of the budget from which requests are sent one at a time,
+        so the worst-case reservations of many in-flight requests do not
+        stop the run early.
+    on_event : callable, optional
+        Called with a Chinese log line when the governor slows down or stops.
+
+    Thread-safe, so engines in several threads can share one governor.
+    """
+
+    def __init__(
+        self,
+        budget: float = 0.0,
+        slow_down_at: float = SLOW_DOWN_AT,
+        on_event: Callable[[str], None] | None = None,
+    ) -> None:
+        self.budget = budget
+        self.slow_down_at = slow_down_at
+        self.spent = 0.0
+        self.reserved = 0.0
+        self.in_flight = 0
+        self.requests = 0
+        self.slowed = False
+        self.stopped = False
+        self._on_event = on_event
+        self._waiters: deque[Callable[[], None]] = deque()
+        self._lock = threading.Lock()
+
+    def _try_reserve(self, cost: float, waiter: Callable[[], None]) -> bool | None:
+        """Reserve *cost*: True if granted, None if over budget.
+
+        False means wait for an in-flight request to settle; *waiter* has
+        then been queued to be called when one does.
+        """
+        with self._lock:
+            if self.budget <= 0:
+                self._reserve(cost)
+                return True
+            committed = self.spent + self.reserved
+            if committed + cost > self.budget:
+                if self.in_flight:
+                    # In-flight requests may come in under their reservation
+                    self._waiters.append(waiter)
+                    return False
+                if not self.stopped:
+                    self.stopped = True
+                    self._event(
+                        f"已花费 ${self.spent:.2f}，下一个请求可能超出预算 ${self.budget:.2f}，"
+                        f"停止发送新请求（已完成的片段保留在断点日志中）"
+                    )
+                return None
+            if committed >= self.slow_down_at * self.budget:
+                if not self.slowed:
+                    self.slowed = True
+                    self._event(
+                        f"费用已达预算的 {committed / self.budget:.0%}（${committed:.2f} / "
+                        f"${self.budget:.2f}），改为逐个发送请求"
+                    )
+                if self.in_flight:
+                    self._waiters.append(waiter)
+                    return False
+            self._reserve(cost)
+            return True
+
+    def _reserve(self, cost: float) -> None:
+        self.reserved += cost
+        self.in_flight += 1
+
+    async def acquire(self, cost: float) -> None:
+        """Reserve the worst-case *cost* of one request before sending it.
+
+        Raises :class:`BudgetExceeded` when the request could take the
+        run over budget.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            if self.stopped:
+                raise BudgetExceeded(f"已达到预算 ${self.budget:.2f}")
+            woken = loop.create_future()
+            waiter = _future_waker(loop, woken)
+            granted = self._try_reserve(cost, waiter)
+            if granted:
+                return
+            if granted is None:
+                raise BudgetExceeded(f"已达到预算 ${self.budget:.2f}")
+            try:
+                await woken
+            except asyncio.CancelledError:
+                with self._lock:
+                    try:
+                        self._waiters.remove(waiter)
+                    except ValueError:
+                        pass  # already called; every waiter is woken together
+                raise
+
+    def settle(self, reserved: float, actual: float | None) -> None:
+        """Replace a reservation with the *actual* cost (the reservation if unknown)."""
+        with self._lock:
+            self.reserved -= reserved
+            self.in_flight -= 1
+            self.spent += reserved if actual is None else actual
+            self.requests += 1
+        self._notify()
+
+    def cancel(self, reserved: float) -> None:
+        """Drop a reservation for a request that was never answered."""
+        with self._lock:
+            self.reserved -= reserved
+            self.in_flight -= 1
+        self._notify()
+
+    def _notify(self) -> None:
+        """Wake every waiting request to try its reservation again."""
+        with self._lock:
+            woken = list(self._waiters)
+            self._waiters.clear()
+        for wake in woken:
+            wake()
+
+    def _event(self, message: str) -> None:
+        if self._on_event is not None:
+            self._on_event(message)
+
+    def report(self) -> str:
+        """Chinese one-line summary for the log."""
+        limit = f" / 预算 ${self.budget:.2f}" if self.budget > 0 else ""
+        return f"费用: {self.requests} 次请求，约 ${self.spent:.4f}{limit}"
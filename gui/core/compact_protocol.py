@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Compact request/response protocol for JSON generation.
+
+The standard protocol sends the full ``SPEC_PROMPT`` as its system
+message and asks for verbose JSON objects, each repeating its speaker
+name, key names and an eight-float ``emo_vector``.  The compact
+protocol instead
+
+* sends a much shorter spec as the (equally invariant) system message,
+  with only the chunk text as the user message;
+* asks for a speaker table followed by one ``id|delay|emotion|text`` row
+  per segment, where the emotion is ``-`` (neutral) or a few
+  ``<dimension><tenths>`` codes such as ``哀2低1``.
+
+:func:`decode_compact` expands the rows back into entry dicts validated
+by :class:`~gui.core.models.TTSEntry`; a response cut off before its
+``@完`` marker yields its complete rows, like a truncated JSON array.
+The mechanical rules (segment length, punctuation, narrator vector) are
+left to :mod:`gui.core.postprocess`.
+"""
+
+from __future__ import annotations
+
+import re
+
+from gui.core.models import TTSEntry
+
+NARRATOR = "旁白"
+
+# One character per emo_vector dimension, in vector order
+EMOTION_CODES = "喜怒哀惧厌低惊平"
+_EMOTION_NAMES = ["喜", "怒", "哀", "惧", "厌恶", "低落", "惊喜", "平静"]
+
+_SPEAKERS_MARK = "@角色"
+_BODY_MARK = "@正文"
+_END_MARK = "@完"
+
+COMPACT_SPEC_PROMPT = f"""你是有声书格式化器。把用户给出的小说片段转换为 index-tts v2 分段，只按下述紧凑格式输出，不要输出任何其他内容。
+
+格式：
+{_SPEAKERS_MARK}
+<编号>=<说话者>
+{_BODY_MARK}
+<编号>|<停顿毫秒>|<情感>|<文本>
+{_END_MARK}
+
+说话者：0 固定为{NARRATOR}，其余角色按出场顺序编号。
+情感：- 表示中性；否则写 1～2 个"情感字+强度"，强度 1～3 表示 0.1～0.3。情感字 {" ".join(EMOTION_CODES)} 依次对应 {"、".join(_EMOTION_NAMES)}。
+规则：
+- {NARRATOR}情感固定为 -；角色只在上下文明确需要时才给情感，保持克制，优先单一情感。
+- 文本必须完整覆盖原文，不增删、不改写；同一说话者、同一情感的连续文字写在同一行，不要拆分长段落，也不必整理标点。
+- 文本中不得换行。
+- 停顿：{NARRATOR} 300～800，对话 400～1500，情感转折或戏剧性停顿处 1200 以上。
+
+示例：
+{_SPEAKERS_MARK}
+0={NARRATOR}
+1=林冲
+{_BODY_MARK}
+0|800|-|夜色如墨，冷雨敲打着窗棂。
+1|900|哀2|我等这一天，已经等了十年。
+{_END_MARK}"""
+
+_SPEAKER_LINE = re.compile(r"^\s*(\w+)\s*[=＝]\s*(.+?)\s*$")
+_EMOTION = re.compile(
+    r"(喜|怒|哀|惧|厌恶?|低落?|惊喜?|平静?)\s*([0-9](?:\.[0-9])?)"
+)
+_DEFAULT_DELAY = 500
+
+# Tokens per output row besides its text (id, delay, emotion, separators),
+# for token-budget chunking in place of the JSON per-entry overhead
+COMPACT_ENTRY_OVERHEAD = 8
+
+
+def build_compact_messages(chunk_text: str) -> list[dict]:
+    """Chat messages for one chunk: the fixed spec, then the chunk."""
+    return [
+        {"role": "system", "content": COMPACT_SPEC_PROMPT},
+        {"role": "user", "content": f"【小说片段】\n'''\n{chunk_text}\n'''"},
+    ]
+
+
+def decode_emotion(code: str) -> list[float]:
+    """``"哀2低1"`` -> ``[0, 0, 0.2, 0, 0, 0.1, 0, 0]``; ``"-"`` -> zeros."""
+    vector = [0.0] * len(EMOTION_CODES)
+    for name, strength in _EMOTION.findall(code):
+        value = float(strength)
+        vector[EMOTION_CODES.index(name[0])] = value / 10 if value >= 1 else value
+    return vector
+
+
+def encode_emotion(vector: list[float]) -> str:
+    """Inverse of :func:`decode_emotion`, to one decimal place."""
+    parts = [
+        f"{code}{round(value * 10)}"
+        for code, value in zip(EMOTION_CODES, vector)
+        if round(value * 10) > 0
+    ]
+    return "".join(parts) or "-"
+
+
+class CompactResult:
+    """Entries decoded from a compact response.
+
+    Attributes
+    ----------
+    entries : list[dict]
+        One dict per complete row, in ``TTSEntry`` form.
+    complete : bool
+        The ``@完`` end marker was reached.
+    skipped : int
+        Rows that could not be decoded.
+    unknown_speakers : int
+        Rows whose speaker number was never defined, attributed to the
+        narrator.
+    """
+
+    def __init__(
+        self, entries: list[dict], complete: bool, skipped: int, unknown_speakers: int = 0,
+    ) -> None:
+        self.entries = entries
+        self.complete = complete
+        self.skipped = skipped
+        self.unknown_speakers = unknown_speakers
+
+    def summary(self) -> str:
+        """Chinese one-line description for the log."""
+        state = "完整" if self.complete else "未结束"
+        unknown = f"，未定义角色编号 {self.unknown_speakers} 行" if self.unknown_speakers else ""
+        return f"紧凑格式解码 {len(self.entries)} 条（{state}，跳过 {self.skipped} 行{unknown}）"
+
+
+def decode_compact(text: str) -> CompactResult:
+    """Expand a compact response into entries.
+
+    Speaker lines are accepted anywhere before the row that uses them,
+    and a row naming a speaker directly instead of by number keeps that
+    name; a number that was never defined falls back to the narrator and
+    is counted in :attr:`CompactResult.unknown_speakers`.  Without the end marker the last row may be cut off, so it
+    is dropped.
+    """
+    speakers = {"0": NARRATOR}
+    rows: list[dict] = []
+    skipped = unknown_speakers = 0
+    complete = False
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("```") or line in (_SPEAKERS_MARK, _BODY_MARK):
+            continue
+        if line == _END_MARK:
+            complete = True
+            break
+        fields = line.split("|", 3)
+        if len(fields) < 4:
+            m = _SPEAKER_LINE.match(line)
+            if m:
+                speakers[m.group(1)] = m.group(2)
+            else:
+                skipped += 1
+            continue
+        speaker_id, delay, emotion, content = (f.strip() for f in fields)
+        speaker = speakers.get(speaker_id)
+        if speaker is None:
+            speaker = speaker_id
+            if speaker_id.isdigit():
+                unknown_speakers += 1
+                speaker = NARRATOR
+            elif not speaker_id:
+                speaker = NARRATOR
+        try:
+            delay_ms = int(float(delay))
+        except ValueError:
+            delay_ms = _DEFAULT_DELAY
+        rows.append(TTSEntry(
+            speaker=speaker,
+            content=content,
+            emo_vector=decode_emotion(emotion),
+            delay=delay_ms,
+        ).model_dump())
+
+    if not complete and rows:
+        rows.pop()
+        skipped += 1
+    return CompactResult(rows, complete, skipped, unknown_speakers)
+
+
+def encode_compact(entries: list[dict]) -> str:
+    """Write *entries* in the compact format (benchmarks, examples)."""
+    ids = {NARRATOR: "0"}
+    for entry in entries:
+        ids.setdefault(entry.get("speaker", NARRATOR), str(len(ids)))
+    lines = [_SPEAKERS_MARK]
+    lines += [f"{number}={name}" for name, number in ids.items()]
+    lines.append(_BODY_MARK)
+    for entry in entries:
+        content = str(entry.get("content", "")).replace("\n", " ")
+        lines.append(
+            f"{ids[entry.get('speaker', NARRATOR)]}|{entry.get('delay', _DEFAULT_DELAY)}|"
+            f"{encode_emotion(entry.get('emo_vector') or [])}|{content}"
+        )
+    lines.append(_END_MARK)
+    return "\n".join(lines)
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Append-only journal of completed chunks, for resuming JSON generation.
+
+Every chunk's parsed entries are written as one JSON line and fsync'd as
+soon as they arrive, so a crash or cancel loses at most the chunks that
+were in flight.  On resume the journal is replayed and only chunks with
+no record are sent to the model.  Records are keyed by chapter, chunk
+number and a hash of the chunk text, so re-chunking or editing a chapter
+invalidates its old records instead of splicing in stale entries.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+JOURNAL_NAME = ".generation_journal.jsonl"
+
+
+def _text_hash(chunk_text: str) -> str:
+    return hashlib.sha256(chunk_text.encode("utf-8")).hexdigest()[:16]
+
+
+class ChunkJournal:
+    """Per-book journal of completed chunks.
+
+    Parameters
+    ----------
+    path : str or Path
+        The journal file (JSON lines).
+    resume : bool
+        Replay existing records; otherwise the journal is truncated.
+    """
+
+    def __init__(self, path: str | Path, resume: bool = True) -> None:
+        self.path = Path(path)
+        self._done: dict[tuple[str, int, str], list] = {}
+        os.makedirs(self.path.parent, exist_ok=True)
+        if resume:
+            self._replay()
+        self._file = open(self.path, "a" if resume else "w", encoding="utf-8")
+        if resume and self._torn:
+            self._file.write("\n")  # keep the next record off the torn line
+
+    def _replay(self) -> None:
+        self._torn = False
+        if not self.path.exists():
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                self._torn = not line.endswith("\n")
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn final line from a crash mid-write
+                self._done[(rec["chapter"], rec["chunk"], rec["hash"])] = rec["entries"]
+
+    def __len__(self) -> int:
+        return len(self._done)
+
+    def get(self, chapter: str, chunk_no: int, chunk_text: str) -> list | None:
+        """Entries recorded for this chunk, or None if it still has to be done."""
+        return self._done.get((str(chapter), chunk_no, _text_hash(chunk_text)))
+
+    def record(self, chapter: str, chunk_no: int, chunk_text: str, entries: list) -> None:
+        """Append one completed chunk and fsync before returning."""
+        key = (str(chapter), chunk_no, _text_hash(chunk_text))
+        rec = {"chapter": key[0], "chunk": chunk_no, "hash": key[2], "entries": entries}
+        self._file.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._done[key] = entries
+
+    def close(self) -> None:
+        self._file.close()
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Deterministic repair of almost-valid JSON arrays returned by the model.
+
+When :func:`~gui.core.pipeline.extract_json_from_response` gives up,
+:func:`repair_json_array` fixes the defects models commonly produce —
+trailing commas, missing commas between objects, unescaped quotes and
+raw newlines inside strings, invalid escapes, a missing ``[`` — and then
+salvages every complete top-level object, so a truncated last object
+costs only itself.  :func:`coverage` tells the caller how much of the
+source chunk the salvaged entries account for, which decides between
+accepting them and requesting the rest again.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+
+from gui.core.json_stream import JsonArrayStream, uncovered_tail
+
+# Characters that change repair state outside / inside a JSON string
+_OUTSIDE = re.compile(r'[",}]')
+_INSIDE = re.compile(r'["\\\x00-\x1f]')
+
+_VALID_ESCAPES = set('"\\/bfnrtu')
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+# What may follow a string's closing quote, and what may follow the
+# comma after it (next key, next element, or a trailing comma's "}"/"]")
+_AFTER_STRING = set(":}]")
+_AFTER_COMMA = set('"{[-0123456789}]')
+_LITERALS = ("true", "false", "null")
+
+_WORD_CHARS = re.compile(r"\w")
+
+# Salvaged entries covering at least this fraction of the chunk are
+# accepted as they are; a few characters of slack absorb small wording
+# differences between the model's last entry and the source
+DEFAULT_MIN_COVERAGE = 0.99
+
+# Log labels for each kind of repair
+REPAIR_LABELS = {
+    "trailing_comma": "尾随逗号",
+    "missing_comma": "缺失逗号",
+    "inner_quote": "未转义引号",
+    "control_char": "字符串内换行/控制符",
+    "invalid_escape": "非法转义",
+    "missing_bracket": "缺失数组开头",
+    "truncated_object": "截断的末尾对象",
+    "unclosed_array": "未闭合数组",
+    "dropped_object": "无法解析的对象",
+}
+
+
+def _next_significant(text: str, pos: int) -> tuple[str, int]:
+    """The first non-whitespace character at or after *pos*, and its index."""
+    n = len(text)
+    while pos < n and text[pos] in " \t\r\n":
+        pos += 1
+    return (text[pos], pos) if pos < n else ("", n)
+
+
+def _closes_string(text: str, pos: int) -> bool:
+    """Whether the quote just before *pos* ends the string it is in."""
+    c, at = _next_significant(text, pos)
+    if c == "" or c in _AFTER_STRING:
+        return True
+    if c == ",":
+        following, at = _next_significant(text, at + 1)
+        return following == "" or following in _AFTER_COMMA or text.startswith(_LITERALS, at)
+    return False
+
+
+def _normalize(text: str, fixes: Counter) -> str:
+    """Rewrite *text* so each string and separator is valid JSON."""
+    out = []
+    pos = 0
+    n = len(text)
+    in_string = False
+    while pos < n:
+        pattern = _INSIDE if in_string else _OUTSIDE
+        m = pattern.search(text, pos)
+        if m is None:
+            out.append(text[pos:])
+            break
+        out.append(text[pos:m.start()])
+        c = m.group()
+        pos = m.end()
+
+        if in_string:
+            if c == '"':
+                if _closes_string(text, pos):
+                    in_string = False
+                    out.append(c)
+                else:
+                    out.append('\\"')
+                    fixes["inner_quote"] += 1
+            elif c == "\\":
+                if pos < n and text[pos] in _VALID_ESCAPES:
+                    out.append(text[m.start():pos + 1])
+                    pos += 1
+                elif pos < n:
+                    out.append("\\\\")
+                    fixes["invalid_escape"] += 1
+            else:
+                out.append(_CONTROL_ESCAPES.get(c, "\\u%04x" % ord(c)))
+                fixes["control_char"] += 1
+        elif c == '"':
+            in_string = True
+            out.append(c)
+        elif c == ",":
+            following, _ = _next_significant(text, pos)
+            if following in ("]", "}"):
+                fixes["trailing_comma"] += 1
+            else:
+                out.append(c)
+        else:  # "}"
+            out.append(c)
+            following, _ = _next_significant(text, pos)
+            if following == "{":
+                out.append(",")
+                fixes["missing_comma"] += 1
+    return "".join(out)
+
+
+class RepairResult:
+    """Entries salvaged from a response, and what had to be done to get them.
+
+    Attributes
+    ----------
+    entries : list[dict]
+        Every complete top-level object, in order.
+    fixes : collections.Counter
+        Count of each kind of repair, keyed as in :data:`REPAIR_LABELS`.
+    complete : bool
+        The array's closing ``]`` was reached.
+    """
+
+    def __init__(self, entries: list[dict], fixes: Counter, complete: bool) -> None:
+        self.entries = entries
+        self.fixes = fixes
+        self.complete = complete
+
+    def summary(self) -> str:
+        """Chinese one-line description for the log."""
+        parts = [f"{REPAIR_LABELS[k]}×{v}" for k, v in self.fixes.items() if v]
+        detail = "，".join(parts) if parts else "无需修复"
+        return f"本地修复 {len(self.entries)} 条（{detail}）"
+
+
+def repair_json_array(content: str) -> RepairResult:
+    """Repair *content* and salvage the objects of its JSON array.
+
+    Text before the array (prose, code fences) is skipped; if there is no
+    ``[`` before the first ``{``, one is assumed.  Objects that still do
+    not parse after repair are dropped and counted.
+    """
+    fixes: Counter = Counter()
+    bracket = content.find("[")
+    brace = content.find("{")
+    if brace != -1 and (bracket == -1 or brace < bracket):
+        body = "[" + content[brace:]
+        fixes["missing_bracket"] += 1
+    elif bracket != -1:
+        body = content[bracket:]
+    else:
+        return RepairResult([], fixes, False)
+
+    parser = JsonArrayStream()
+    parser.feed(_normalize(body, fixes))
+    if parser.in_object:
+        fixes["truncated_object"] += 1
+    elif not parser.done:
+        fixes["unclosed_array"] += 1
+    if parser.dropped:
+        fixes["dropped_object"] += parser.dropped
+    return RepairResult(parser.entries, fixes, parser.done)
+
+
+def coverage(chunk_text: str, entries: list[dict]) -> float:
+    """Fraction of *chunk_text*'s word characters accounted for by *entries*.
+
+    Measured up to the last entry found in the source (see
+    :func:`~gui.core.json_stream.uncovered_tail`), so a truncated
+    response scores by how far into the chunk it got.
+    """
+    total = len(_WORD_CHARS.findall(chunk_text))
+    if not total:
+        return 1.0
+    missing = len(_WORD_CHARS.findall(uncovered_tail(chunk_text, entries)))
+    return 1.0 - missing / total
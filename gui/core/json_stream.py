@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental parsing of a streamed JSON array of TTS entries.
+
+:class:`JsonArrayStream` is fed the model's output as it arrives and
+returns each top-level ``{...}`` object as soon as its closing brace is
+seen, so entries are usable before the response finishes and a truncated
+response still yields every complete object.  :func:`uncovered_tail`
+then finds the part of the source chunk those objects did not cover, so
+only that tail needs to be requested again.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+
+# Characters that change scanner state outside / inside a JSON string
+_STRUCTURAL = re.compile(r'["{}\[\]]')
+_IN_STRING = re.compile(r'["\\]')
+
+# Word characters used to locate an entry's content in the source text
+_WORD_CHARS = re.compile(r"\w")
+_ANCHOR_CHARS = 8
+
+# Closing punctuation that belongs to the covered text, not the tail
+_CLOSING = "。！？!?，,、；;：:…~—”’」』）)]】 \t\r\n"
+
+
+class JsonArrayStream:
+    """Emit the objects of a JSON array while it is still being received.
+
+    Text before the first ``[`` (prose, code fences) is skipped.  Objects
+    that fail to parse are dropped and counted in :attr:`dropped`; scalars
+    at the top level are ignored.
+    """
+
+    def __init__(self) -> None:
+        self._buf = ""
+        self._pos = 0           # next index of _buf to scan
+        self._depth = 0         # bracket depth, 1 = inside the array
+        self._in_string = False
+        self._obj_start = -1    # start of the current top-level object
+        self.started = False
+        self.done = False       # closing ``]`` of the array was seen
+        self.entries: list[dict] = []
+        self.dropped = 0
+
+    @property
+    def in_object(self) -> bool:
+        """True while a top-level object has been opened but not closed."""
+        return self._obj_start >= 0
+
+    def feed(self, text: str) -> list[dict]:
+        """Consume *text*; return the objects completed by it."""
+        if self.done or not text:
+            return []
+        self._buf += text
+        new: list[dict] = []
+        buf = self._buf
+        pos = self._pos
+
+        while pos < len(buf):
+            if not self.started:
+                pos = buf.find("[", pos)
+                if pos == -1:
+                    pos = len(buf)
+                    break
+                self.started = True
+                self._depth = 1
+                pos += 1
+                continue
+
+            if self._in_string:
+                m = _IN_STRING.search(buf, pos)
+                if m is None:
+                    pos = len(buf)
+                    break
+                if m.group() == "\\":
+                    if m.end() >= len(buf):
+                        pos = m.start()  # escape split across feeds
+                        break
+                    pos = m.end() + 1
+                    continue
+                self._in_string = False
+                pos = m.end()
+                continue
+
+            m = _STRUCTURAL.search(buf, pos)
+            if m is None:
+                pos = len(buf)
+                break
+            c = m.group()
+            pos = m.end()
+            if c == '"':
+                self._in_string = True
+            elif c in "{[":
+                if self._depth == 1 and c == "{":
+                    self._obj_start = m.start()
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 1 and c == "}" and self._obj_start >= 0:
+                    try:
+                        obj = json.loads(buf[self._obj_start:pos])
+                    except json.JSONDecodeError:
+                        obj = None
+                    if isinstance(obj, dict):
+                        new.append(obj)
+                    else:
+                        self.dropped += 1
+                    self._obj_start = -1
+                elif self._depth <= 0:
+                    self.done = True
+                    break
+
+        # Drop what has been consumed; keep the open object, if any
+        cut = self._obj_start if self._obj_start >= 0 else pos
+        self._buf = buf[cut:]
+        self._pos = pos - cut
+        if self._obj_start >= 0:
+            self._obj_start = 0
+        self.entries.extend(new)
+        return new
+
+
+def uncovered_tail(chunk_text: str, entries: list[dict]) -> str:
+    """The part of *chunk_text* after the text covered by *entries*.
+
+    Each entry's content is located by its last few word characters
+    (punctuation may differ from the source), searching forward from
+    the previous match within a window proportional to its length.
+    """
+    cursor = 0
+    for entry in entries:
+        content = entry.get("content", "") if isinstance(entry, dict) else ""
+        anchor = "".join(_WORD_CHARS.findall(content))[-_ANCHOR_CHARS:]
+        if not anchor:
+            continue
+        pattern = re.compile(r"\W*".join(map(re.escape, anchor)))
+        window_end = cursor + 2 * len(content) + 200
+        m = pattern.search(chunk_text, cursor, window_end)
+        if m is not None:
+            cursor = m.end()
+    while cursor < len(chunk_text) and chunk_text[cursor] in _CLOSING:
+        cursor += 1
+    return chunk_text[cursor:]
@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+"""
+Asyncio request engine for OpenAI-compatible chat completions.
+
+One :class:`LLMEngine` owns a single pooled ``httpx.AsyncClient`` (HTTP
+keep-alive, connection limit sized to the concurrency) and an
+``asyncio.Semaphore`` bounding the number of requests in flight.  Callers
+create one task per chunk and ``await engine.complete(...)``; hundreds of
+requests can be outstanding without one OS thread each.
+
+When created with a *provider*, every request also goes through that
+provider's shared :class:`~gui.core.rate_limit.ProviderLimiter`
+(requests/min, tokens/min and adaptive concurrency).  Token usage of
+every response, including prefix-cache hits, is summed in
+:attr:`LLMEngine.usage`.  An attached
+:class:`~gui.core.metrics.PipelineMetrics` also receives the time each
+request spent queued for a slot, waiting for the rate limiter and on
+the network, and an attached :class:`~gui.core.budget.BudgetGovernor`
+is charged for every request at the provider's price.
+
+The GUI workers drive it with ``asyncio.run`` inside their QThread, the
+CLI scripts with ``asyncio.run`` in ``main``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import asynccontextmanager, contextmanager
+from itertools import islice
+from typing import AsyncIterator, Awaitable, Callable, Iterable, TypeVar
+
+import httpx
+from openai import APIStatusError, AsyncOpenAI
+
+from gui.core.budget import BudgetGovernor, count_messages, get_price
+from gui.core.metrics import PipelineMetrics
+from gui.core.rate_limit import ProviderLimiter, get_provider_limiter, parse_retry_after
+from gui.core.tokens import TokenEstimator, get_token_estimator
+from gui.core.usage import UsageStats, usage_tokens
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DEFAULT_CONCURRENCY = 64
+DEFAULT_TIMEOUT = 600.0
+
+
+class LLMEngine:
+    """Shared async client plus an in-flight request limit.
+
+    Parameters
+    ----------
+    api_key, base_url, model : str
+        Provider credentials and the model used by :meth:`complete`.
+    concurrency : int
+        Maximum number of requests in flight at once.
+    timeout : float
+        Per-request timeout in seconds.
+    provider : str, optional
+        Draw from this provider's shared rate limiter and estimate
+        request tokens with its :class:`~gui.core.tokens.TokenEstimator`.
+    usage : UsageStats, optional
+        Totals to add this engine's token usage to (shared by the engines
+        of a :class:`~gui.core.router.ProviderRouter`).
+    metrics : PipelineMetrics, optional
+        Receives queue, rate-limit and network timings and token usage.
+    budget : BudgetGovernor, optional
+        Reserves each request's worst-case cost (prompt plus
+        ``max_tokens``) before it is sent and is charged the actual cost;
+        raises :class:`~gui.core.budget.BudgetExceeded` instead of sending
+        a request that could exceed the budget.
+
+    Use as an async context manager so the connection pool is closed::
+
+        async with LLMEngine(key, url, model, concurrency=200) as engine:
+            text = await engine.complete(prompt, temperature=0.2)
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str,
+        model: str,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        timeout: float = DEFAULT_TIMEOUT,
+        provider: str | None = None,
+        usage: UsageStats | None = None,
+        metrics: PipelineMetrics | None = None,
+        budget: BudgetGovernor | None = None,
+    ) -> None:
+        self.model = model
+        self.usage = usage if usage is not None else UsageStats()
+        self.metrics = metrics
+        self.budget = budget
+        self.price = get_price(provider or "", model)
+        self.limiter: ProviderLimiter | None = None
+        self._estimator: TokenEstimator | None = None
+        if provider:
+            self.limiter = get_provider_limiter(provider)
+            self._estimator = get_token_estimator(provider)
+        self.concurrency = max(1, concurrency)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.concurrency,
+                max_keepalive_connections=self.concurrency,
+            ),
+            timeout=timeout,
+        )
+        self._client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=self._http,
+            max_retries=0,  # callers own their retry policy
+        )
+
+    async def __aenter__(self) -> "LLMEngine":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the pooled HTTP connections."""
+        await self._client.close()
+        await self._http.aclose()
+
+    async def complete(
+        self,
+        prompt: str | list[dict],
+        on_send: Callable[[], None] | None = None,
+        **params,
+    ) -> str:
+        """Send one chat completion and return the reply text.
+
+        *prompt* is either the user message text or a full ``messages``
+        list; *params* (temperature, max_tokens, ...) are passed through.
+        Waits for a free slot when ``concurrency`` requests are in flight,
+        and for the provider limiter when one is attached; *on_send* is
+        called once both are granted, as the request goes out.
+        """
+        messages = (
+            [{"role": "user", "content": prompt}] if isinstance(prompt, str) else prompt
+        )
+        async with self._slot(), self._charge(messages, params) as bill:
+            try:
+                if self.limiter is None:
+                    if on_send is not None:
+                        on_send()
+                    with self._timed("network"):
+                        response = await self._client.chat.completions.create(
+                            model=self.model, messages=messages, **params,
+                        )
+                else:
+                    response = await self._limited_create(messages, params, on_send)
+            except Exception as e:
+                self._count_error(e)
+                raise
+            bill["usage"] = getattr(response, "usage", None)
+        self._record_usage(bill["usage"])
+        return response.choices[0].message.content or ""
+
+    async def stream(
+        self,
+        prompt: str | list[dict],
+        on_send: Callable[[], None] | None = None,
+        **params,
+    ) -> AsyncIterator[str]:
+        """Send one streaming chat completion and yield the text deltas.
+
+        Holds a concurrency slot (and the limiter's, if any) until the
+        stream ends or the caller closes the iterator.  *on_send* is as
+        for :meth:`complete`.
+        """
+        messages = (
+            [{"role": "user", "content": prompt}] if isinstance(prompt, str) else prompt
+        )
+        async with self._slot(), self._charge(messages, params) as bill:
+            reserved = 0
+            if self.limiter is not None:
+                reserved = sum(self._estimator.count(m.get("content") or "") for m in messages)
+                with self._timed("rate_limit"):
+                    await self.limiter.acquire(reserved)
+            if on_send is not None:
+                on_send()
+            status, retry_after, used = "error", None, None
+            sent_at = time.perf_counter()
+            try:
+                response = await self._client.chat.completions.create(
+                    model=self.model, messages=messages, stream=True,
+                    stream_options={"include_usage": True}, **params,
+                )
+                async for event in response:
+                    if event.choices:
+                        delta = event.choices[0].delta.content
+                        if delta:
+                            yield delta
+                    usage = getattr(event, "usage", None)
+                    if usage is not None:  # final event
+                        self._record_usage(usage)
+                        bill["usage"] = usage
+                        used = usage.total_tokens
+                status = "ok"
+            except Exception as e:
+                if is_throttle_error(e):
+                    status = "throttled"
+                    retry_after = parse_retry_after(e.response.headers.get("retry-after"))
+                self._count_error(e)
+                raise
+            finally:
+                if self.metrics is not None:
+                    self.metrics.observe("network", time.perf_counter() - sent_at)
+                if self.limiter is not None:
+                    self.limiter.release(
+                        status, retry_after=retry_after, reserved_tokens=reserved, used_tokens=used,
+                    )
+
+    @asynccontextmanager
+    async def _slot(self):
+        """Hold a concurrency slot, timing the wait for it as ``queue``."""
+        with self._timed("queue"):
+            await self._semaphore.acquire()
+        try:
+            if self.metrics is not None:
+                self.metrics.count("requests")
+            yield
+        finally:
+            self._semaphore.release()
+
+    @asynccontextmanager
+    async def _charge(self, messages: list[dict], params: dict):
+        """Reserve the request's worst-case cost with the budget governor.
+
+        Yields a dict the caller stores the response ``usage`` in; the
+        governor is charged its actual cost on exit.  Failed or cancelled
+        requests are not charged.
+        """
+        bill = {"usage": None}
+        if self.budget is None:
+            yield bill
+            return
+        estimator = self._estimator or get_token_estimator("")
+        cost = self.price.cost(
+            count_messages(messages, estimator),
+            params.get("max_tokens") or estimator.max_output_tokens,
+        )
+        await self.budget.acquire(cost)
+        try:
+            yield bill
+        except BaseException:
+            self.budget.cancel(cost)
+            raise
+        usage = bill["usage"]
+        if usage is None:
+            self.budget.settle(cost, None)
+        else:
+            prompt, cached, completion = usage_tokens(usage)
+            self.budget.settle(cost, self.price.cost(prompt, completion, cached))
+
+    @contextmanager
+    def _timed(self, stage: str):
+        if self.metrics is None:
+            yield
+        else:
+            with self.metrics.stage(stage):
+                yield
+
+    def _record_usage(self, usage) -> None:
+        self.usage.record(usage)
+        if self.metrics is not None:
+            self.metrics.record_usage(usage)
+
+    def _count_error(self, error: Exception) -> None:
+        if self.metrics is not None:
+            self.metrics.count("throttled" if is_throttle_error(error) else "errors")
+
+    async def _limited_create(self, messages: list[dict], params: dict, on_send=None):
+        reserved = sum(self._estimator.count(m.get("content") or "") for m in messages)
+        with self._timed("rate_limit"):
+            await self.limiter.acquire(reserved)
+        if on_send is not None:
+            on_send()
+        try:
+            with self._timed("network"):
+                response = await self._client.chat.completions.create(
+                    model=self.model, messages=messages, **params,
+                )
+        except asyncio.CancelledError:
+            self.limiter.release("error")  # e.g. the losing side of a hedge
+            raise
+        except Exception as e:
+            if is_throttle_error(e):
+                self.limiter.release(
+                    "throttled", retry_after=parse_retry_after(e.response.headers.get("retry-after")),
+                )
+            else:
+                self.limiter.release("error")
+            raise
+        usage = getattr(response, "usage", None)
+        self.limiter.release(
+            "ok",
+            reserved_tokens=reserved,
+            used_tokens=usage.total_tokens if usage is not None else None,
+        )
+        return response
+
+
+def is_throttle_error(error: Exception) -> bool:
+    """True for 429 and 5xx responses, which call for backing off."""
+    return isinstance(error, APIStatusError) and (
+        error.status_code == 429 or error.status_code >= 500
+    )
+
+
+async def iter_completed(
+    items: Iterable[T],
+    handler: Callable[[T], Awaitable[R]],
+    limit: int | None = None,
+) -> AsyncIterator[tuple[T, R | Exception]]:
+    """Run ``handler(item)`` for every item concurrently.
+
+    Tasks are started in *items* order, so with an engine-bound handler
+    the first items get the first free slots (pass jobs longest-first to
+    keep long requests off the tail).  With *limit*, at most that many
+    handlers run at once and the next item starts as one finishes, so a
+    large book does not keep a waiting task per chunk.  Yields
+    ``(item, result)`` pairs as they complete; an exception raised by
+    the handler is yielded in place of its result instead of cancelling
+    the other tasks.  Closing the iterator early cancels whatever is
+    still running.
+    """
+    async def run(item: T) -> tuple[T, R | Exception]:
+        try:
+            return item, await handler(item)
+        except Exception as e:
+            return item, e
+
+    pending = iter(items)
+    running: set[asyncio.Future] = set()
+
+    def start(n: int | None) -> None:
+        for item in islice(pending, n):
+            running.add(asyncio.ensure_future(run(item)))
+
+    start(limit)
+    try:
+        while running:
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            running -= done
+            start(len(done) if limit is not None else 0)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in running:
+            task.cancel()
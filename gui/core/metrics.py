@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+Per-stage timing and token metrics for a generation run.
+
+A :class:`PipelineMetrics` collects how long each stage of the pipeline
+took, per chunk and per chapter:
+
+* ``chunking`` -- splitting a chapter into chunks;
+* ``queue`` -- waiting for one of the engine's concurrency slots;
+* ``rate_limit`` -- waiting for the provider's rate limiter;
+* ``network`` -- the request itself, until the reply (or stream) ends;
+* ``parse`` -- extracting JSON or decoding compact rows;
+* ``validate`` -- salvaging partial replies and checking coverage;
+* ``merge`` -- post-processing and joining a chapter's chunks,
+
+plus the prompt, cached-prompt and completion tokens of every response.
+:meth:`PipelineMetrics.summary` names the bottleneck: time spent in the
+local stages is serial on the event loop, so their share of wall-clock
+time is how busy the CPU was; otherwise the largest of the request-side
+waits tells whether the run is bound by the provider, the rate limiter
+or its own concurrency limit.
+
+The chapter a measurement belongs to (a chapter index in the GUI, a file
+name in the CLI scripts) is taken from :func:`chapter_scope`, a context
+variable that asyncio tasks inherit, so the engine does not need to know
+about chapters.  :meth:`~PipelineMetrics.to_json` and
+:meth:`~PipelineMetrics.to_prometheus` export a snapshot for the CLI
+scripts.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator
+
+from gui.core.usage import UsageStats
+
+STAGES = ("chunking", "queue", "rate_limit", "network", "parse", "validate", "merge")
+
+# Stages that run on the caller's thread rather than waiting on a provider
+CPU_STAGES = ("chunking", "parse", "validate", "merge")
+
+# Share of wall-clock time in CPU stages from which a run counts as CPU-bound
+CPU_BOUND_SHARE = 0.5
+
+# Per-stage samples kept for the latency quantiles
+_SAMPLES = 2000
+_QUANTILES = (0.5, 0.95, 0.99)
+
+_STAGE_NAMES = {
+    "chunking": "切块",
+    "queue": "排队",
+    "rate_limit": "限流等待",
+    "network": "网络",
+    "parse": "解析",
+    "validate": "校验",
+    "merge": "合并",
+}
+
+_BOTTLENECK_NAMES = {
+    "cpu": "CPU 受限（本地解析/校验/合并占满事件循环）",
+    "rate_limit": "限流受限（请求大多在等服务商配额）",
+    "concurrency": "并发受限（请求大多在排队等空闲槽位，可调高并发数）",
+    "provider": "服务商受限（时间主要花在等待模型响应）",
+}
+
+_current_chapter: contextvars.ContextVar[int | str | None] = contextvars.ContextVar(
+    "current_chapter", default=None,
+)
+
+
+@contextmanager
+def chapter_scope(chapter: int | str | None) -> Iterator[None]:
+    """Attribute measurements made inside the block (and in tasks it starts) to *chapter*."""
+    token = _current_chapter.set(chapter)
+    try:
+        yield
+    finally:
+        _current_chapter.reset(token)
+
+
+class _StageStats:
+    """Count, total and recent samples of one stage."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: deque[float] = deque(maxlen=_SAMPLES)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class PipelineMetrics:
+    """Thread-safe stage timings, counters and token usage of one run."""
+
+    def __init__(self) -> None:
+        self.usage = UsageStats()
+        self._started = time.perf_counter()
+        self._stages = {stage: _StageStats() for stage in STAGES}
+        self._chapter_stages: dict[int | str, dict[str, float]] = {}
+        self._chapter_usage: dict[int | str, UsageStats] = {}
+        self._counters: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+    def observe(self, stage: str, seconds: float, chapter: int | str | None = None) -> None:
+        """Add *seconds* spent in *stage* (for *chapter*, or the current one)."""
+        if chapter is None:
+            chapter = _current_chapter.get()
+        with self._lock:
+            self._stages[stage].add(seconds)
+            if chapter is not None:
+                totals = self._chapter_stages.setdefault(chapter, dict.fromkeys(STAGES, 0.0))
+                totals[stage] += seconds
+
+    @contextmanager
+    def stage(self, stage: str, chapter: int | str | None = None) -> Iterator[None]:
+        """Time the block as *stage*."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0, chapter)
+
+    def count(self, name: str, n: int = 1) -> None:
+        """Increment counter *name* (``requests``, ``errors``, ``throttled``...)."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def record_usage(self, usage, chapter: int | str | None = None) -> None:
+        """Count a response's OpenAI-style ``usage`` in the run and chapter totals."""
+        if usage is None:
+            return
+        if chapter is None:
+            chapter = _current_chapter.get()
+        self.usage.record(usage)
+        if chapter is not None:
+            with self._lock:
+                stats = self._chapter_usage.setdefault(chapter, UsageStats())
+            stats.record(usage)
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+    def bottleneck(self) -> str | None:
+        """``"cpu"``, ``"rate_limit"``, ``"concurrency"`` or ``"provider"``; None before any request."""
+        with self._lock:
+            totals = {stage: stats.total for stage, stats in self._stages.items()}
+        elapsed = self.elapsed
+        cpu = sum(totals[stage] for stage in CPU_STAGES)
+        if elapsed > 0 and cpu / elapsed >= CPU_BOUND_SHARE:
+            return "cpu"
+        waits = {
+            "rate_limit": totals["rate_limit"],
+            "concurrency": totals["queue"],
+            "provider": totals["network"],
+        }
+        if not any(waits.values()):
+            return None
+        return max(waits, key=waits.get)
+
+    def snapshot(self) -> dict:
+        """Plain-data view of everything recorded so far (JSON-serialisable)."""
+        elapsed = self.elapsed
+        with self._lock:
+            stages = {
+                stage: {
+                    "count": stats.count,
+                    "total": stats.total,
+                    "mean": stats.total / stats.count if stats.count else 0.0,
+                    "max": stats.max,
+                    **{f"p{int(q * 100)}": stats.quantile(q) for q in _QUANTILES},
+                }
+                for stage, stats in self._stages.items()
+            }
+            chapters = {
+                chapter: {"stages": dict(totals)}
+                for chapter, totals in self._chapter_stages.items()
+            }
+            chapter_usage = dict(self._chapter_usage)
+            counters = dict(self._counters)
+        for chapter, stats in chapter_usage.items():
+            chapters.setdefault(chapter, {"stages": dict.fromkeys(STAGES, 0.0)})
+            chapters[chapter]["tokens"] = _tokens(stats)
+        cpu = sum(stages[stage]["total"] for stage in CPU_STAGES)
+        return {
+            "elapsed": elapsed,
+            "cpu_share": cpu / elapsed if elapsed > 0 else 0.0,
+            "stages": stages,
+            "tokens": _tokens(self.usage),
+            "counters": counters,
+            "chapters": {str(chapter): chapters[chapter] for chapter in sorted(chapters, key=lambda c: (isinstance(c, str), c))},
+            "bottleneck": self.bottleneck(),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, prefix: str = "audiobook") -> str:
+        """Snapshot in the Prometheus text exposition format."""
+        snap = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_stage_seconds Time spent per pipeline stage.",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for stage, stats in snap["stages"].items():
+            for q in _QUANTILES:
+                lines.append(
+                    f'{prefix}_stage_seconds{{stage="{stage}",quantile="{q}"}} '
+                    f'{stats[f"p{int(q * 100)}"]:.6f}'
+                )
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {stats["total"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+
+        lines += [
+            f"# HELP {prefix}_chapter_stage_seconds_total Time spent per stage for each chapter.",
+            f"# TYPE {prefix}_chapter_stage_seconds_total counter",
+        ]
+        for chapter, data in snap["chapters"].items():
+            for stage, seconds in data["stages"].items():
+                lines.append(
+                    f'{prefix}_chapter_stage_seconds_total{{chapter="{_escape(chapter)}",stage="{stage}"}} '
+                    f"{seconds:.6f}"
+                )
+
+        lines += [
+            f"# HELP {prefix}_tokens_total Tokens reported in response usage.",
+            f"# TYPE {prefix}_tokens_total counter",
+        ]
+        for kind in ("prompt", "cached", "completion"):
+            lines.append(f'{prefix}_tokens_total{{kind="{kind}"}} {snap["tokens"][kind]}')
+
+        lines += [
+            f"# HELP {prefix}_chapter_tokens_total Tokens reported in response usage for each chapter.",
+            f"# TYPE {prefix}_chapter_tokens_total counter",
+        ]
+        for chapter, data in snap["chapters"].items():
+            for kind in ("prompt", "cached", "completion"):
+                value = data.get("tokens", {}).get(kind, 0)
+                lines.append(
+                    f'{prefix}_chapter_tokens_total{{chapter="{_escape(chapter)}",kind="{kind}"}} {value}'
+                )
+
+        lines += [
+            f"# HELP {prefix}_events_total Requests, errors and throttles.",
+            f"# TYPE {prefix}_events_total counter",
+        ]
+        for name, value in sorted(snap["counters"].items()):
+            lines.append(f'{prefix}_events_total{{event="{name}"}} {value}')
+
+        lines += [
+            f"# HELP {prefix}_elapsed_seconds Wall-clock time of the run so far.",
+            f"# TYPE {prefix}_elapsed_seconds gauge",
+            f"{prefix}_elapsed_seconds {snap['elapsed']:.6f}",
+            f"# HELP {prefix}_bottleneck Which resource limits the run (1 for the current verdict).",
+            f"# TYPE {prefix}_bottleneck gauge",
+        ]
+        for kind in _BOTTLENECK_NAMES:
+            lines.append(f'{prefix}_bottleneck{{kind="{kind}"}} {int(kind == snap["bottleneck"])}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str) -> None:
+        """Write a snapshot to *path*: Prometheus text for ``.prom``/``.txt``, JSON otherwise."""
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def summary(self) -> str:
+        """Chinese multi-line summary for the log."""
+        snap = self.snapshot()
+        parts = []
+        for stage in STAGES:
+            stats = snap["stages"][stage]
+            if stats["count"]:
+                parts.append(
+                    f"{_STAGE_NAMES[stage]} {stats['total']:.1f}s"
+                    f"（{stats['count']} 次，p95 {stats['p95'] * 1000:.0f}ms）"
+                )
+        bottleneck = snap["bottleneck"]
+        verdict = _BOTTLENECK_NAMES[bottleneck] if bottleneck else "暂无请求"
+        return (
+            f"阶段耗时（累计，{snap['elapsed']:.1f}s 内，CPU 占比 {snap['cpu_share']:.0%}）: "
+            + ("，".join(parts) or "无")
+            + f"\n瓶颈判断: {verdict}"
+        )
+
+
+def _tokens(stats: UsageStats) -> dict:
+    return {
+        "requests": stats.requests,
+        "prompt": stats.prompt_tokens,
+        "cached": stats.cached_tokens,
+        "completion": stats.completion_tokens,
+    }
+
+
+def _escape(label: str) -> str:
+    """Escape a Prometheus label value."""
+    return label.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -6,8 +6,14 @@ No file I/O, no global state.
 
 from __future__ import annotations
 
+import copy
 import json
 import re
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Iterator
 from fuzzywuzzy import fuzz
 
 
@@ -60,12 +66,8 @@ delay: 整数，该语音结束后的停顿时间（毫秒）。
 抖包袱: [0.3, 0.0, 0.0, 0.0, 0.0, 0.0, 0.2, 0.0] （轻松愉快带惊喜）
 
 三、内容处理与技术要求
-长段落拆分:
-任何超过80个字的段落必须被拆分。
-拆分点应在自然的停顿处（如句号、逗号后），确保每段在60-80字以内。
-重要: 由同一个长段落拆分出的所有片段，其 speaker 和 emo_vector 必须完全相同。
-内容与标点:
-content 字段中只保留 ，、、、。、！、？ 和 ... 这几种标点符号。
+段落与标点:
+同一说话者、同一情感的连续文字合并为一个对象输出，不要拆分长段落，也不必删改标点（程序会统一拆分并整理标点）。
 原文中的所有英文引号 " 必须在JSON中转义为 \"。
 停顿 (delay):
 旁白 delay 通常在 300-800ms。
@@ -88,6 +90,149 @@ JSON
 """
 
 
+# ============================================================
+# TitleIndex  (candidate pre-filter for split_by_fuzzy_matching)
+# ============================================================
+class TitleIndex:
+    """Character inverted index over a chapter title list.
+
+    ``fuzz.ratio`` is ``round(100 * 2M / (len(a) + len(b)))`` where *M* is
+    the number of matched characters.  *M* can never exceed the size of
+    the multiset intersection of the two strings' characters, nor the
+    shorter string's length, so both give a provable upper bound on the
+    score.  :meth:`candidates` uses these bounds to discard titles that
+    cannot reach the threshold before any exact scoring happens.
+    """
+
+    def __init__(self, chapter_titles: list[str]) -> None:
+        self.titles = list(chapter_titles)
+        # Title positions sorted by length, for the length-window filter
+        self._by_length = sorted(
+            range(len(self.titles)), key=lambda i: len(self.titles[i])
+        )
+        self._sorted_lengths = [len(self.titles[i]) for i in self._by_length]
+        # char -> [(title_position, occurrences)]
+        self._postings: dict[str, list[tuple[int, int]]] = {}
+        for pos, title in enumerate(self.titles):
+            for ch, count in Counter(title).items():
+                self._postings.setdefault(ch, []).append((pos, count))
+
+    def candidates(self, line: str, threshold: int) -> list[str]:
+        """Return the titles that may score ``>= threshold`` against *line*.
+
+        Titles are returned in their original order so that tie-breaking
+        on equal scores is unchanged.
+        """
+        # round() can lift a score of threshold - 0.5 up to threshold
+        floor = threshold - 0.5 - 1e-9
+        if floor <= 0:
+            return self.titles
+        if floor > 100:
+            return []
+
+        # -- 1. Length window: 200 * min(l, t) / (l + t) >= floor --
+        n = len(line)
+        lo = bisect_left(self._sorted_lengths, floor * n / (200 - floor))
+        hi = bisect_right(self._sorted_lengths, n * (200 - floor) / floor)
+        if lo >= hi:
+            return []
+        in_window = set(self._by_length[lo:hi])
+
+        # -- 2. Shared character counts from the postings --
+        shared: dict[int, int] = {}
+        for ch, count in Counter(line).items():
+            for pos, title_count in self._postings.get(ch, ()):
+                if pos in in_window:
+                    shared[pos] = shared.get(pos, 0) + min(count, title_count)
+
+        return [
+            self.titles[pos]
+            for pos in sorted(shared)
+            if 200.0 * shared[pos] / (n + len(self.titles[pos])) >= floor
+        ]
+
+
+# ============================================================
+# score_lines  (line-by-title scoring for split_by_fuzzy_matching)
+# ============================================================
+# Below this many lines a process pool costs more than it saves
+_PARALLEL_MIN_LINES = 2000
+# Blocks per worker, so one slow block does not hold up the whole pool
+_BLOCKS_PER_WORKER = 4
+
+
+def score_lines(
+    text_lines: list[str],
+    chapter_titles: list[str],
+    threshold: int = 40,
+    offset: int = 0,
+) -> list[tuple[int, str, int]]:
+    """Score every non-empty line against the chapter titles.
+
+    Returns ``(line_index, best_title, best_score)`` for each line whose
+    best score reaches *threshold*, in line order.  *offset* is added to
+    the line indices so a block of a larger book can be scored on its own.
+    """
+    index = TitleIndex(chapter_titles)
+    matches: list[tuple[int, str, int]] = []
+
+    for idx, raw_line in enumerate(text_lines, start=offset):
+        line = raw_line.strip()
+        if not line:
+            continue
+
+        best_match_title, best_match_score = _best_title(line, index, threshold)
+        if best_match_score >= threshold:
+            matches.append((idx, best_match_title, best_match_score))
+
+    return matches
+
+
+def _best_title(line: str, index: TitleIndex, threshold: int) -> tuple[str, int]:
+    """Return ``(title, score)`` of the first highest-scoring title.
+
+    Only titles whose score upper bound reaches *threshold* are scored,
+    so a best score below *threshold* is not meaningful.
+    """
+    best_match_score = 0
+    best_match_title = ""
+
+    for title in index.candidates(line, threshold):
+        score = fuzz.ratio(line, title)
+        if score > best_match_score:
+            best_match_score = score
+            best_match_title = title
+
+    return best_match_title, best_match_score
+
+
+def _score_lines_parallel(
+    text_lines: list[str],
+    chapter_titles: list[str],
+    threshold: int,
+    workers: int,
+    scorer=score_lines,
+) -> list[tuple]:
+    """Run *scorer* (:func:`score_lines` by default) over contiguous
+    blocks in a process pool.
+
+    Blocks are merged back in line order, so the result is identical to
+    a single-process run.
+    """
+    n_blocks = workers * _BLOCKS_PER_WORKER
+    block_size = -(-len(text_lines) // n_blocks)
+    offsets = list(range(0, len(text_lines), block_size))
+    blocks = [text_lines[start:start + block_size] for start in offsets]
+
+    matches: list[tuple] = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for block_matches in executor.map(
+            scorer, blocks, repeat(chapter_titles), repeat(threshold), offsets,
+        ):
+            matches.extend(block_matches)
+    return matches
+
+
 # ============================================================
 # split_by_fuzzy_matching  (ported from split_chaps.py)
 # ============================================================
@@ -95,6 +240,7 @@ def split_by_fuzzy_matching(
     text_lines: list[str],
     chapter_titles: list[str],
     threshold: int = 40,
+    workers: int = 1,
 ) -> list[dict]:
     """Split book text into chapters using fuzzy title matching.
 
@@ -106,6 +252,10 @@ def split_by_fuzzy_matching(
         List of chapter title strings.
     threshold : int, optional
         Fuzzy match threshold (default 40).
+    workers : int, optional
+        Number of processes used for scoring (default 1).  Values above
+        1 shard the lines into contiguous blocks scored in a process
+        pool; the result is the same as a single-process run.
 
     Returns
     -------
@@ -113,28 +263,28 @@ def split_by_fuzzy_matching(
         Each dict has keys: index (1-based), title (str), content (str),
         line_start (int), line_end (int).
     """
+    if workers > 1 and len(text_lines) >= _PARALLEL_MIN_LINES:
+        matches = _score_lines_parallel(text_lines, chapter_titles, threshold, workers)
+    else:
+        matches = score_lines(text_lines, chapter_titles, threshold)
+
+    return _chapters_from_matches(text_lines, chapter_titles, matches)
+
+
+def _chapters_from_matches(
+    text_lines: list[str],
+    chapter_titles: list[str],
+    matches: list[tuple[int, str, int]],
+) -> list[dict]:
+    """Build chapter dicts from :func:`score_lines` output (in line order)."""
     # -- 1. Collect potential split points: title -> [(line_index, score)] --
     split_points: dict[str, list[tuple[int, int]]] = {
         title: [] for title in chapter_titles
     }
 
-    for idx, raw_line in enumerate(text_lines):
-        line = raw_line.strip()
-        if not line:
-            continue
-
-        best_match_score = 0
-        best_match_title = ""
-
-        for title in chapter_titles:
-            score = fuzz.ratio(line, title)
-            if score > best_match_score:
-                best_match_score = score
-                best_match_title = title
-
-        # 2. If best score >= threshold, record as potential split
-        if best_match_score >= threshold:
-            split_points[best_match_title].append((idx, best_match_score))
+    # 2. Lines whose best score reached the threshold are potential splits
+    for idx, title, score in matches:
+        split_points[title].append((idx, score))
 
     # -- 3. For each title, pick the point with highest score --
     final_split_points: list[tuple[int, str]] = []
@@ -146,6 +296,14 @@ def split_by_fuzzy_matching(
     # -- 4. Sort split points by line number --
     final_split_points.sort(key=lambda x: x[0])
 
+    return _chapters_from_split_points(text_lines, final_split_points)
+
+
+def _chapters_from_split_points(
+    text_lines: list[str],
+    final_split_points: list[tuple[int, str]],
+) -> list[dict]:
+    """Cut *text_lines* at ``(line_index, title)`` points sorted by line."""
     # -- 5. Walk through lines, splitting at each split point --
     chapters: list[dict] = []
     current_chapter_lines: list[str] = []
@@ -196,59 +354,506 @@ def split_by_fuzzy_matching(
     return chapters
 
 
+# ============================================================
+# align_titles_to_lines  (order-preserving title alignment)
+# ============================================================
+def candidate_pairs(
+    text_lines: list[str],
+    chapter_titles: list[str],
+    threshold: int = 40,
+    offset: int = 0,
+) -> list[tuple[int, int, int]]:
+    """Return every ``(line_index, title_position, score)`` with
+    ``score >= threshold``, ordered by line then title position.
+
+    Unlike :func:`score_lines`, a line keeps all titles that reach the
+    threshold, not just its best one.
+    """
+    index = TitleIndex(chapter_titles)
+    positions: dict[str, list[int]] = {}
+    for pos, title in enumerate(chapter_titles):
+        positions.setdefault(title, []).append(pos)
+
+    pairs: list[tuple[int, int, int]] = []
+    for idx, raw_line in enumerate(text_lines, start=offset):
+        line = raw_line.strip()
+        if not line:
+            continue
+        line_pairs = []
+        for title in dict.fromkeys(index.candidates(line, threshold)):
+            score = fuzz.ratio(line, title)
+            if score >= threshold:
+                line_pairs.extend((idx, pos, score) for pos in positions[title])
+        line_pairs.sort()
+        pairs.extend(line_pairs)
+    return pairs
+
+
+def align_titles_to_lines(
+    text_lines: list[str],
+    chapter_titles: list[str],
+    threshold: int = 40,
+    workers: int = 1,
+) -> list[tuple[int, str]]:
+    """Assign titles to lines, keeping the table-of-contents order.
+
+    Finds the assignment with the largest total score among those where
+    both line numbers and title positions strictly increase.  Titles with
+    no candidate line (or that would break the order) are left out.  This
+    is a maximum-weight increasing chain over the sparse candidate pairs,
+    solved in one pass with a Fenwick tree of prefix maxima, so it costs
+    ``O(K log T)`` for ``K`` candidates and ``T`` titles.
+
+    Returns
+    -------
+    list[tuple[int, str]]
+        ``(line_index, title)`` split points sorted by line.
+    """
+    if workers > 1 and len(text_lines) >= _PARALLEL_MIN_LINES:
+        pairs = _score_lines_parallel(
+            text_lines, chapter_titles, threshold, workers, scorer=candidate_pairs,
+        )
+    else:
+        pairs = candidate_pairs(text_lines, chapter_titles, threshold)
+    return _align_candidate_pairs(pairs, chapter_titles)
+
+
+def _align_candidate_pairs(
+    pairs: list[tuple[int, int, int]],
+    chapter_titles: list[str],
+) -> list[tuple[int, str]]:
+    """DP step of :func:`align_titles_to_lines` over :func:`candidate_pairs`."""
+    n_titles = len(chapter_titles)
+    # Fenwick tree over title positions 1..n: (best total, pair id)
+    tree_total = [0] * (n_titles + 1)
+    tree_pair = [-1] * (n_titles + 1)
+
+    def query(pos: int) -> tuple[int, int]:
+        """Best chain over title positions ``< pos``."""
+        best_total, best_pair = 0, -1
+        while pos > 0:
+            if tree_total[pos] > best_total:
+                best_total, best_pair = tree_total[pos], tree_pair[pos]
+            pos -= pos & -pos
+        return best_total, best_pair
+
+    def update(pos: int, total: int, pair_id: int) -> None:
+        pos += 1
+        while pos <= n_titles:
+            if total > tree_total[pos]:
+                tree_total[pos], tree_pair[pos] = total, pair_id
+            pos += pos & -pos
+
+    totals = [0] * len(pairs)
+    back = [-1] * len(pairs)
+    start = 0
+    while start < len(pairs):
+        # All pairs on one line are queried before any is stored, so a
+        # chain never uses the same line twice
+        end = start
+        while end < len(pairs) and pairs[end][0] == pairs[start][0]:
+            end += 1
+        for k in range(start, end):
+            _idx, pos, score = pairs[k]
+            prev_total, prev_pair = query(pos)
+            totals[k] = prev_total + score
+            back[k] = prev_pair
+        for k in range(start, end):
+            update(pairs[k][1], totals[k], k)
+        start = end
+
+    split_points: list[tuple[int, str]] = []
+    _total, pair_id = query(n_titles)
+    while pair_id != -1:
+        idx, pos, _score = pairs[pair_id]
+        split_points.append((idx, chapter_titles[pos]))
+        pair_id = back[pair_id]
+    split_points.reverse()
+    return split_points
+
+
+def split_by_title_alignment(
+    text_lines: list[str],
+    chapter_titles: list[str],
+    threshold: int = 40,
+    workers: int = 1,
+) -> list[dict]:
+    """Split book text at the order-preserving title alignment.
+
+    Same inputs and output format as :func:`split_by_fuzzy_matching`, but
+    split points come from :func:`align_titles_to_lines`, so chapters
+    always follow the table-of-contents order.
+    """
+    split_points = align_titles_to_lines(text_lines, chapter_titles, threshold, workers)
+    return _chapters_from_split_points(text_lines, split_points)
+
+
+# ============================================================
+# split_by_heading_patterns  (heading detection, no TOC needed)
+# ============================================================
+# Preset heading patterns, matched against whole lines (re.MULTILINE)
+HEADING_PATTERNS: dict[str, str] = {
+    "chinese": r"^[ \t\u3000]*第[0-9０-９零〇一二三四五六七八九十百千万两]+[章节回讲卷篇集部].*",
+    "markdown1": r"^#[ \t]+\S.*",
+    "markdown2": r"^#{1,2}[ \t]+\S.*",
+    "markdown3": r"^#{1,3}[ \t]+\S.*",
+    "numbered": r"^[ \t\u3000]*(?:\d+(?:\.\d+)*[.、]?|[一二三四五六七八九十]+、)[ \t\u3000]*[^\s\d.、].{0,40}$",
+    "english": r"^[ \t]*(?:Chapter|CHAPTER)[ \t]+(?:\d+|[IVXLC]+)\b.*",
+}
+
+def _strip_lines(text: str) -> str:
+    """*text* with every line stripped and blank lines dropped."""
+    return "\n".join(filter(None, (line.strip() for line in text.split("\n"))))
+
+
+def compile_heading_patterns(patterns: list[str]) -> re.Pattern:
+    """Compile *patterns* into one multiline regex.
+
+    Each entry is either a :data:`HEADING_PATTERNS` preset name or a raw
+    regular expression matched against whole lines.  Blank entries are
+    ignored.  Raises ``ValueError`` when no pattern is left (an empty
+    regex would match every line), one of them is not a valid regex, or
+    they cannot be combined (e.g. inline global flags like ``(?i)``).
+    """
+    sources = [HEADING_PATTERNS.get(p, p) for p in patterns if p and p.strip()]
+    if not sources:
+        raise ValueError("no heading pattern given")
+    for src in sources:
+        try:
+            re.compile(src)
+        except re.error as e:
+            raise ValueError(f"invalid heading pattern {src!r}: {e}") from None
+    try:
+        return re.compile("|".join(f"(?:{src})" for src in sources), re.MULTILINE)
+    except re.error as e:
+        raise ValueError(f"heading patterns cannot be combined: {e}") from None
+
+
+def split_by_heading_patterns(text: str, patterns: list[str]) -> list[dict]:
+    """Split book text at lines matching heading *patterns*.
+
+    A single regex pass finds all headings, so this runs in linear time
+    and needs no chapter title list.  Chapter content is normalized like
+    :func:`split_by_fuzzy_matching` (lines stripped, blank lines dropped)
+    and the dicts have the same keys.  Markdown ``#`` marks are removed
+    from the titles.
+    """
+    regex = compile_heading_patterns(patterns)
+    chapters: list[dict] = []
+    current_chapter_title = "扉页"
+    chapter_num = 1
+    start = 0
+    line_start = 0
+    line_no = 0
+    counted_to = 0
+
+    def save_chapter(end: int, line_end: int) -> None:
+        content = _strip_lines(text[start:end])
+        if content:
+            chapters.append({
+                "index": chapter_num,
+                "title": current_chapter_title,
+                "content": content,
+                "line_start": line_start,
+                "line_end": line_end,
+            })
+
+    for m in regex.finditer(text):
+        title = m.group(0).strip().lstrip("#").strip()
+        if not title:
+            continue
+        line_no += text.count("\n", counted_to, m.start())
+        counted_to = m.start()
+
+        save_chapter(m.start(), line_no - 1)
+        current_chapter_title = title
+        start = m.start()
+        line_start = line_no
+        chapter_num += 1
+
+    # -- Handle the last chapter --
+    save_chapter(len(text), text.count("\n") - text.endswith("\n"))
+    return chapters
+
+
+# ============================================================
+# SplitScoreTable  (cached scores for instant re-splits)
+# ============================================================
+class SplitScoreTable:
+    """Cached ``line -> (best_title, best_score)`` table for one book.
+
+    The table is scored once at *floor* (the threshold slider's lower
+    bound).  Since a line's best title does not depend on the threshold,
+    :meth:`split` at any threshold ``>= floor`` only filters the table and
+    gives the same chapters as :func:`split_by_fuzzy_matching`.
+    :meth:`update_titles` rescores only what an added or removed title can
+    change instead of the whole book.
+    """
+
+    def __init__(
+        self,
+        text_lines: list[str],
+        chapter_titles: list[str],
+        floor: int = 20,
+        workers: int = 1,
+    ) -> None:
+        self.text_lines = text_lines
+        self.titles = list(chapter_titles)
+        self.floor = floor
+        self._workers = workers
+        self._stripped = [raw_line.strip() for raw_line in text_lines]
+        self._best: dict[int, tuple[str, int]] = {}
+        self._rescore_all()
+
+    def _rescore_all(self) -> None:
+        if self._workers > 1 and len(self.text_lines) >= _PARALLEL_MIN_LINES:
+            matches = _score_lines_parallel(
+                self.text_lines, self.titles, self.floor, self._workers,
+            )
+        else:
+            matches = score_lines(self.text_lines, self.titles, self.floor)
+        self._best = {idx: (title, score) for idx, title, score in matches}
+
+    def copy(self) -> SplitScoreTable:
+        """Return a table that can be updated without affecting this one.
+
+        The book lines are shared; only the titles and scores are copied,
+        so a background thread can rescore the copy while this table
+        keeps serving :meth:`split`.
+        """
+        clone = copy.copy(self)
+        clone.titles = list(self.titles)
+        clone._best = dict(self._best)
+        return clone
+
+    def split(self, threshold: int) -> list[dict]:
+        """Return the chapters for *threshold* without rescoring.
+
+        A threshold below the table's floor lowers the floor and rescores
+        the book once.
+        """
+        if threshold < self.floor:
+            self.floor = threshold
+            self._rescore_all()
+
+        matches = [
+            (idx, title, score)
+            for idx, (title, score) in sorted(self._best.items())
+            if score >= threshold
+        ]
+        return _chapters_from_matches(self.text_lines, self.titles, matches)
+
+    def update_titles(self, chapter_titles: list[str]) -> None:
+        """Switch to *chapter_titles*, rescoring incrementally.
+
+        Lines whose best title was removed are rescored against the new
+        list; every other line is only scored against the added titles.
+        Reordering the titles that were kept can change tie-breaking, so
+        it falls back to a full rescore.
+        """
+        new_titles = list(chapter_titles)
+        if new_titles == self.titles:
+            return
+
+        old_set = set(self.titles)
+        new_set = set(new_titles)
+        kept_old = [title for title in self.titles if title in new_set]
+        kept_new = [title for title in new_titles if title in old_set]
+        self.titles = new_titles
+        if kept_old != kept_new:
+            self._rescore_all()
+            return
+
+        removed = old_set - new_set
+        added = [title for title in dict.fromkeys(new_titles) if title not in old_set]
+        # First position wins on equal scores, as in score_lines
+        position: dict[str, int] = {}
+        for pos, title in enumerate(new_titles):
+            position.setdefault(title, pos)
+
+        # -- 1. Lines that lost their best title: rescore against all titles --
+        orphaned = [idx for idx, (title, _) in self._best.items() if title in removed]
+        if orphaned:
+            index = TitleIndex(new_titles)
+            for idx in orphaned:
+                title, score = _best_title(self._stripped[idx], index, self.floor)
+                if score >= self.floor:
+                    self._best[idx] = (title, score)
+                else:
+                    del self._best[idx]
+
+        # -- 2. Every other line: score against the added titles only --
+        if not added:
+            return
+        rescored = set(orphaned)
+        added_index = TitleIndex(added)
+        for idx, line in enumerate(self._stripped):
+            if not line or idx in rescored:
+                continue
+            for title in added_index.candidates(line, self.floor):
+                score = fuzz.ratio(line, title)
+                if score < self.floor:
+                    continue
+                current = self._best.get(idx)
+                if (
+                    current is None
+                    or score > current[1]
+                    or (score == current[1] and position[title] < position[current[0]])
+                ):
+                    self._best[idx] = (title, score)
+
+
 # ============================================================
 # split_text_into_chunks  (from txt2json_openrouter.py)
 # ============================================================
+# A run of sentence-ending punctuation / newlines closes a sentence
+_SENTENCE_END = re.compile(r'[。！？!?\n]+')
+
+
+def iter_chunk_spans(text: str, max_size: int = 8000) -> Iterator[tuple[int, int]]:
+    """Yield ``(start, end)`` offsets of chunks of *text*.
+
+    Sentences (ending in a run of 。！？!?\\n) are grouped into chunks of
+    at most *max_size* characters; a single longer sentence becomes its
+    own chunk.  The text is scanned once with a compiled regex iterator
+    and nothing but the two offsets is kept, so chunks are produced
+    lazily in linear time.
+    """
+    chunk_start = 0
+    chunk_end = 0
+
+    for m in _SENTENCE_END.finditer(text):
+        # Current chunk + next sentence = text[chunk_start:m.end()]
+        if m.end() - chunk_start > max_size:
+            if chunk_end > chunk_start:
+                yield chunk_start, chunk_end
+            chunk_start = chunk_end
+        chunk_end = m.end()
+
+    # Trailing text without closing punctuation
+    if len(text) - chunk_start > max_size and chunk_end > chunk_start:
+        yield chunk_start, chunk_end
+        chunk_start = chunk_end
+    if len(text) > chunk_start:
+        yield chunk_start, len(text)
+
+
+def iter_chunks(text: str, max_size: int = 8000) -> Iterator[str]:
+    """Yield the chunk strings of :func:`iter_chunk_spans` one at a time."""
+    for start, end in iter_chunk_spans(text, max_size):
+        yield text[start:end]
+
+
 def split_text_into_chunks(text: str, max_size: int = 8000) -> list[str]:
     """Split *text* by sentence boundaries and group into chunks under
     *max_size* characters.
 
     Sentence boundaries are: 。！？!?\\n
     """
-    sentences = re.split(r'([。！？!?\n]+)', text)
+    return list(iter_chunks(text, max_size))
+
+
+# ============================================================
+# extract_json_from_response  (from txt2json_openrouter.py)
+# ============================================================
+_JSON_DECODER = json.JSONDecoder()
+
+# Characters that change bracket-matching state outside / inside a string
+_JSON_STRUCTURAL = re.compile(r'["\[\]{}]')
+_JSON_IN_STRING = re.compile(r'["\\]')
 
-    chunks: list[str] = []
-    current_chunk = ""
 
-    for i in range(0, len(sentences), 2):
-        sentence_text = sentences[i]
-        punctuation = sentences[i + 1] if i + 1 < len(sentences) else ""
-        full_sentence = sentence_text + punctuation
+def _match_bracket(content: str, start: int) -> int | None:
+    """Index just past the bracket closing ``content[start]``, or None.
 
-        if len(current_chunk) + len(full_sentence) > max_size:
-            if current_chunk:
-                chunks.append(current_chunk)
-            current_chunk = full_sentence
+    Single forward pass that skips string literals (and their escapes),
+    jumping between structural characters with a compiled regex.
+    """
+    depth = 0
+    pos = start
+    n = len(content)
+    while pos < n:
+        m = _JSON_STRUCTURAL.search(content, pos)
+        if m is None:
+            return None
+        c = m.group()
+        pos = m.end()
+        if c == '"':
+            while True:
+                s = _JSON_IN_STRING.search(content, pos)
+                if s is None:
+                    return None
+                if s.group() == '"':
+                    pos = s.end()
+                    break
+                pos = s.end() + 1  # skip the escaped character
+        elif c in "[{":
+            depth += 1
         else:
-            current_chunk += full_sentence
+            depth -= 1
+            if depth == 0:
+                return pos
+    return None
 
-    if current_chunk:
-        chunks.append(current_chunk)
 
-    return chunks
+def _scan_json_array(content: str) -> tuple[list, int, int] | None:
+    """``(value, start, end)`` of the first top-level array of objects.
+
+    Falls back to the first parseable array of any kind, so a ``[1]``
+    footnote in leading prose does not shadow the real answer.
+    """
+    fallback = None
+    pos = content.find("[")
+    while pos != -1:
+        try:
+            value, end = _JSON_DECODER.raw_decode(content, pos)
+        except ValueError:
+            end = _match_bracket(content, pos)
+            if end is None:
+                break  # unterminated: a truncated response
+        else:
+            if value and all(isinstance(item, dict) for item in value):
+                return value, pos, end
+            if fallback is None:
+                fallback = (value, pos, end)
+        pos = content.find("[", end)
+    return fallback
+
+
+def find_json_array(content: str) -> tuple[int, int] | None:
+    """Locate the outermost parseable JSON array in *content*.
+
+    Leading prose, code fences and trailing junk are skipped.  Each
+    top-level ``[`` is parsed in place with ``JSONDecoder.raw_decode``
+    (no slice copy); candidates that do not parse, such as a ``[注]`` in
+    prose, are bracket-matched and stepped over, so every character is
+    visited a bounded number of times.  An array of objects is preferred
+    over an earlier array of scalars.  An unterminated ``[`` ends the
+    search, since inner arrays of a truncated response are not the
+    answer.
+
+    Returns
+    -------
+    tuple[int, int] or None
+        ``(start, end)`` of the array, or None if there is none.
+    """
+    found = _scan_json_array(content)
+    return None if found is None else found[1:]
 
 
-# ============================================================
-# extract_json_from_response  (from txt2json_openrouter.py)
-# ============================================================
 def extract_json_from_response(content: str) -> list | None:
     """Try to parse a JSON array from an LLM response string.
 
-    First attempts ``json.loads(content)``; on failure falls back to a
-    regex search for a ``[...]`` pattern.
+    First attempts ``json.loads(content)``; on failure falls back to
+    :func:`find_json_array`, a linear bracket- and string-aware scan.
     """
     try:
         return json.loads(content)
     except Exception:
         pass
 
-    m = re.search(r"(\[.*\])", content, flags=re.S)
-    if m:
-        try:
-            return json.loads(m.group(1))
-        except Exception:
-            pass
-    return None
+    found = _scan_json_array(content)
+    return None if found is None else found[0]
 
 
 # ============================================================
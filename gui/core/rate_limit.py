@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""
+Per-provider rate limiting shared by every worker.
+
+Each provider has one :class:`ProviderLimiter` (see
+:func:`get_provider_limiter`) combining
+
+* two token buckets, requests/minute and tokens/minute, debited before a
+  request is sent and corrected with the real usage afterwards;
+* an :class:`AIMDController` that grows the number of requests in flight
+  while responses are healthy and halves it on 429/5xx, pausing new
+  requests until ``Retry-After`` has passed.
+
+State is guarded by ``threading.Lock`` rather than asyncio primitives, so
+GUI workers running their own event loops in separate QThreads and the
+thread-pool based CLI scripts can all draw from the same limiter.  A
+request waiting for a slot sleeps until :meth:`AIMDController.release`
+(or a raised limit) wakes it, through ``call_soon_threadsafe`` on its own
+event loop, instead of polling.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+# Backoff used when a throttled response carries no Retry-After
+_DEFAULT_BACKOFF = 1.0
+_MAX_BACKOFF = 60.0
+
+
+class TokenBucket:
+    """A refilling budget of *per_minute* units, bursting up to *burst*.
+
+    :meth:`reserve` debits immediately and returns how long the caller
+    must wait for the debit to be covered, so concurrent callers queue up
+    behind each other instead of all waking at the same moment.
+    """
+
+    def __init__(self, per_minute: float, burst: float | None = None) -> None:
+        self.rate = per_minute / 60.0
+        self.capacity = burst if burst is not None else per_minute
+        self._level = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._level = min(self.capacity, self._level + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def reserve(self, amount: float) -> float:
+        """Debit *amount*; return seconds to wait before using it."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._level -= amount
+            return 0.0 if self._level >= 0 else -self._level / self.rate
+
+    def adjust(self, amount: float) -> None:
+        """Debit (positive) or refund (negative) *amount* after the fact."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._level -= amount
+
+
+class AIMDController:
+    """Additive-increase / multiplicative-decrease concurrency limit.
+
+    The limit starts at *initial* and doubles every window of successful
+    responses until the first throttle (slow start), then grows by one
+    per window.  A throttle halves it (once per cooldown, so a burst of
+    429s from the same window only counts once) and blocks new slots
+    until the cooldown ends.
+
+    Callers that find every slot taken queue a wake-up callback, which is
+    called when a slot may have become free.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 256,
+        decrease: float = 0.5,
+    ) -> None:
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.in_flight = 0
+        self._slow_start = True
+        self._cooldown_until = 0.0
+        self._backoff = _DEFAULT_BACKOFF
+        self._waiters: deque[Callable[[], None]] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def paused(self) -> bool:
+        """True while new requests are held back after a throttle."""
+        return time.monotonic() < self._cooldown_until
+
+    def try_acquire(self, waiter: Callable[[], None] | None = None) -> float | None:
+        """Take a slot and return 0.
+
+        During a throttle pause, return the seconds until it ends.  When
+        every slot is taken, queue *waiter* (if given) to be called once
+        one may be free and return None; the caller then tries again.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self._cooldown_until:
+                return self._cooldown_until - now
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return 0.0
+            if waiter is not None:
+                self._waiters.append(waiter)
+            return None
+
+    def cancel_wait(self, waiter: Callable[[], None]) -> None:
+        """Withdraw a queued *waiter*; if it was already called, pass the wake-up on."""
+        with self._lock:
+            try:
+                self._waiters.remove(waiter)
+                return
+            except ValueError:
+                pass
+        self._notify()
+
+    def _notify(self) -> None:
+        """Call as many queued waiters as there are free slots."""
+        with self._lock:
+            free = int(self.limit) - self.in_flight
+            woken = [self._waiters.popleft() for _ in range(min(free, len(self._waiters)))]
+        for wake in woken:
+            wake()
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+        self._notify()
+
+    def on_success(self) -> None:
+        with self._lock:
+            step = 1.0 if self._slow_start else 1.0 / self.limit
+            self.limit = min(self.maximum, self.limit + step)
+            self._backoff = _DEFAULT_BACKOFF
+        self._notify()
+
+    def on_throttle(self, retry_after: float | None = None) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if retry_after is None:
+                retry_after = self._backoff
+                self._backoff = min(_MAX_BACKOFF, self._backoff * 2)
+            if now >= self._cooldown_until:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+                self._slow_start = False
+            self._cooldown_until = max(self._cooldown_until, now + retry_after)
+
+
+class ProviderLimiter:
+    """Request, token and concurrency limits for one provider.
+
+    Parameters
+    ----------
+    rpm, tpm : float or None
+        Requests and tokens per minute; ``None`` disables that bucket.
+    initial_concurrency, max_concurrency : int
+        Starting and maximum in-flight requests for the AIMD controller.
+    """
+
+    def __init__(
+        self,
+        rpm: float | None = None,
+        tpm: float | None = None,
+        initial_concurrency: int = 4,
+        max_concurrency: int = 256,
+    ) -> None:
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.concurrency = AIMDController(initial_concurrency, maximum=max_concurrency)
+
+    @property
+    def paused(self) -> bool:
+        """True while the provider's ``Retry-After`` / backoff pause lasts."""
+        return self.concurrency.paused
+
+    def _reserve(self, tokens: int) -> float:
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None and tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        return wait
+
+    def _refund(self, tokens: int) -> None:
+        """Undo :meth:`_reserve` for a request that was never sent."""
+        if self.requests is not None:
+            self.requests.adjust(-1)
+        if self.tokens is not None and tokens:
+            self.tokens.adjust(-tokens)
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """Wait for a slot and for *tokens* of budget (asyncio)."""
+        loop = asyncio.get_running_loop()
+        while True:
+            woken = loop.create_future()
+            waiter = _future_waker(loop, woken)
+            wait = self.concurrency.try_acquire(waiter)
+            if wait == 0.0:
+                break
+            try:
+                if wait is None:
+                    await woken
+                else:
+                    await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                if wait is None:
+                    self.concurrency.cancel_wait(waiter)
+                raise
+        wait = self._reserve(tokens)
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # Cancelled before the request went out: give back the
+                # slot and the request/token budget
+                self.concurrency.release()
+                self._refund(tokens)
+                raise
+
+    def acquire_blocking(self, tokens: int = 0) -> None:
+        """Thread-blocking variant of :meth:`acquire`."""
+        while True:
+            woken = threading.Event()
+            wait = self.concurrency.try_acquire(woken.set)
+            if wait == 0.0:
+                break
+            if wait is None:
+                woken.wait()
+            else:
+                time.sleep(wait)
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    def release(
+        self,
+        status: str = "ok",
+        retry_after: float | None = None,
+        reserved_tokens: int = 0,
+        used_tokens: int | None = None,
+    ) -> None:
+        """Return the slot taken by :meth:`acquire`.
+
+        *status* is ``"ok"``, ``"throttled"`` (429/5xx; feeds the AIMD
+        controller along with *retry_after*) or ``"error"`` (anything
+        else; leaves the limit alone).  When *used_tokens* is known the
+        token bucket is corrected from the *reserved_tokens* estimate.
+        """
+        self.concurrency.release()
+        if status == "ok":
+            self.concurrency.on_success()
+        elif status == "throttled":
+            self.concurrency.on_throttle(retry_after)
+        if self.tokens is not None and used_tokens is not None:
+            self.tokens.adjust(used_tokens - reserved_tokens)
+
+
+def _future_waker(loop: asyncio.AbstractEventLoop, future: asyncio.Future) -> Callable[[], None]:
+    """Callback resolving *future* on its own *loop*, callable from any thread."""
+    def resolve() -> None:
+        if not future.done():
+            future.set_result(None)
+
+    def wake() -> None:
+        try:
+            loop.call_soon_threadsafe(resolve)
+        except RuntimeError:  # the loop has been closed
+            pass
+
+    return wake
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Seconds from a ``Retry-After`` header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+# Conservative defaults for each provider's default tier; override with
+# configure_provider_limiter() to match your account's quota.
+_DEFAULT_LIMITS: dict[str, dict] = {
+    "openrouter": {"rpm": 600, "tpm": None},
+    "gemini": {"rpm": 1000, "tpm": 1000000},
+    "qwen": {"rpm": 600, "tpm": 1000000},
+}
+
+_LIMITERS: dict[str, ProviderLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def configure_provider_limiter(provider: str, **limits) -> ProviderLimiter:
+    """Replace *provider*'s limiter; *limits* are :class:`ProviderLimiter` arguments."""
+    limiter = ProviderLimiter(**limits)
+    with _LIMITERS_LOCK:
+        _LIMITERS[provider.lower()] = limiter
+    return limiter
+
+
+def get_provider_limiter(provider: str) -> ProviderLimiter:
+    """Return the process-wide limiter for *provider*, creating it on first use."""
+    key = provider.lower()
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(key)
+        if limiter is None:
+            limiter = ProviderLimiter(**_DEFAULT_LIMITS.get(key, {}))
+            _LIMITERS[key] = limiter
+        return limiter
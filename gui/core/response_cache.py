@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Content-addressed on-disk cache of parsed LLM responses.
+
+Entries are keyed by a SHA-256 of everything that determines the model's
+output — provider, model, prompt template fingerprint, chunk text and
+sampling parameters — so re-running a book after editing one chapter only
+sends the changed chunks.  Values are the parsed JSON entries, stored in
+a single SQLite file; the least recently used entries are evicted once
+the file's payload exceeds ``max_bytes``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "audiobook-workshop"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Bump when the stored value format changes
+_CACHE_FORMAT = 1
+
+# Rows deleted per eviction query
+_EVICT_BATCH = 64
+
+
+def prompt_fingerprint(template: str) -> str:
+    """Short hash identifying a prompt template (spec + wrapper text)."""
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:16]
+
+
+def cache_key(
+    provider: str,
+    model: str,
+    template_version: str,
+    chunk_text: str,
+    params: dict,
+) -> str:
+    """Hash of every input that determines a chunk's response."""
+    payload = json.dumps(
+        [_CACHE_FORMAT, provider.lower(), model, template_version, chunk_text, params],
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Size-bounded LRU cache of parsed entries, shared across threads.
+
+    Parameters
+    ----------
+    path : str or Path
+        SQLite file; parent directories are created.
+    max_bytes : int
+        Upper bound on the total size of stored values.
+    """
+
+    def __init__(self, path: str | Path, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.path.parent, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_used)")
+        self._db.commit()
+        self._total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, key: str) -> list | None:
+        """Return the cached entries for *key*, or None on a miss."""
+        return self.get_any([key])
+
+    def get_any(self, keys: Iterable[str]) -> list | None:
+        """Return the entries of the first cached key in *keys*, or None.
+
+        Counts as a single lookup in the hit/miss statistics.
+        """
+        with self._lock:
+            for key in keys:
+                row = self._db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    break
+            else:
+                self.misses += 1
+                return None
+            self._db.execute(
+                "UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key),
+            )
+            self._db.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, entries: list) -> None:
+        """Store *entries* under *key*, evicting old entries if needed."""
+        value = json.dumps(entries, ensure_ascii=False)
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            old = self._db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            if old is not None:
+                self._total -= old[0]
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()),
+            )
+            self._total += size
+            self._evict()
+            self._db.commit()
+
+    def _evict(self) -> None:
+        while self._total > self.max_bytes:
+            rows = self._db.execute(
+                "SELECT key, size FROM entries ORDER BY last_used LIMIT ?", (_EVICT_BATCH,),
+            ).fetchall()
+            if not rows:
+                self._total = 0
+                return
+            for key, size in rows:
+                if self._total <= self.max_bytes:
+                    return
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._total -= size
+
+    def report(self) -> str:
+        """One-line hit/miss summary for the log."""
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0.0
+        return f"缓存命中 {self.hits} / 未命中 {self.misses} (命中率 {rate:.0f}%)"
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+"""
+Hedged requests and failover across several providers.
+
+A :class:`ProviderRouter` fronts one :class:`~gui.core.llm_engine.LLMEngine`
+per provider, in order of preference, with the same ``complete`` /
+``stream`` interface as a single engine:
+
+* **Hedging.**  Once a request has been outstanding longer than the
+  recent p95 latency of its provider, a duplicate goes to the next
+  provider and whichever first returns a response the caller accepts
+  (e.g. parseable JSON) wins; the other request is cancelled.  Latency
+  is tracked per character of the last message (the chunk), so short
+  gap-filling requests do not make long chunks look slow.  Hedges are
+  capped at :attr:`ProviderRouter.max_hedge_ratio` of all requests.
+* **Failover.**  Failed or rejected responses count as errors; once a
+  provider's error rate over its recent requests exceeds
+  *error_threshold*, it is skipped for *cooldown* seconds and the next
+  provider becomes primary.  A request whose provider fails outright is
+  retried on the next one at once.  Requests still queued for a slot are
+  rerouted when a failure of their provider is recorded (it was taken
+  out of rotation or its limiter paused after a throttle); they do not
+  poll for it.
+* **Streaming** (:meth:`ProviderRouter.stream`) only fails over between
+  requests: deltas already passed on cannot be taken back, so a stream
+  is never hedged or rerouted once started.
+
+With a single provider the router adds nothing but bookkeeping, so the
+workers always go through one.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import AsyncIterator, Callable
+
+from gui.core.budget import BudgetExceeded, BudgetGovernor
+from gui.core.llm_engine import DEFAULT_CONCURRENCY, LLMEngine
+from gui.core.metrics import PipelineMetrics
+from gui.core.usage import UsageStats
+
+HEDGE_QUANTILE = 0.95
+MAX_HEDGE_RATIO = 0.1
+ERROR_THRESHOLD = 0.5
+COOLDOWN_SECONDS = 60.0
+
+# Outcomes and latencies remembered per provider
+_WINDOW = 50
+# Samples needed before hedging on, or failing over from, a provider
+_MIN_LATENCY_SAMPLES = 10
+_MIN_ERROR_SAMPLES = 6
+
+
+def _size(prompt: str | list[dict]) -> int:
+    """Characters of the chunk: the prompt text or its last message."""
+    if isinstance(prompt, str):
+        return max(1, len(prompt))
+    return max(1, len(prompt[-1].get("content") or "")) if prompt else 1
+
+
+class _Member:
+    """One provider's engine and its recent health."""
+
+    def __init__(self, name: str, engine: LLMEngine) -> None:
+        self.name = name
+        self.engine = engine
+        self.rates: deque[float] = deque(maxlen=_WINDOW)   # seconds per character
+        self.outcomes: deque[bool] = deque(maxlen=_WINDOW)
+        self.down_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.wins = 0
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.down_until
+
+    def accepting(self, now: float) -> bool:
+        """Healthy and not paused by its rate limiter after a throttle."""
+        limiter = self.engine.limiter
+        return self.healthy(now) and not (limiter is not None and limiter.paused)
+
+    def hedge_delay(self, size: int, quantile: float) -> float | None:
+        """Seconds after which a request of *size* characters is late."""
+        if len(self.rates) < _MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(self.rates)
+        return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))] * size
+
+    def record(self, ok: bool, elapsed: float, size: int) -> None:
+        self.requests += 1
+        self.outcomes.append(ok)
+        if ok:
+            self.rates.append(elapsed / size)
+        else:
+            self.errors += 1
+
+    def error_rate(self) -> float | None:
+        if len(self.outcomes) < _MIN_ERROR_SAMPLES:
+            return None
+        return self.outcomes.count(False) / len(self.outcomes)
+
+
+class ProviderRouter:
+    """Route requests over *members*, ``(name, engine)`` pairs in preference order.
+
+    Parameters
+    ----------
+    members : list[tuple[str, LLMEngine]]
+        The first healthy member is the primary; later ones receive
+        hedges and failovers.
+    hedge_quantile : float
+        Latency quantile after which a request is hedged.
+    max_hedge_ratio : float
+        Upper bound on hedged requests as a fraction of all requests.
+    error_threshold : float
+        Error rate above which a provider is taken out of rotation.
+    cooldown : float
+        Seconds a failing provider stays out of rotation.
+    on_event : callable, optional
+        Called with a Chinese log line when a provider is taken out of rotation.
+
+    Closing the router (``async with``) closes every engine.
+    """
+
+    def __init__(
+        self,
+        members: list[tuple[str, LLMEngine]],
+        hedge_quantile: float = HEDGE_QUANTILE,
+        max_hedge_ratio: float = MAX_HEDGE_RATIO,
+        error_threshold: float = ERROR_THRESHOLD,
+        cooldown: float = COOLDOWN_SECONDS,
+        on_event: Callable[[str], None] | None = None,
+    ) -> None:
+        if not members:
+            raise ValueError("ProviderRouter needs at least one provider")
+        self._members = [_Member(name, engine) for name, engine in members]
+        self.usage = self._members[0].engine.usage
+        self.hedge_quantile = hedge_quantile
+        self.max_hedge_ratio = max_hedge_ratio
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self._on_event = on_event
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+        # Set (and replaced) whenever a provider failure is recorded, so
+        # queued requests can check whether to reroute
+        self._health_changed = asyncio.Event()
+
+    async def __aenter__(self) -> "ProviderRouter":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        for member in self._members:
+            await member.engine.aclose()
+
+    @property
+    def providers(self) -> list[str]:
+        return [member.name for member in self._members]
+
+    def _ordered(self) -> list[_Member]:
+        """Healthy members in preference order, then the others by recovery time."""
+        now = time.monotonic()
+        healthy = [m for m in self._members if m.healthy(now)]
+        resting = sorted((m for m in self._members if not m.healthy(now)), key=lambda m: m.down_until)
+        return healthy + resting
+
+    def _record(self, member: _Member, ok: bool, elapsed: float, size: int) -> None:
+        member.record(ok, elapsed, size)
+        if not ok:
+            self._health_changed.set()
+            self._health_changed = asyncio.Event()
+        rate = member.error_rate()
+        if rate is None or rate <= self.error_threshold or len(self._members) == 1:
+            return
+        member.down_until = time.monotonic() + self.cooldown
+        member.outcomes.clear()  # judged afresh when it comes back
+        self.failovers += 1
+        if self._on_event is not None:
+            self._on_event(
+                f"服务商 {member.name} 错误率 {rate:.0%}，暂停 {self.cooldown:.0f} 秒，"
+                f"切换到 {self._ordered()[0].name}"
+            )
+
+    async def _attempt(self, member, prompt, accept, params, size, on_send=None):
+        """One request to *member*: ``(text, accepted)``; raises on API errors.
+
+        Latency is measured from when the engine sends the request, not
+        from when it was queued behind the concurrency limit.
+        """
+        sent_at = None
+
+        def mark_sent():
+            nonlocal sent_at
+            sent_at = time.monotonic()
+            if on_send is not None:
+                on_send()
+
+        try:
+            text = await member.engine.complete(prompt, on_send=mark_sent, **params)
+        except BudgetExceeded:
+            raise  # not the provider's fault
+        except Exception:
+            self._record(member, False, 0.0, size)
+            raise
+        ok = accept is None or accept(text)
+        self._record(member, ok, time.monotonic() - (sent_at or time.monotonic()), size)
+        return text, ok
+
+    async def complete(
+        self,
+        prompt: str | list[dict],
+        accept: Callable[[str], bool] | None = None,
+        on_answer: Callable[[str, str], None] | None = None,
+        **params,
+    ) -> str:
+        """Send one chat completion, hedged and failed over as needed.
+
+        Returns the first reply *accept* approves of (any reply when
+        *accept* is None).  If no provider produced one, returns the
+        first reply received so the caller can salvage it, or raises the
+        first error when every request failed.  *on_answer* is called
+        with the provider name and model of the returned reply, so
+        callers can attribute (e.g. cache) it correctly.
+        """
+        self.calls += 1
+        size = _size(prompt)
+        order = self._ordered()
+        primary, backups = order[0], order[1:]
+
+        primary_sent: list[float] = []
+        sent = asyncio.Event()
+
+        def mark_sent() -> None:
+            primary_sent.append(time.monotonic())
+            sent.set()
+
+        running: dict[asyncio.Future, _Member] = {}
+
+        def launch(member: _Member, on_send=None) -> asyncio.Future:
+            task = asyncio.ensure_future(
+                self._attempt(member, prompt, accept, params, size, on_send)
+            )
+            running[task] = member
+            return task
+
+        primary_task = launch(primary, mark_sent)
+        may_hedge = bool(backups)
+        hedged = False
+        sent_waiter = None
+        health_waiter = None
+        fallback_text = None
+        fallback_member = None
+        first_error = None
+        try:
+            while running:
+                waiters = set(running)
+                timeout = None
+                hedge_due = False
+                queued = primary_task in running and not primary_sent
+                if queued and backups:
+                    if health_waiter is None or health_waiter.done():
+                        health_waiter = asyncio.ensure_future(self._health_changed.wait())
+                    waiters.add(health_waiter)
+                    if may_hedge:
+                        # The hedge clock starts once the primary is sent
+                        if sent_waiter is None:
+                            sent_waiter = asyncio.ensure_future(sent.wait())
+                        waiters.add(sent_waiter)
+                elif may_hedge and primary_sent:
+                    delay = primary.hedge_delay(size, self.hedge_quantile)
+                    if delay is None:
+                        may_hedge = False
+                    else:
+                        timeout = max(0.0, primary_sent[0] + delay - time.monotonic())
+                        hedge_due = True
+                done, _ = await asyncio.wait(
+                    waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED,
+                )
+                done.discard(sent_waiter)
+                done.discard(health_waiter)
+                if not done:
+                    if hedge_due:  # the primary is late
+                        may_hedge = False
+                        if (
+                            self.hedges < self.max_hedge_ratio * self.calls
+                            and backups[0].healthy(time.monotonic())
+                        ):
+                            self.hedges += 1
+                            hedged = True
+                            launch(backups.pop(0))
+                    elif queued and not primary_sent and not primary.accepting(time.monotonic()):
+                        # The primary failed or was throttled while this
+                        # request waited for one of its slots (woken by
+                        # the failure being recorded)
+                        del running[primary_task]
+                        primary_task.cancel()
+                        may_hedge = False
+                        launch(backups.pop(0))
+                    continue
+                for task in done:
+                    member = running.pop(task)
+                    try:
+                        text, ok = task.result()
+                    except Exception as e:
+                        first_error = first_error or e
+                        continue
+                    if ok:
+                        member.wins += 1
+                        if hedged and member is not primary:
+                            self.hedge_wins += 1
+                        if on_answer is not None:
+                            on_answer(member.name, member.engine.model)
+                        return text
+                    if fallback_text is None:
+                        fallback_text, fallback_member = text, member
+                if not running and backups:
+                    may_hedge = False
+                    launch(backups.pop(0))  # everything so far failed
+        finally:
+            for task in running:
+                task.cancel()
+            if sent_waiter is not None:
+                sent_waiter.cancel()
+            if health_waiter is not None:
+                health_waiter.cancel()
+        if fallback_text is not None:
+            if on_answer is not None:
+                on_answer(fallback_member.name, fallback_member.engine.model)
+            return fallback_text
+        raise first_error
+
+    async def stream(
+        self,
+        prompt: str | list[dict],
+        on_answer: Callable[[str, str], None] | None = None,
+        **params,
+    ) -> AsyncIterator[str]:
+        """Stream from the current primary (failover only, no hedging).
+
+        Deltas already passed on cannot be taken back, so a second stream
+        is never raced against the first.  *on_answer* is as for
+        :meth:`complete`, called with the first delta.
+        """
+        member = self._ordered()[0]
+        size = _size(prompt)
+        sent_at = []
+        answered = False
+        try:
+            async for delta in member.engine.stream(
+                prompt, on_send=lambda: sent_at.append(time.monotonic()), **params,
+            ):
+                if not answered:
+                    answered = True
+                    if on_answer is not None:
+                        on_answer(member.name, member.engine.model)
+                yield delta
+        except BudgetExceeded:
+            raise
+        except Exception:
+            self._record(member, False, 0.0, size)
+            raise
+        self._record(member, True, time.monotonic() - sent_at[0], size)
+
+    def report(self) -> str:
+        """Chinese one-line summary for the log."""
+        parts = [
+            f"{m.name} {m.requests} 次（失败 {m.errors}，采用 {m.wins}）" for m in self._members
+        ]
+        return (
+            "服务商路由: " + "，".join(parts)
+            + f"；对冲 {self.hedges} 次，备用胜出 {self.hedge_wins} 次；故障切换 {self.failovers} 次"
+        )
+
+
+def build_router(
+    endpoints: list[dict],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    on_event: Callable[[str], None] | None = None,
+    metrics: PipelineMetrics | None = None,
+    budget: BudgetGovernor | None = None,
+    **options,
+) -> ProviderRouter:
+    """Router over *endpoints*, dicts with provider, api_key, base_url and model.
+
+    The engines share one :class:`~gui.core.usage.UsageStats` (and
+    *metrics* and *budget*, if given), each draws from its own provider's
+    rate limiter and is charged at its own provider's price.
+    """
+    usage = UsageStats()
+    members = [
+        (
+            endpoint["provider"],
+            LLMEngine(
+                endpoint["api_key"], endpoint["base_url"], endpoint["model"],
+                concurrency=concurrency, provider=endpoint["provider"], usage=usage,
+                metrics=metrics, budget=budget,
+            ),
+        )
+        for endpoint in endpoints
+    ]
+    return ProviderRouter(members, on_event=on_event, **options)
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming chapter splitting for very large books.
+
+The book is memory-mapped and scanned line by line twice: the first pass
+scores lines against the chapter titles (keeping only the matches), the
+second pass writes each chapter file as soon as its boundary is reached.
+Neither the full line list nor any chapter's content is held in memory.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+
+from gui.core.pipeline import (
+    _BLOCKS_PER_WORKER,
+    _align_candidate_pairs,
+    candidate_pairs,
+    score_lines,
+)
+
+
+def iter_mmap_lines(
+    mm: mmap.mmap, start: int = 0, end: int | None = None,
+) -> Iterator[tuple[int, bytes]]:
+    """Yield ``(byte_offset, raw_line)`` for each line in ``mm[start:end]``.
+
+    Lines are split on ``b"\\n"`` and the newline is not included, so a
+    trailing ``"\\r"`` from CRLF files is left for ``str.strip`` to remove.
+    """
+    if end is None:
+        end = len(mm)
+    pos = start
+    while pos < end:
+        nl = mm.find(b"\n", pos, end)
+        if nl == -1:
+            yield pos, mm[pos:end]
+            return
+        yield pos, mm[pos:nl]
+        pos = nl + 1
+
+
+def _score_byte_range(
+    novel_file: str,
+    start: int,
+    end: int,
+    chapter_titles: list[str],
+    threshold: int,
+    scorer=score_lines,
+) -> tuple[list[tuple], int]:
+    """Score the lines in one byte range of *novel_file* with *scorer*.
+
+    Returns the range's matches (line indices relative to the range) and
+    its line count, so the caller can offset later ranges.
+    """
+    n_lines = 0
+
+    with open(novel_file, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        def decoded_lines() -> Iterator[str]:
+            nonlocal n_lines
+            for _offset, raw in iter_mmap_lines(mm, start, end):
+                n_lines += 1
+                yield raw.decode("utf-8")
+
+        matches = scorer(decoded_lines(), chapter_titles, threshold)
+
+    return matches, n_lines
+
+
+def _line_aligned_ranges(mm: mmap.mmap, n_ranges: int) -> list[tuple[int, int]]:
+    """Cut *mm* into about *n_ranges* byte ranges that end on a newline."""
+    size = len(mm)
+    step = max(1, -(-size // n_ranges))
+    ranges: list[tuple[int, int]] = []
+    start = 0
+    while start < size:
+        nl = mm.find(b"\n", min(start + step, size) - 1)
+        end = size if nl == -1 else nl + 1
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def _collect_matches(
+    novel_file: str,
+    mm: mmap.mmap,
+    chapter_titles: list[str],
+    threshold: int,
+    workers: int,
+    scorer=score_lines,
+) -> list[tuple]:
+    """First pass: *scorer* output for the whole file, in line order."""
+    if workers <= 1:
+        return _score_byte_range(novel_file, 0, len(mm), chapter_titles, threshold, scorer)[0]
+
+    ranges = _line_aligned_ranges(mm, workers * _BLOCKS_PER_WORKER)
+    matches: list[tuple] = []
+    line_offset = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                _score_byte_range, novel_file, start, end, chapter_titles, threshold, scorer,
+            )
+            for start, end in ranges
+        ]
+        for future in futures:
+            block_matches, n_lines = future.result()
+            matches.extend((m[0] + line_offset,) + tuple(m[1:]) for m in block_matches)
+            line_offset += n_lines
+    return matches
+
+
+def _best_split_points(
+    chapter_titles: list[str], matches: list[tuple[int, str, int]],
+) -> list[tuple[int, str]]:
+    """Pick each title's highest-scoring line, sorted by line number.
+
+    Same rule as ``split_by_fuzzy_matching``: the first line wins on
+    equal scores.
+    """
+    best: dict[str, tuple[int, int]] = {}
+    for idx, title, score in matches:
+        if title not in best or score > best[title][1]:
+            best[title] = (idx, score)
+    return sorted((idx, title) for title, (idx, _score) in best.items())
+
+
+def split_file_streaming(
+    novel_file: str,
+    chapter_titles: list[str],
+    output_dir: str,
+    threshold: int = 40,
+    workers: int = 1,
+    aligned: bool = False,
+) -> list[dict]:
+    """Split *novel_file* into ``P01_<title>.txt`` files in *output_dir*.
+
+    Produces the same files as writing out ``split_by_fuzzy_matching``'s
+    chapters (``split_by_title_alignment``'s when *aligned* is true), but
+    streams the book from a memory map and writes each chapter as soon as
+    its boundary is reached.
+
+    Returns
+    -------
+    list[dict]
+        Each dict has keys: index (1-based), title (str), path (str),
+        line_start (int), line_end (int), byte_start (int) and
+        byte_end (int, exclusive) into *novel_file*.
+    """
+    if os.path.getsize(novel_file) == 0:
+        return []
+
+    os.makedirs(output_dir, exist_ok=True)
+    chapters: list[dict] = []
+
+    with open(novel_file, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # -- 1. Score lines; only the matches are kept --
+        if aligned:
+            pairs = _collect_matches(
+                novel_file, mm, chapter_titles, threshold, workers, scorer=candidate_pairs,
+            )
+            final_split_points = _align_candidate_pairs(pairs, chapter_titles)
+        else:
+            matches = _collect_matches(novel_file, mm, chapter_titles, threshold, workers)
+            final_split_points = _best_split_points(chapter_titles, matches)
+
+        # -- 2. Walk lines again, writing each chapter as it is reached --
+        current_file = None
+        current_chapter: dict | None = None
+        current_chapter_title = "扉页"
+        chapter_num = 1
+        line_start = 0
+        byte_start = 0
+        split_idx = 0
+        last_idx = -1
+
+        def close_chapter(line_end: int, byte_end: int) -> None:
+            nonlocal current_file, current_chapter
+            if current_file is None:
+                return
+            current_file.close()
+            current_chapter["line_end"] = line_end
+            current_chapter["byte_end"] = byte_end
+            chapters.append(current_chapter)
+            current_file = None
+            current_chapter = None
+
+        for idx, (offset, raw) in enumerate(iter_mmap_lines(mm)):
+            last_idx = idx
+            line = raw.decode("utf-8").strip()
+            if not line:
+                continue
+
+            if (
+                split_idx < len(final_split_points)
+                and idx == final_split_points[split_idx][0]
+            ):
+                # Save current chapter, then start the new one here
+                close_chapter(idx - 1, offset)
+                current_chapter_title = final_split_points[split_idx][1]
+                line_start = idx
+                byte_start = offset
+                chapter_num += 1
+                split_idx += 1
+
+            if current_file is None:
+                path = os.path.join(
+                    output_dir, f"P{str(chapter_num).zfill(2)}_{current_chapter_title}.txt",
+                )
+                current_file = open(path, "w", encoding="utf-8")
+                current_chapter = {
+                    "index": chapter_num,
+                    "title": current_chapter_title,
+                    "path": path,
+                    "line_start": line_start,
+                    "line_end": line_start,
+                    "byte_start": byte_start,
+                    "byte_end": byte_start,
+                }
+            else:
+                current_file.write("\n")
+            current_file.write(line)
+
+        # -- Handle the last chapter --
+        close_chapter(last_idx, len(mm))
+
+    return chapters
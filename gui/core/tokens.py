@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Offline token estimation and token-budgeted chunking.
+
+Providers tokenize Chinese text very differently, so a fixed character
+limit either wastes output budget or gets responses truncated.  Each
+provider has a :class:`TokenEstimator` built from per-character-class
+ratios (no tokenizer download, no network); the chunker grows a chunk
+sentence by sentence until its prompt + chunk + expected JSON output
+would exceed the provider's limits.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Iterator
+
+from gui.core.pipeline import _SENTENCE_END
+
+_CJK = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+_WORD = re.compile(r"[A-Za-z0-9]+")
+_SPACE = re.compile(r"\s")
+
+# Per-entry JSON boilerplate: keys, speaker, 8-float emo_vector, delay
+_DEFAULT_ENTRY_OVERHEAD = 45
+
+
+class TokenEstimator:
+    """Estimate token counts from character-class ratios.
+
+    Parameters
+    ----------
+    cjk : float
+        Tokens per CJK ideograph.
+    word : float
+        Tokens per ASCII letter/digit run.
+    other : float
+        Tokens per remaining non-space character (punctuation etc.).
+    context_tokens : int
+        Provider context window (prompt + completion).
+    max_output_tokens : int
+        Largest completion the provider returns before truncating.
+    segment_chars : int
+        Average ``content`` length of one output entry, used to estimate
+        how many entries (and how much JSON boilerplate) a chunk yields.
+    entry_overhead : int
+        Tokens of JSON boilerplate per output entry.
+    """
+
+    def __init__(
+        self,
+        cjk: float,
+        word: float,
+        other: float,
+        context_tokens: int,
+        max_output_tokens: int,
+        segment_chars: int = 50,
+        entry_overhead: int = _DEFAULT_ENTRY_OVERHEAD,
+    ) -> None:
+        self.cjk = cjk
+        self.word = word
+        self.other = other
+        self.context_tokens = context_tokens
+        self.max_output_tokens = max_output_tokens
+        self.segment_chars = segment_chars
+        self.entry_overhead = entry_overhead
+
+    def count(self, text: str) -> int:
+        """Estimated prompt tokens for *text*."""
+        n_cjk = len(_CJK.findall(text))
+        words = _WORD.findall(text)
+        n_word_chars = sum(len(w) for w in words)
+        n_other = len(text) - n_cjk - n_word_chars - len(_SPACE.findall(text))
+        return int(n_cjk * self.cjk + len(words) * self.word + n_other * self.other + 0.5)
+
+    def expected_output(self, text: str, text_tokens: int | None = None) -> int:
+        """Estimated completion tokens for converting *text* to JSON.
+
+        The content is echoed back once, plus the per-entry boilerplate
+        for roughly ``len(text) / segment_chars`` entries.
+        """
+        if text_tokens is None:
+            text_tokens = self.count(text)
+        n_entries = len(text) // self.segment_chars + 1
+        return text_tokens + n_entries * self.entry_overhead
+
+
+# Approximate ratios for each provider's default model family; override
+# with register_token_estimator() after calibrating on your own books.
+_ESTIMATORS: dict[str, TokenEstimator] = {
+    # OpenAI-style o200k tokenizers (openai/gpt-4o-mini by default)
+    "openrouter": TokenEstimator(
+        cjk=0.75, word=1.3, other=0.6, context_tokens=128000, max_output_tokens=16384,
+    ),
+    # gemini-2.5-flash
+    "gemini": TokenEstimator(
+        cjk=0.7, word=1.3, other=0.5, context_tokens=1048576, max_output_tokens=65536,
+    ),
+    # qwen-long
+    "qwen": TokenEstimator(
+        cjk=0.65, word=1.3, other=0.5, context_tokens=1000000, max_output_tokens=8192,
+    ),
+}
+
+
+def register_token_estimator(provider: str, estimator: TokenEstimator) -> None:
+    """Install or replace the estimator used for *provider*."""
+    _ESTIMATORS[provider.lower()] = estimator
+
+
+def get_token_estimator(provider: str) -> TokenEstimator:
+    """Return the estimator for *provider* (OpenRouter's if unknown)."""
+    return _ESTIMATORS.get(provider.lower(), _ESTIMATORS["openrouter"])
+
+
+def iter_token_chunk_spans(
+    text: str,
+    estimator: TokenEstimator,
+    prompt_tokens: int = 0,
+    output_fill: float = 0.8,
+) -> Iterator[tuple[int, int]]:
+    """Yield ``(start, end)`` chunk offsets sized by a token budget.
+
+    Sentences are grouped exactly as in ``iter_chunk_spans``, but a chunk
+    closes when adding the next sentence would push its expected output
+    past ``output_fill * max_output_tokens`` or its prompt + chunk +
+    output past the context window.  *prompt_tokens* is the fixed
+    instruction overhead sent with every chunk.
+    """
+    output_budget = int(estimator.max_output_tokens * output_fill)
+    context_budget = estimator.context_tokens - prompt_tokens
+
+    chunk_start = 0
+    chunk_end = 0
+    in_tokens = 0
+    out_tokens = 0
+
+    def sentence_cost(start: int, end: int) -> tuple[int, int]:
+        sentence = text[start:end]
+        tokens = estimator.count(sentence)
+        return tokens, estimator.expected_output(sentence, tokens)
+
+    def sentence_ends() -> Iterator[int]:
+        last = 0
+        for m in _SENTENCE_END.finditer(text):
+            last = m.end()
+            yield last
+        if last < len(text):
+            yield len(text)
+
+    for end in sentence_ends():
+        s_in, s_out = sentence_cost(chunk_end, end)
+        over = (
+            out_tokens + s_out > output_budget
+            or in_tokens + s_in + out_tokens + s_out > context_budget
+        )
+        if over and chunk_end > chunk_start:
+            yield chunk_start, chunk_end
+            chunk_start = chunk_end
+            in_tokens = out_tokens = 0
+        in_tokens += s_in
+        out_tokens += s_out
+        chunk_end = end
+
+    if chunk_end > chunk_start:
+        yield chunk_start, chunk_end
+
+
+def iter_token_chunks(
+    text: str,
+    estimator: TokenEstimator,
+    prompt_tokens: int = 0,
+    output_fill: float = 0.8,
+) -> Iterator[str]:
+    """Yield the chunk strings of :func:`iter_token_chunk_spans`."""
+    for start, end in iter_token_chunk_spans(text, estimator, prompt_tokens, output_fill):
+        yield text[start:end]
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Coalescing of worker log lines and progress updates for the GUI.
+
+A large run produces thousands of log lines and chapter state changes;
+delivering each as its own cross-thread Qt signal keeps the GUI thread
+busy appending to the log view.  Workers record them in an
+:class:`UpdateBatcher` instead and flush it every :data:`FLUSH_INTERVAL`
+seconds (10 Hz), sending per frame
+
+* every log line in order (at most *max_lines*; older lines beyond that
+  are replaced by one line saying how many were dropped),
+* only the latest state of each chapter,
+* only the latest streamed entry, for the preview.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import deque
+
+FLUSH_INTERVAL = 0.1
+MAX_BATCH_LINES = 1000
+
+
+class UpdateBatch:
+    """Updates collected since the previous flush."""
+
+    def __init__(self, lines: list[str], progress: list[tuple], entry: tuple | None) -> None:
+        self.lines = lines            # log lines, oldest first
+        self.progress = progress      # (chapter_index, status, message)
+        self.entry = entry            # (chapter_index, entry dict) or None
+
+    def __bool__(self) -> bool:
+        return bool(self.lines or self.progress or self.entry)
+
+
+class UpdateBatcher:
+    """Thread-safe buffer of log lines, chapter states and the latest entry."""
+
+    def __init__(self, max_lines: int = MAX_BATCH_LINES) -> None:
+        self._lines: deque[str] = deque(maxlen=max_lines)
+        self._dropped = 0
+        self._progress: dict[int, tuple[str, str]] = {}
+        self._entry: tuple | None = None
+        self._lock = threading.Lock()
+
+    def log(self, line: str) -> None:
+        with self._lock:
+            if len(self._lines) == self._lines.maxlen:
+                self._dropped += 1
+            self._lines.append(line)
+
+    def progress(self, index: int, status: str, message: str) -> None:
+        """Record chapter *index*'s state, replacing any unflushed one."""
+        with self._lock:
+            self._progress.pop(index, None)  # keep changes in arrival order
+            self._progress[index] = (status, message)
+
+    def entry(self, index: int, entry: dict) -> None:
+        with self._lock:
+            self._entry = (index, entry)
+
+    def drain(self) -> UpdateBatch:
+        """Take everything recorded since the last call."""
+        with self._lock:
+            lines = list(self._lines)
+            if self._dropped:
+                lines.insert(0, f"……（界面刷新期间省略了 {self._dropped} 行日志）")
+            progress = [(index, *state) for index, state in self._progress.items()]
+            batch = UpdateBatch(lines, progress, self._entry)
+            self._lines.clear()
+            self._dropped = 0
+            self._progress.clear()
+            self._entry = None
+        return batch
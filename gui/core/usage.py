@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Token usage accounting across a generation run.
+
+:class:`UsageStats` sums the ``usage`` block of every response, including
+the prompt tokens the provider served from its prefix cache, so the log
+can show how much of the invariant system prefix was actually reused.
+Providers report cached tokens in different places; :meth:`UsageStats.record`
+reads the OpenAI-style ``prompt_tokens_details.cached_tokens`` (OpenAI,
+OpenRouter, Qwen, Gemini's compatible endpoint) and DeepSeek-style
+``prompt_cache_hit_tokens``.
+"""
+
+from __future__ import annotations
+
+import threading
+
+
+def _field(obj, name: str):
+    """Attribute or key *name* of *obj*; None if absent."""
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    value = getattr(obj, name, None)
+    if value is None:
+        extra = getattr(obj, "model_extra", None)  # fields the SDK does not model
+        if extra:
+            value = extra.get(name)
+    return value
+
+
+def usage_tokens(usage) -> tuple[int, int, int]:
+    """``(prompt, cached prompt, completion)`` tokens of an OpenAI-style ``usage``."""
+    cached = (
+        _field(_field(usage, "prompt_tokens_details"), "cached_tokens")
+        or _field(usage, "prompt_cache_hit_tokens")
+        or 0
+    )
+    return _field(usage, "prompt_tokens") or 0, cached, _field(usage, "completion_tokens") or 0
+
+
+class UsageStats:
+    """Running totals of prompt, cached-prompt and completion tokens.
+
+    Thread-safe, so thread-pool based scripts can share one instance.
+    """
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def add(self, prompt_tokens: int = 0, cached_tokens: int = 0, completion_tokens: int = 0) -> None:
+        """Count one response with the given token numbers."""
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+            self.completion_tokens += completion_tokens
+
+    def record(self, usage) -> None:
+        """Count one response from its OpenAI-style ``usage`` (None is ignored)."""
+        if usage is None:
+            return
+        self.add(*usage_tokens(usage))
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of prompt tokens served from the provider's cache."""
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+    def report(self) -> str:
+        """One-line summary for the log."""
+        return (
+            f"token 用量: {self.requests} 次请求，输入 {self.prompt_tokens}"
+            f"（前缀缓存命中 {self.cached_tokens}，命中率 {self.hit_rate:.0%}），"
+            f"输出 {self.completion_tokens}"
+        )
@@ -127,6 +127,58 @@ TRANSLATIONS: dict[str, dict[str, str]] = {
         "zh": "相似度阈值",
         "en": "Similarity Threshold",
     },
+    "split.method": {
+        "zh": "分割方式",
+        "en": "Split Method",
+    },
+    "split.method_fuzzy": {
+        "zh": "逐标题最佳匹配",
+        "en": "Best match per title",
+    },
+    "split.method_aligned": {
+        "zh": "按目录顺序对齐",
+        "en": "Align in TOC order",
+    },
+    "split.method_pattern": {
+        "zh": "按标题格式识别（无需目录）",
+        "en": "Heading patterns (no TOC)",
+    },
+    "split.heading_pattern": {
+        "zh": "标题格式",
+        "en": "Heading Pattern",
+    },
+    "split.custom_pattern": {
+        "zh": "自定义正则（可选，优先于预设）",
+        "en": "Custom regex (optional, overrides preset)",
+    },
+    "split.pattern_chinese": {
+        "zh": "第X章/节/回/讲",
+        "en": "第X章/节/回/讲",
+    },
+    "split.pattern_markdown1": {
+        "zh": "Markdown 一级标题",
+        "en": "Markdown H1",
+    },
+    "split.pattern_markdown2": {
+        "zh": "Markdown 一至二级标题",
+        "en": "Markdown H1-H2",
+    },
+    "split.pattern_markdown3": {
+        "zh": "Markdown 一至三级标题",
+        "en": "Markdown H1-H3",
+    },
+    "split.pattern_numbered": {
+        "zh": "编号标题（1. / 1.2 / 一、）",
+        "en": "Numbered (1. / 1.2 / 一、)",
+    },
+    "split.pattern_english": {
+        "zh": "Chapter N",
+        "en": "Chapter N",
+    },
+    "split.workers": {
+        "zh": "进程数",
+        "en": "Processes",
+    },
     "split.start_split": {
         "zh": "开始分割",
         "en": "Start Split",
@@ -231,6 +283,106 @@ TRANSLATIONS: dict[str, dict[str, str]] = {
         "zh": "字符",
         "en": "chars",
     },
+    "gen.budget": {
+        "zh": "预算 (USD)",
+        "en": "Budget (USD)",
+    },
+    "gen.budget_tip": {
+        "zh": "整本书的费用上限，接近时逐个发送请求，达到后停止；0 表示不限",
+        "en": "Spend ceiling for the book: requests go one at a time near it and stop at it; 0 = unlimited",
+    },
+    "gen.token_chunking": {
+        "zh": "按 token 预算切块（按服务商估算）",
+        "en": "Chunk by token budget (per provider)",
+    },
+    "gen.use_cache": {
+        "zh": "复用缓存的响应（未改动的片段不再请求）",
+        "en": "Reuse cached responses for unchanged chunks",
+    },
+    "gen.resume": {
+        "zh": "从上次中断处继续（跳过已完成的片段）",
+        "en": "Resume interrupted run (skip completed chunks)",
+    },
+    "gen.streaming": {
+        "zh": "流式接收（边生成边解析，截断时只重试剩余部分）",
+        "en": "Stream responses (parse as generated, retry only the truncated tail)",
+    },
+    "gen.compact": {
+        "zh": "紧凑协议（精简规范作为系统消息，按行输出，本地还原为 JSON）",
+        "en": "Compact protocol (short system-message spec, row output decoded locally)",
+    },
+    "gen.hedge": {
+        "zh": "多服务商对冲（慢片段向其他已配置的服务商发副本，故障时自动切换）",
+        "en": "Multi-provider hedging (duplicate slow chunks to other configured providers, fail over on errors)",
+    },
+    "gen.latest_entry": {
+        "zh": "最新条目",
+        "en": "Latest entry",
+    },
+    "gen.metrics": {
+        "zh": "阶段耗时",
+        "en": "Stage timings",
+    },
+    "gen.metrics_header": {
+        "zh": " 累计(s)  次数  均值(ms)  p95(ms)  阶段",
+        "en": "total(s) count  mean(ms)  p95(ms)  stage",
+    },
+    "gen.stage.chunking": {
+        "zh": "切块",
+        "en": "Chunking",
+    },
+    "gen.stage.queue": {
+        "zh": "排队",
+        "en": "Queue",
+    },
+    "gen.stage.rate_limit": {
+        "zh": "限流等待",
+        "en": "Rate limit",
+    },
+    "gen.stage.network": {
+        "zh": "网络",
+        "en": "Network",
+    },
+    "gen.stage.parse": {
+        "zh": "解析",
+        "en": "Parse",
+    },
+    "gen.stage.validate": {
+        "zh": "校验",
+        "en": "Validate",
+    },
+    "gen.stage.merge": {
+        "zh": "合并",
+        "en": "Merge",
+    },
+    "gen.metrics_tokens": {
+        "zh": "token: 输入 {prompt}（缓存 {cached}）输出 {completion}，请求 {requests}，限流 {throttled}，失败 {errors}",
+        "en": "Tokens: prompt {prompt} (cached {cached}), completion {completion}; requests {requests}, throttled {throttled}, errors {errors}",
+    },
+    "gen.metrics_bottleneck": {
+        "zh": "瓶颈: {verdict}（已运行 {elapsed:.0f}s，CPU 占比 {cpu:.0%}）",
+        "en": "Bottleneck: {verdict} ({elapsed:.0f}s elapsed, CPU share {cpu:.0%})",
+    },
+    "gen.bottleneck.cpu": {
+        "zh": "CPU 受限",
+        "en": "CPU-bound",
+    },
+    "gen.bottleneck.rate_limit": {
+        "zh": "限流受限",
+        "en": "rate-limit-bound",
+    },
+    "gen.bottleneck.concurrency": {
+        "zh": "并发受限（可调高并发数）",
+        "en": "concurrency-bound (raise workers)",
+    },
+    "gen.bottleneck.provider": {
+        "zh": "服务商受限",
+        "en": "provider-bound",
+    },
+    "gen.bottleneck.none": {
+        "zh": "暂无请求",
+        "en": "no requests yet",
+    },
 
     # ==================================================================
     # Speaker page
@@ -30,6 +30,7 @@ from qfluentwidgets import (
 )
 
 from gui.core.config import AppConfig, load_config, save_config
+from gui.core.journal import JOURNAL_NAME
 from gui.core.models import PipelineState
 from gui.i18n import set_language, t
 from gui.pages.import_page import ImportPage
@@ -93,6 +94,10 @@ class MainWindow(FluentWindow):
         # Active workers (prevent GC)
         self._active_workers: list = []
 
+        # Cached split scores for live re-splitting (SplitScoreTable)
+        self._split_table = None
+        self._title_update_worker = None
+
         self._init_window()
         self._init_navigation()
 
@@ -252,6 +257,9 @@ class MainWindow(FluentWindow):
 
     def _connect_chapter_split_page(self):
         self._chapter_split_page.split_requested.connect(self._on_split_requested)
+        self._chapter_split_page.pattern_split_requested.connect(self._on_pattern_split_requested)
+        self._chapter_split_page.threshold_changed.connect(self._on_split_threshold_changed)
+        self._chapter_split_page.titles_changed.connect(self._on_split_titles_changed)
         self._chapter_split_page.next_step.connect(self._on_split_next)
 
     def _connect_json_gen_page(self):
@@ -333,6 +341,8 @@ class MainWindow(FluentWindow):
         self.pipeline_state.markdown_content = content
         self.pipeline_state.book_name = book_name
         self.pipeline_state.output_dir = f"{book_name}_chapters"
+        self._split_table = None
+        self._title_update_worker = None
 
         self._ensure_page("chapter_split")
         if self._chapter_split_page:
@@ -351,10 +361,30 @@ class MainWindow(FluentWindow):
     # Chapter split handlers
     # ------------------------------------------------------------------
 
-    def _on_split_requested(self, content: str, titles: list, threshold: int):
+    def _on_split_requested(
+        self, content: str, titles: list, threshold: int, workers: int, method: str,
+    ):
         from gui.workers.split_worker import SplitWorker
 
-        worker = SplitWorker(content, titles, threshold)
+        # Live re-splitting only applies to the fuzzy method's score table
+        self._split_table = None
+        self._title_update_worker = None
+        worker = SplitWorker(content, titles, threshold, workers, method)
+        worker.progress.connect(self._chapter_split_page.set_progress)
+        worker.table_ready.connect(self._on_split_table_ready)
+        worker.finished.connect(self._on_split_finished)
+        worker.error.connect(self._on_split_error)
+        self._active_workers.append(worker)
+        worker.finished.connect(lambda _: self._cleanup_worker(worker))
+        worker.error.connect(lambda _: self._cleanup_worker(worker))
+        worker.start()
+
+    def _on_pattern_split_requested(self, content: str, patterns: list):
+        from gui.workers.split_worker import HeadingSplitWorker
+
+        self._split_table = None
+        self._title_update_worker = None
+        worker = HeadingSplitWorker(content, patterns)
         worker.progress.connect(self._chapter_split_page.set_progress)
         worker.finished.connect(self._on_split_finished)
         worker.error.connect(self._on_split_error)
@@ -364,6 +394,64 @@ class MainWindow(FluentWindow):
         worker.start()
 
     def _on_split_finished(self, chapters: list):
+        self._apply_split_chapters(chapters)
+
+        InfoBar.success(
+            t("common.success"),
+            t("split.split_success").replace("{count}", str(len(chapters)))
+            if "{count}" in t("split.split_success")
+            else f"{t('split.split_success')} ({len(chapters)})",
+            parent=self,
+            position=InfoBarPosition.TOP,
+            duration=3000,
+        )
+
+    def _on_split_table_ready(self, table):
+        self._split_table = table
+
+    def _on_split_threshold_changed(self, threshold: int):
+        """Re-split from the cached score table as the slider moves."""
+        if self._split_table is None:
+            return
+        self._apply_split_chapters(self._split_table.split(threshold))
+
+    def _on_split_titles_changed(self, titles: list):
+        """Rescore only the lines affected by the edited title list."""
+        if self._split_table is None or not titles:
+            return
+        from gui.workers.split_worker import TitleUpdateWorker
+
+        # A newer edit replaces any update still running; its result is
+        # ignored when it arrives
+        threshold = self._chapter_split_page.get_threshold()
+        worker = TitleUpdateWorker(self._split_table, titles, threshold)
+        self._title_update_worker = worker
+        worker.finished.connect(
+            lambda table, chapters: self._on_title_update_finished(worker, table, chapters, threshold)
+        )
+        worker.error.connect(lambda msg: self._on_title_update_error(worker, msg))
+        self._active_workers.append(worker)
+        worker.finished.connect(lambda *_: self._cleanup_worker(worker))
+        worker.error.connect(lambda _: self._cleanup_worker(worker))
+        worker.start()
+
+    def _on_title_update_finished(self, worker, table, chapters: list, threshold: int):
+        if worker is not self._title_update_worker:
+            return
+        self._title_update_worker = None
+        self._split_table = table
+        current = self._chapter_split_page.get_threshold()
+        if current != threshold:
+            chapters = table.split(current)
+        self._apply_split_chapters(chapters)
+
+    def _on_title_update_error(self, worker, msg: str):
+        if worker is not self._title_update_worker:
+            return
+        self._title_update_worker = None
+        self._on_split_error(msg)
+
+    def _apply_split_chapters(self, chapters: list):
         self.pipeline_state.chapters = []
         from gui.core.models import ChapterInfo
 
@@ -382,16 +470,6 @@ class MainWindow(FluentWindow):
             chapters_tuples = [(ch["title"], ch["content"]) for ch in chapters]
             self._chapter_split_page.set_chapters(chapters_tuples)
 
-        InfoBar.success(
-            t("common.success"),
-            t("split.split_success").replace("{count}", str(len(chapters)))
-            if "{count}" in t("split.split_success")
-            else f"{t('split.split_success')} ({len(chapters)})",
-            parent=self,
-            position=InfoBarPosition.TOP,
-            duration=3000,
-        )
-
     def _on_split_error(self, msg: str):
         InfoBar.error(t("common.error"), msg, parent=self, position=InfoBarPosition.TOP, duration=5000)
 
@@ -409,16 +487,9 @@ class MainWindow(FluentWindow):
     # JSON gen handlers
     # ------------------------------------------------------------------
 
-    def _on_generate_requested(self, selected_indices, provider, workers, chunk_size):
-        from gui.workers.json_gen_worker import JsonGenWorker
-
-        # Map provider name to config
-        provider_lower = provider.lower()
-        if provider_lower == "openrouter":
-            api_key = self.config.openrouter_api_key
-            base_url = self.config.openrouter_base_url
-            model = self.config.openrouter_model
-        elif provider_lower == "gemini":
+    def _provider_endpoint(self, provider_lower: str) -> dict:
+        """Credentials, base URL and model configured for a provider."""
+        if provider_lower == "gemini":
             api_key = self.config.gemini_api_key
             base_url = self.config.gemini_base_url + "/v1beta/"
             model = "gemini-2.5-flash"
@@ -427,9 +498,38 @@ class MainWindow(FluentWindow):
             base_url = self.config.qwen_base_url
             model = self.config.qwen_model
         else:
+            provider_lower = "openrouter"
             api_key = self.config.openrouter_api_key
             base_url = self.config.openrouter_base_url
             model = self.config.openrouter_model
+        return {
+            "provider": provider_lower,
+            "api_key": api_key,
+            "base_url": base_url,
+            "model": model,
+        }
+
+    def _on_generate_requested(
+        self, selected_indices, provider, workers, chunk_size,
+        token_chunking=False, use_cache=True, resume=True, streaming=False,
+        compact=False, hedge=False, budget=0.0,
+    ):
+        from gui.workers.json_gen_worker import JsonGenWorker
+
+        # Map provider name to config
+        provider_lower = provider.lower()
+        endpoint = self._provider_endpoint(provider_lower)
+        api_key = endpoint["api_key"]
+        base_url = endpoint["base_url"]
+        model = endpoint["model"]
+
+        # Every other provider with an API key backs up the selected one
+        fallbacks = []
+        if hedge:
+            for other in ("openrouter", "gemini", "qwen"):
+                backup = self._provider_endpoint(other)
+                if other != endpoint["provider"] and backup["api_key"]:
+                    fallbacks.append(backup)
 
         if not api_key:
             InfoBar.warning(
@@ -462,9 +562,19 @@ class MainWindow(FluentWindow):
             model=model,
             max_workers=workers,
             chunk_size=chunk_size,
+            token_chunking=token_chunking,
+            use_cache=use_cache,
+            journal_path=str(Path(self.pipeline_state.output_dir or ".") / JOURNAL_NAME),
+            resume=resume,
+            streaming=streaming,
+            compact=compact,
+            fallbacks=fallbacks,
+            budget=budget,
         )
-        worker.chapter_progress.connect(self._json_gen_page.update_chapter_status)
-        worker.log_message.connect(self._json_gen_page.append_log)
+        worker.progress_batch.connect(self._json_gen_page.update_chapter_statuses)
+        worker.log_batch.connect(self._json_gen_page.append_logs)
+        worker.entry_ready.connect(self._json_gen_page.show_entry_preview)
+        worker.metrics_updated.connect(self._json_gen_page.update_metrics)
         worker.finished.connect(self._on_gen_finished)
         worker.error.connect(self._on_gen_error)
         self._active_workers.append(worker)
@@ -7,9 +7,10 @@ similarity threshold, and previewing / selecting split results.
 
 from __future__ import annotations
 
+import os
 from pathlib import Path
 
-from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
 from PyQt6.QtWidgets import (
     QFileDialog,
     QHBoxLayout,
@@ -23,12 +24,15 @@ from PyQt6.QtWidgets import (
 from qfluentwidgets import (
     BodyLabel,
     CardWidget,
+    ComboBox,
     FluentIcon,
+    LineEdit,
     ListWidget,
     PrimaryPushButton,
     ProgressBar,
     PushButton,
     Slider,
+    SpinBox,
     SubtitleLabel,
     isDarkTheme,
 )
@@ -43,13 +47,34 @@ from gui.styles import (
 )
 
 
+# (method key, i18n key) pairs for the split method combo
+_SPLIT_METHODS = [
+    ("fuzzy", "split.method_fuzzy"),
+    ("aligned", "split.method_aligned"),
+    ("pattern", "split.method_pattern"),
+]
+
+# (HEADING_PATTERNS preset key, i18n key) pairs for the pattern combo
+_HEADING_PRESETS = [
+    ("chinese", "split.pattern_chinese"),
+    ("markdown1", "split.pattern_markdown1"),
+    ("markdown2", "split.pattern_markdown2"),
+    ("markdown3", "split.pattern_markdown3"),
+    ("numbered", "split.pattern_numbered"),
+    ("english", "split.pattern_english"),
+]
+
+
 class ChapterSplitPage(QWidget):
     """Chapter splitting page with left (edit) / right (preview) panels."""
 
     # ------------------------------------------------------------------
     # Signals
     # ------------------------------------------------------------------
-    split_requested = pyqtSignal(str, list, int)  # (content, titles, threshold)
+    split_requested = pyqtSignal(str, list, int, int, str)  # (content, titles, threshold, workers, method)
+    pattern_split_requested = pyqtSignal(str, list)  # (content, heading patterns)
+    threshold_changed = pyqtSignal(int)
+    titles_changed = pyqtSignal(list)
     next_step = pyqtSignal()
 
     def __init__(self, parent: QWidget | None = None) -> None:
@@ -111,6 +136,15 @@ class ChapterSplitPage(QWidget):
         self._chapter_edit.setPlaceholderText("每行一个章节标题...")
         left_layout.addWidget(self._chapter_edit, stretch=1)
 
+        # Debounce title edits before re-splitting
+        self._titles_timer = QTimer(self)
+        self._titles_timer.setSingleShot(True)
+        self._titles_timer.setInterval(300)
+        self._titles_timer.timeout.connect(
+            lambda: self.titles_changed.emit(self.get_chapter_titles())
+        )
+        self._chapter_edit.textChanged.connect(self._titles_timer.start)
+
         # "从文件加载" button
         self._load_btn = PushButton(
             FluentIcon.DOCUMENT, t("split.load_from_file"), left_widget,
@@ -118,6 +152,42 @@ class ChapterSplitPage(QWidget):
         self._load_btn.clicked.connect(self._on_load_from_file)
         left_layout.addWidget(self._load_btn, alignment=Qt.AlignmentFlag.AlignLeft)
 
+        # Method row: label + combo (best match per title / TOC-order alignment)
+        method_row = QHBoxLayout()
+        method_row.setSpacing(SPACING_SMALL)
+
+        self._method_label = BodyLabel(t("split.method"), left_widget)
+        method_row.addWidget(self._method_label)
+
+        self._method_combo = ComboBox(left_widget)
+        for key, text_key in _SPLIT_METHODS:
+            self._method_combo.addItem(t(text_key), userData=key)
+        method_row.addWidget(self._method_combo, stretch=1)
+
+        left_layout.addLayout(method_row)
+
+        # Pattern row (pattern method only): preset combo + custom regex
+        self._pattern_widget = QWidget(left_widget)
+        pattern_row = QHBoxLayout(self._pattern_widget)
+        pattern_row.setContentsMargins(0, 0, 0, 0)
+        pattern_row.setSpacing(SPACING_SMALL)
+
+        self._pattern_label = BodyLabel(t("split.heading_pattern"), self._pattern_widget)
+        pattern_row.addWidget(self._pattern_label)
+
+        self._pattern_combo = ComboBox(self._pattern_widget)
+        for key, text_key in _HEADING_PRESETS:
+            self._pattern_combo.addItem(t(text_key), userData=key)
+        pattern_row.addWidget(self._pattern_combo)
+
+        self._pattern_edit = LineEdit(self._pattern_widget)
+        self._pattern_edit.setPlaceholderText(t("split.custom_pattern"))
+        pattern_row.addWidget(self._pattern_edit, stretch=1)
+
+        self._pattern_widget.setVisible(False)
+        left_layout.addWidget(self._pattern_widget)
+        self._method_combo.currentIndexChanged.connect(self._on_method_changed)
+
         # Threshold row: label + slider + value label
         threshold_row = QHBoxLayout()
         threshold_row.setSpacing(SPACING_SMALL)
@@ -137,6 +207,20 @@ class ChapterSplitPage(QWidget):
 
         left_layout.addLayout(threshold_row)
 
+        # Workers row: label + spin box (processes used for scoring)
+        workers_row = QHBoxLayout()
+        workers_row.setSpacing(SPACING_SMALL)
+
+        self._workers_label = BodyLabel(t("split.workers"), left_widget)
+        workers_row.addWidget(self._workers_label)
+
+        self._workers_spin = SpinBox(left_widget)
+        self._workers_spin.setRange(1, os.cpu_count() or 1)
+        self._workers_spin.setValue(1)
+        workers_row.addWidget(self._workers_spin, stretch=1)
+
+        left_layout.addLayout(workers_row)
+
         # "分割章节" button
         self._split_btn = PrimaryPushButton(
             FluentIcon.CUT, t("split.start_split"), left_widget,
@@ -203,12 +287,31 @@ class ChapterSplitPage(QWidget):
 
     def _on_threshold_changed(self, value: int) -> None:
         self._threshold_value_label.setText(f"{value}%")
+        self.threshold_changed.emit(value)
+
+    def _on_method_changed(self, _index: int) -> None:
+        # The pattern method needs neither the title list nor a threshold
+        by_pattern = self.get_method() == "pattern"
+        self._pattern_widget.setVisible(by_pattern)
+        self._chapter_edit.setEnabled(not by_pattern)
+        self._load_btn.setEnabled(not by_pattern)
+        self._threshold_slider.setEnabled(not by_pattern)
+        self._workers_spin.setEnabled(not by_pattern)
 
     def _on_split_clicked(self) -> None:
-        titles_text = self._chapter_edit.toPlainText().strip()
-        titles = [line.strip() for line in titles_text.splitlines() if line.strip()]
-        threshold = self._threshold_slider.value()
-        self.split_requested.emit(self._markdown_content, titles, threshold)
+        if self.get_method() == "pattern":
+            self.pattern_split_requested.emit(
+                self._markdown_content, self.get_heading_patterns(),
+            )
+            return
+
+        self.split_requested.emit(
+            self._markdown_content,
+            self.get_chapter_titles(),
+            self.get_threshold(),
+            self.get_workers(),
+            self.get_method(),
+        )
 
     def _on_chapter_item_clicked(self, item: QListWidgetItem) -> None:
         idx = self._chapter_list_widget.row(item)
@@ -250,6 +353,23 @@ class ChapterSplitPage(QWidget):
         """Return the current similarity threshold value."""
         return self._threshold_slider.value()
 
+    def get_method(self) -> str:
+        """Return the selected split method key (``"fuzzy"`` / ``"aligned"``
+        / ``"pattern"``)."""
+        return self._method_combo.currentData() or "fuzzy"
+
+    def get_heading_patterns(self) -> list[str]:
+        """Return the heading patterns: the custom regex if one is entered,
+        otherwise the selected preset name."""
+        custom = self._pattern_edit.text().strip()
+        if custom:
+            return [custom]
+        return [self._pattern_combo.currentData() or "chinese"]
+
+    def get_workers(self) -> int:
+        """Return the number of processes used for scoring."""
+        return self._workers_spin.value()
+
     def get_chapter_titles(self) -> list[str]:
         """Return the list of chapter titles from the editor."""
         text = self._chapter_edit.toPlainText().strip()
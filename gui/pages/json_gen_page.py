@@ -2,7 +2,8 @@
 听书工坊 (Audiobook Workshop) - JSON generation page.
 
 Provides LLM provider selection, parallel processing controls,
-chapter selection with checkboxes, and real-time progress / log output.
+chapter selection with checkboxes, real-time progress / log output and a
+live panel of per-stage timings and token usage.
 """
 
 from __future__ import annotations
@@ -21,7 +22,9 @@ from PyQt6.QtWidgets import (
 from qfluentwidgets import (
     BodyLabel,
     CardWidget,
+    CheckBox,
     ComboBox,
+    DoubleSpinBox,
     FluentIcon,
     ListWidget,
     PrimaryPushButton,
@@ -33,9 +36,13 @@ from qfluentwidgets import (
     isDarkTheme,
 )
 
+from gui.core.metrics import STAGES
 from gui.i18n import t
 from gui.styles import SPACING_LARGE, SPACING_MEDIUM, SPACING_SMALL, MARGIN_STANDARD
 
+# Lines kept in the log area; older ones are dropped
+_LOG_MAX_LINES = 5000
+
 # Status icon prefixes
 _STATUS_ICONS = {
     "pending": "\u23f3",      # hourglass
@@ -50,7 +57,7 @@ _PROVIDERS = ["OpenRouter", "Gemini", "Qwen"]
 class JsonGenPage(QWidget):
     """Page for generating JSON from chapters using an LLM provider."""
 
-    generate_requested = pyqtSignal(list, str, int, int)
+    generate_requested = pyqtSignal(list, str, int, int, bool, bool, bool, bool, bool, bool, float)
 
     def __init__(self, parent: QWidget | None = None) -> None:
         super().__init__(parent)
@@ -105,7 +112,7 @@ class JsonGenPage(QWidget):
         workers_row.setSpacing(SPACING_SMALL)
         workers_label = BodyLabel(t("gen.workers"), self)
         self.workers_slider = Slider(Qt.Orientation.Horizontal, self)
-        self.workers_slider.setRange(1, 20)
+        self.workers_slider.setRange(1, 256)
         self.workers_slider.setValue(5)
         self.workers_value_label = BodyLabel("5", self)
         self.workers_value_label.setFixedWidth(28)
@@ -132,6 +139,51 @@ class JsonGenPage(QWidget):
         chunk_row.addWidget(chunk_suffix)
         settings_layout.addLayout(chunk_row)
 
+        # Token-budget chunking: size chunks per provider instead of by chars
+        self.token_chunk_check = CheckBox(t("gen.token_chunking"), self)
+        self.token_chunk_check.toggled.connect(
+            lambda checked: self.chunk_spin.setEnabled(not checked)
+        )
+        settings_layout.addWidget(self.token_chunk_check)
+
+        # Budget row: stop sending requests once the run would cost more
+        budget_row = QHBoxLayout()
+        budget_row.setSpacing(SPACING_SMALL)
+        budget_label = BodyLabel(t("gen.budget"), self)
+        self.budget_spin = DoubleSpinBox(self)
+        self.budget_spin.setRange(0.0, 10000.0)
+        self.budget_spin.setDecimals(2)
+        self.budget_spin.setSingleStep(1.0)
+        self.budget_spin.setValue(0.0)
+        self.budget_spin.setToolTip(t("gen.budget_tip"))
+        budget_row.addWidget(budget_label)
+        budget_row.addWidget(self.budget_spin, 1)
+        settings_layout.addLayout(budget_row)
+
+        # Reuse cached responses for unchanged chunks
+        self.cache_check = CheckBox(t("gen.use_cache"), self)
+        self.cache_check.setChecked(True)
+        settings_layout.addWidget(self.cache_check)
+
+        # Resume from the chunk journal of an interrupted run
+        self.resume_check = CheckBox(t("gen.resume"), self)
+        self.resume_check.setChecked(True)
+        settings_layout.addWidget(self.resume_check)
+
+        # Stream responses: entries appear as they are generated and a
+        # truncated response only re-requests its missing tail
+        self.streaming_check = CheckBox(t("gen.streaming"), self)
+        settings_layout.addWidget(self.streaming_check)
+
+        # Compact protocol: short system-message spec and terse rows
+        # instead of full JSON objects
+        self.compact_check = CheckBox(t("gen.compact"), self)
+        settings_layout.addWidget(self.compact_check)
+
+        # Hedge slow chunks and fail over to the other configured providers
+        self.hedge_check = CheckBox(t("gen.hedge"), self)
+        settings_layout.addWidget(self.hedge_check)
+
         left_layout.addWidget(settings_card)
 
         # --- Chapter selection card ---
@@ -198,8 +250,36 @@ class JsonGenPage(QWidget):
         self.progress_bar.setValue(0)
         progress_layout.addWidget(self.progress_bar)
 
+        # Latest streamed entry
+        self.preview_label = BodyLabel("", self)
+        self.preview_label.setWordWrap(True)
+        progress_layout.addWidget(self.preview_label)
+
         right_layout.addWidget(progress_card, 1)
 
+        # --- Metrics card ---
+        metrics_card = CardWidget(self)
+        metrics_layout = QVBoxLayout(metrics_card)
+        metrics_layout.setContentsMargins(
+            SPACING_MEDIUM, SPACING_MEDIUM, SPACING_MEDIUM, SPACING_MEDIUM
+        )
+        metrics_layout.setSpacing(SPACING_SMALL)
+
+        metrics_title = SubtitleLabel(t("gen.metrics"), self)
+        metrics_layout.addWidget(metrics_title)
+
+        self.metrics_label = BodyLabel("", self)
+        metrics_font = QFont("Consolas", 9)
+        metrics_font.setStyleHint(QFont.StyleHint.Monospace)
+        self.metrics_label.setFont(metrics_font)
+        metrics_layout.addWidget(self.metrics_label)
+
+        self.bottleneck_label = BodyLabel("", self)
+        self.bottleneck_label.setWordWrap(True)
+        metrics_layout.addWidget(self.bottleneck_label)
+
+        right_layout.addWidget(metrics_card)
+
         # --- Log card ---
         log_card = CardWidget(self)
         log_layout = QVBoxLayout(log_card)
@@ -213,6 +293,7 @@ class JsonGenPage(QWidget):
 
         self.log_text = QPlainTextEdit(self)
         self.log_text.setReadOnly(True)
+        self.log_text.setMaximumBlockCount(_LOG_MAX_LINES)
         mono_font = QFont("Consolas", 10)
         mono_font.setStyleHint(QFont.StyleHint.Monospace)
         self.log_text.setFont(mono_font)
@@ -277,18 +358,75 @@ class JsonGenPage(QWidget):
         if item is not None:
             item.setText(text)
 
+    def update_chapter_statuses(self, updates: list) -> None:
+        """Apply a batch of ``(index, status, message)`` chapter updates."""
+        for index, status, message in updates:
+            self.update_chapter_status(index, status, message)
+
     def append_log(self, message: str) -> None:
         """Append a message to the log area and scroll to the bottom."""
-        self.log_text.appendPlainText(message)
+        self.append_logs([message])
+
+    def append_logs(self, messages: list) -> None:
+        """Append a batch of messages with one insert and one scroll."""
+        if not messages:
+            return
+        self.log_text.appendPlainText("\n".join(messages))
         scrollbar = self.log_text.verticalScrollBar()
         if scrollbar is not None:
             scrollbar.setValue(scrollbar.maximum())
 
+    def show_entry_preview(self, index: int, entry: dict) -> None:
+        """Show the most recently streamed entry of chapter *index*."""
+        content = str(entry.get("content", ""))
+        if len(content) > 60:
+            content = content[:60] + "…"
+        self.preview_label.setText(
+            f"{t('gen.latest_entry')} [{index}] {entry.get('speaker', '')}: {content}"
+        )
+
+    def update_metrics(self, snapshot: dict) -> None:
+        """Show a :meth:`~gui.core.metrics.PipelineMetrics.snapshot`.
+
+        Parameters
+        ----------
+        snapshot : dict
+            Stage timings, token totals, counters and bottleneck of the run.
+        """
+        lines = [t("gen.metrics_header")]
+        for stage in STAGES:
+            stats = snapshot["stages"][stage]
+            # Name last: CJK names would break fixed-width columns
+            lines.append(
+                f"{stats['total']:>8.1f}{stats['count']:>6}"
+                f"{stats['mean'] * 1000:>10.0f}{stats['p95'] * 1000:>9.0f}  "
+                + t(f"gen.stage.{stage}")
+            )
+        tokens = snapshot["tokens"]
+        counters = snapshot["counters"]
+        lines.append(t("gen.metrics_tokens").format(
+            prompt=tokens["prompt"],
+            cached=tokens["cached"],
+            completion=tokens["completion"],
+            requests=counters.get("requests", 0),
+            throttled=counters.get("throttled", 0),
+            errors=counters.get("errors", 0),
+        ))
+        self.metrics_label.setText("\n".join(lines))
+        self.bottleneck_label.setText(t("gen.metrics_bottleneck").format(
+            verdict=t(f"gen.bottleneck.{snapshot['bottleneck'] or 'none'}"),
+            elapsed=snapshot["elapsed"],
+            cpu=snapshot["cpu_share"],
+        ))
+
     def reset_progress(self) -> None:
-        """Clear the progress list, progress bar, and log area."""
+        """Clear the progress list, progress bar, log area, preview and metrics."""
         self.status_list.clear()
         self.progress_bar.setValue(0)
         self.log_text.clear()
+        self.preview_label.clear()
+        self.metrics_label.clear()
+        self.bottleneck_label.clear()
 
     def set_generating(self, generating: bool) -> None:
         """Toggle between generating and idle UI state."""
@@ -296,7 +434,16 @@ class JsonGenPage(QWidget):
         self.cancel_btn.setVisible(generating)
         self.provider_combo.setEnabled(not generating)
         self.workers_slider.setEnabled(not generating)
-        self.chunk_spin.setEnabled(not generating)
+        self.chunk_spin.setEnabled(
+            not generating and not self.token_chunk_check.isChecked()
+        )
+        self.token_chunk_check.setEnabled(not generating)
+        self.budget_spin.setEnabled(not generating)
+        self.cache_check.setEnabled(not generating)
+        self.resume_check.setEnabled(not generating)
+        self.streaming_check.setEnabled(not generating)
+        self.compact_check.setEnabled(not generating)
+        self.hedge_check.setEnabled(not generating)
         self.select_all_btn.setEnabled(not generating)
         self.deselect_all_btn.setEnabled(not generating)
 
@@ -328,4 +475,14 @@ class JsonGenPage(QWidget):
         provider = self.provider_combo.currentText()
         workers = self.workers_slider.value()
         chunk_size = self.chunk_spin.value()
-        self.generate_requested.emit(selected, provider, workers, chunk_size)
+        token_chunking = self.token_chunk_check.isChecked()
+        use_cache = self.cache_check.isChecked()
+        resume = self.resume_check.isChecked()
+        streaming = self.streaming_check.isChecked()
+        compact = self.compact_check.isChecked()
+        hedge = self.hedge_check.isChecked()
+        budget = self.budget_spin.value()
+        self.generate_requested.emit(
+            selected, provider, workers, chunk_size, token_chunking, use_cache, resume,
+            streaming, compact, hedge, budget,
+        )
@@ -205,7 +205,7 @@ class SettingsPage(ScrollArea):
 
         # Max workers spin box
         self._workers_spin = SpinBox()
-        self._workers_spin.setRange(1, 20)
+        self._workers_spin.setRange(1, 256)
 
         # Similarity threshold slider + value label
         self._threshold_slider = Slider(Qt.Orientation.Horizontal)
@@ -1,14 +1,59 @@
 from __future__ import annotations
+import asyncio
+import copy
 import json
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import Counter
 from PyQt6.QtCore import QThread, pyqtSignal
-from openai import OpenAI
-from gui.core.pipeline import SPEC_PROMPT, split_text_into_chunks, extract_json_from_response
+from gui.core.alignment import align_entries
+from gui.core.budget import BudgetExceeded, BudgetGovernor, estimate_run, get_price, max_tokens_for
+from gui.core.compact_protocol import (
+    COMPACT_ENTRY_OVERHEAD,
+    COMPACT_SPEC_PROMPT,
+    build_compact_messages,
+    decode_compact,
+)
+from gui.core.journal import ChunkJournal
+from gui.core.json_repair import DEFAULT_MIN_COVERAGE, coverage, repair_json_array
+from gui.core.json_stream import JsonArrayStream, uncovered_tail
+from gui.core.llm_engine import is_throttle_error, iter_completed
+from gui.core.metrics import PipelineMetrics, chapter_scope
+from gui.core.pipeline import SPEC_PROMPT, iter_chunks, extract_json_from_response
+from gui.core.postprocess import describe_stats, postprocess_entries
+from gui.core.response_cache import DEFAULT_CACHE_DIR, ResponseCache, cache_key, prompt_fingerprint
+from gui.core.router import build_router
+from gui.core.tokens import get_token_estimator, iter_token_chunks
+from gui.core.ui_batch import FLUSH_INTERVAL, UpdateBatcher
+
+# Tokens of instruction text wrapped around SPEC_PROMPT in each request
+_PROMPT_WRAPPER_TOKENS = 200
+
+# Fixed system message of the standard protocol
+_SYSTEM_PROMPT = (
+    "你是一个严格的格式化器。\n"
+    "根据下述【规范】将用户提供的【小说片段】转换为 index-tts v2 有声书 JSON。\n"
+    "注意：每个片段只是小说的一小部分，请只处理这段文字，不要编造开头或结尾，直接输出 JSON 数组。\n\n"
+    "【规范】如下：\n" + SPEC_PROMPT
+)
+
+# Sampling parameters sent with every chunk (also part of the cache key);
+# max_tokens is sized per request from the expected output
+_CHUNK_PARAMS = {"temperature": 0.2}
+
+# Chunk jobs running per request slot; the rest wait in the job list
+# rather than as tasks, leaving headroom for parsing and gap-filling
+_JOBS_PER_SLOT = 2
+
+# Seconds between metrics snapshots sent to the dashboard
+_METRICS_INTERVAL = 1.0
 
 class JsonGenWorker(QThread):
-    chapter_progress = pyqtSignal(int, str, str)  # chapter_index, status, message
-    log_message = pyqtSignal(str)                  # log text
+    # Log lines and chapter states are sent in batches at most every
+    # FLUSH_INTERVAL seconds; see gui.core.ui_batch
+    progress_batch = pyqtSignal(list)              # (chapter_index, status, message) tuples
+    log_batch = pyqtSignal(list)                   # log lines
+    entry_ready = pyqtSignal(int, dict)            # chapter_index, latest streamed entry
+    metrics_updated = pyqtSignal(dict)             # PipelineMetrics snapshot
     finished = pyqtSignal(list)                     # list of result dicts
     error = pyqtSignal(str)
 
@@ -22,6 +67,17 @@ class JsonGenWorker(QThread):
         model: str,
         max_workers: int = 5,
         chunk_size: int = 8000,
+        token_chunking: bool = False,
+        use_cache: bool = True,
+        cache_path: str | None = None,
+        journal_path: str | None = None,
+        resume: bool = False,
+        streaming: bool = False,
+        compact: bool = False,
+        min_coverage: float = DEFAULT_MIN_COVERAGE,
+        verify_coverage: bool = True,
+        fallbacks: list | None = None,  # dicts with provider, api_key, base_url, model
+        budget: float = 0.0,            # USD ceiling for the run; 0 = unlimited
     ):
         super().__init__()
         self._chapters = chapters
@@ -32,70 +88,310 @@ class JsonGenWorker(QThread):
         self._model = model
         self._max_workers = max_workers
         self._chunk_size = chunk_size
+        self._token_chunking = token_chunking
+        self._use_cache = use_cache
+        self._cache_path = cache_path or str(DEFAULT_CACHE_DIR / "responses.sqlite3")
+        self._cache = None
+        self._journal_path = journal_path
+        self._resume = resume
+        self._journal = None
+        # The compact format is decoded line by line at the end, not streamed
+        self._compact = compact
+        self._streaming = streaming and not compact
+        self._min_coverage = min_coverage
+        self._verify_coverage = verify_coverage
+        # Backup providers for hedged requests and failover, in order
+        self._fallbacks = fallbacks or []
+        self._budget = budget
+        # max_tokens must suit every provider a request may be routed to
+        self._output_cap = min(
+            get_token_estimator(p).max_output_tokens
+            for p in [provider] + [f["provider"] for f in self._fallbacks]
+        )
+        self._template_version = prompt_fingerprint(
+            json.dumps(self._build_request(""), ensure_ascii=False)
+        )
+        self._metrics = PipelineMetrics()
+        self._updates = UpdateBatcher()
         self._cancelled = False
 
     def cancel(self):
         self._cancelled = True
 
-    def _process_chapter(self, client, chapter):
-        """Process a single chapter: chunk -> LLM -> merge."""
-        idx = chapter["index"]
-        title = chapter["title"]
-        content = chapter["content"]
+    def _log(self, message: str) -> None:
+        self._updates.log(message)
 
-        self.chapter_progress.emit(idx, "processing", f"正在处理: {title}")
-        self.log_message.emit(f"[章节 {idx}] 开始处理: {title}")
+    def _flush_updates(self) -> None:
+        """Send the log lines, chapter states and entry collected since the last flush."""
+        batch = self._updates.drain()
+        if batch.progress:
+            self.progress_batch.emit(batch.progress)
+        if batch.lines:
+            self.log_batch.emit(batch.lines)
+        if batch.entry is not None:
+            self.entry_ready.emit(*batch.entry)
 
-        chunks = split_text_into_chunks(content, self._chunk_size)
-        self.log_message.emit(f"[章节 {idx}] 已切分为 {len(chunks)} 个片段")
+    async def _publish_updates(self):
+        """Flush UI updates every FLUSH_INTERVAL and metrics every _METRICS_INTERVAL."""
+        next_metrics = time.monotonic() + _METRICS_INTERVAL
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            self._flush_updates()
+            if time.monotonic() >= next_metrics:
+                next_metrics += _METRICS_INTERVAL
+                self.metrics_updated.emit(self._metrics.snapshot())
 
-        all_entries = []
+    async def _run_publishing(self):
+        publisher = asyncio.ensure_future(self._publish_updates())
+        try:
+            await self._run()
+        finally:
+            publisher.cancel()
+
+    def _estimator(self, provider: str | None = None):
+        """Token estimator of *provider* (default: the selected one) for the protocol."""
+        estimator = get_token_estimator(provider or self._provider)
+        if self._compact:
+            estimator = copy.copy(estimator)
+            estimator.entry_overhead = COMPACT_ENTRY_OVERHEAD
+        return estimator
+
+    def _chapter_chunks(self, content: str):
+        """Split one chapter's content into its chunk texts."""
+        if self._token_chunking:
+            estimator = self._estimator()
+            spec = COMPACT_SPEC_PROMPT if self._compact else SPEC_PROMPT
+            prompt_tokens = estimator.count(spec) + _PROMPT_WRAPPER_TOKENS
+            return iter_token_chunks(content, estimator, prompt_tokens)
+        return iter_chunks(content, self._chunk_size)
+
+    def _endpoints(self) -> list[dict]:
+        """The selected provider, then the fallbacks, in routing order."""
+        return [{
+            "provider": self._provider, "api_key": self._api_key,
+            "base_url": self._base_url, "model": self._model,
+        }] + self._fallbacks
+
+    def _cache_key(self, provider: str, model: str, chunk_text: str) -> str:
+        return cache_key(provider, model, self._template_version, chunk_text, _CHUNK_PARAMS)
+
+    def _request_params(self, text: str) -> dict:
+        """Sampling parameters for converting *text*, with a sized max_tokens."""
+        max_tokens = min(max_tokens_for(text, self._estimator()), self._output_cap)
+        return dict(_CHUNK_PARAMS, max_tokens=max_tokens)
+
+    def _preflight(self, texts: list, endpoints: list) -> None:
+        """Log the expected tokens and cost of requesting *texts* once."""
+        primary_cost = None
+        for endpoint in endpoints:
+            estimate = estimate_run(texts, self._build_request, self._estimator(endpoint["provider"]))
+            price = get_price(endpoint["provider"], endpoint["model"])
+            self._log(estimate.report(endpoint["provider"], price))
+            if primary_cost is None:
+                primary_cost = estimate.cost(price)
+        if self._budget > 0 and primary_cost is not None and primary_cost > self._budget:
+            self._log(
+                f"预估费用 ${primary_cost:.2f} 超过预算 ${self._budget:.2f}，"
+                f"达到预算后将停止发送新请求"
+            )
+
+    @staticmethod
+    def _build_messages(chunk_text: str) -> list[dict]:
+        # Everything but the chunk is a byte-identical system message, so
+        # providers with prompt prefix caching reuse it across chunks
+        return [
+            {"role": "system", "content": _SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": f"【小说片段】如下：\n'''\n{chunk_text}\n'''\n\n请直接输出 JSON 数组：",
+            },
+        ]
+
+    def _build_request(self, chunk_text: str) -> list[dict]:
+        """Chat messages for one chunk in the selected protocol."""
+        if self._compact:
+            return build_compact_messages(chunk_text)
+        return self._build_messages(chunk_text)
+
+    def _accept(self, raw: str) -> bool:
+        """Whether *raw* is a complete response (decides hedge races)."""
+        if self._compact:
+            return decode_compact(raw).complete
+        return isinstance(extract_json_from_response(raw), list)
+
+    def _salvage(self, raw: str):
+        """Entries recoverable from an unparsed or incomplete response."""
+        if self._compact:
+            return decode_compact(raw)
+        return repair_json_array(raw)
+
+    async def _process_chunk(self, engine, job):
+        """Convert one chunk to JSON entries; None if it failed or was cancelled."""
+        idx = job["chapter_index"]
+        i = job["chunk_no"]
+        chunk_text = job["text"]
+
+        if self._cancelled:
+            return None
+
+        if self._cache is not None:
+            # Any backend of this run could have answered the chunk
+            cached = self._cache.get_any(
+                self._cache_key(endpoint["provider"], endpoint["model"], chunk_text)
+                for endpoint in self._endpoints()
+            )
+            if cached is not None:
+                self._log(f"[章节 {idx}] 片段 {i+1} 命中缓存")
+                return cached
+
+        # Provider and model of every reply the entries are built from
+        answered = set()
+
+        def on_answer(provider, model):
+            answered.add((provider, model))
 
-        for i, chunk_text in enumerate(chunks):
+        self._log(f"[章节 {idx}] 处理片段 {i+1} ({len(chunk_text)}字符)")
+
+        max_retries = 3
+        collected = []          # entries kept from incomplete responses
+        remaining = chunk_text  # source text not yet covered by them
+
+        for attempt in range(max_retries):
             if self._cancelled:
-                return {"chapter_index": idx, "chapter_title": title, "entries": [], "status": "cancelled"}
+                return None
+            parser = JsonArrayStream() if self._streaming else None
+            deltas = []
+            raw = ""
+            try:
+                request = self._build_request(remaining)
+                params = self._request_params(remaining)
+                if parser is not None:
+                    parse_time = 0.0
+                    try:
+                        async for delta in engine.stream(request, on_answer=on_answer, **params):
+                            deltas.append(delta)
+                            t0 = time.perf_counter()
+                            streamed = parser.feed(delta)
+                            parse_time += time.perf_counter() - t0
+                            for entry in streamed:
+                                self._updates.entry(idx, entry)
+                    finally:
+                        self._metrics.observe("parse", parse_time)
+                    parsed = parser.entries if parser.done and not parser.dropped else None
+                else:
+                    raw = await engine.complete(
+                        request, accept=self._accept, on_answer=on_answer, **params,
+                    )
+                    with self._metrics.stage("parse"):
+                        if self._compact:
+                            decoded = decode_compact(raw)
+                            parsed = decoded.entries if decoded.complete else None
+                        else:
+                            parsed = extract_json_from_response(raw)
 
-            if not chunk_text.strip():
+                if isinstance(parsed, list):
+                    entries = collected + parsed
+                    break
+            except BudgetExceeded:
+                raise
+            except Exception as e:
+                self._log(f"[章节 {idx}] 片段 {i+1} 第{attempt+1}次API错误: {e}")
+                # Throttles are waited out by the provider limiter
+                if not is_throttle_error(e):
+                    await asyncio.sleep(2)
+
+            # Malformed or truncated output is repaired locally; the
+            # salvaged objects are kept and only the uncovered tail of
+            # the chunk is requested again
+            with self._metrics.stage("validate"):
+                repaired = self._salvage("".join(deltas) if parser is not None else raw)
+            if not repaired.entries:
+                if raw or deltas:
+                    self._log(f"[章节 {idx}] 片段 {i+1} 第{attempt+1}次解析失败，重试中...")
                 continue
+            self._log(f"[章节 {idx}] 片段 {i+1} {repaired.summary()}")
+            collected.extend(repaired.entries)
+            with self._metrics.stage("validate"):
+                covered = coverage(remaining, repaired.entries) >= self._min_coverage
+                if not covered:
+                    remaining = uncovered_tail(remaining, repaired.entries)
+            if covered:
+                entries = collected
+                break
+            self._log(
+                f"[章节 {idx}] 片段 {i+1} 响应不完整，已保留 {len(repaired.entries)} 条，"
+                f"重新请求剩余 {len(remaining)} 字符"
+            )
+        else:
+            self._log(f"[章节 {idx}] 片段 {i+1} 处理失败，已跳过")
+            return None
 
-            self.log_message.emit(f"[章节 {idx}] 处理片段 {i+1}/{len(chunks)} ({len(chunk_text)}字符)")
+        if self._verify_coverage:
+            entries = await self._fill_missing(engine, job, entries, on_answer)
+        # Cached under the backend that produced it; entries assembled
+        # from several backends' replies are not cached
+        if self._cache is not None and len(answered) == 1:
+            provider, model = next(iter(answered))
+            self._cache.put(self._cache_key(provider, model, chunk_text), entries)
+        return entries
 
-            user_prompt = (
-                "你是一个严格的格式化器。\n"
-                f"根据下述【规范】将提供的【小说片段】转换为 index-tts v2 有声书 JSON。\n"
-                "注意：这只是小说的一小部分，请只处理这段文字，不要编造开头或结尾，直接输出 JSON 数组。\n\n"
-                "【规范】如下：\n" + SPEC_PROMPT + "\n"
-                "【小说片段】如下：\n"
-                f"'''\n{chunk_text}\n'''\n\n"
-                "请直接输出 JSON 数组："
+    async def _fill_missing(self, engine, job, entries, on_answer=None):
+        """Request the source spans the entries skipped and splice them in."""
+        idx = job["chapter_index"]
+        i = job["chunk_no"]
+        chunk_text = job["text"]
+        with self._metrics.stage("validate"):
+            alignment = align_entries(chunk_text, entries)
+        if not alignment.missing:
+            return entries
+        self._log(
+            f"[章节 {idx}] 片段 {i+1} 覆盖率 {alignment.coverage:.0%}，"
+            f"补请求 {len(alignment.missing)} 段遗漏文本"
+        )
+
+        async def request_span(span):
+            text = chunk_text[span[0]:span[1]]
+            try:
+                raw = await engine.complete(
+                    self._build_request(text), on_answer=on_answer, **self._request_params(text),
+                )
+            except Exception as e:
+                self._log(f"[章节 {idx}] 片段 {i+1} 补请求失败: {e}")
+                return None
+            with self._metrics.stage("parse"):
+                parsed = None if self._compact else extract_json_from_response(raw)
+                if not isinstance(parsed, list):
+                    parsed = self._salvage(raw).entries or None
+            return parsed
+
+        fills = await asyncio.gather(*(request_span(span) for span in alignment.missing))
+        filled = sum(1 for fill in fills if fill)
+        if filled < len(fills):
+            self._log(
+                f"[章节 {idx}] 片段 {i+1} {len(fills) - filled} 段遗漏文本补请求未成功，保留原结果"
             )
+        with self._metrics.stage("validate"):
+            return alignment.splice(entries, fills)
 
-            chunk_success = False
-            max_retries = 3
+    def _finish_chapter(self, chapter, chunk_entries):
+        """Merge a chapter's chunk results in chunk order and prepend its title."""
+        with self._metrics.stage("merge", chapter["index"]):
+            return self._merge_chapter(chapter, chunk_entries)
 
-            for attempt in range(max_retries):
-                try:
-                    response = client.chat.completions.create(
-                        model=self._model,
-                        messages=[{"role": "user", "content": user_prompt}],
-                        temperature=0.2,
-                        max_tokens=1000000,
-                    )
-                    raw = response.choices[0].message.content
-                    parsed = extract_json_from_response(raw)
+    def _merge_chapter(self, chapter, chunk_entries):
+        idx = chapter["index"]
+        title = chapter["title"]
 
-                    if isinstance(parsed, list):
-                        all_entries.extend(parsed)
-                        chunk_success = True
-                        break
-                    else:
-                        self.log_message.emit(f"[章节 {idx}] 片段 {i+1} 第{attempt+1}次解析失败，重试中...")
-                except Exception as e:
-                    self.log_message.emit(f"[章节 {idx}] 片段 {i+1} 第{attempt+1}次API错误: {e}")
-                    time.sleep(2)
+        all_entries = []
+        for entries in chunk_entries:
+            if entries:
+                all_entries.extend(entries)
 
-            if not chunk_success:
-                self.log_message.emit(f"[章节 {idx}] 片段 {i+1} 处理失败，已跳过")
+        # Segment length, punctuation and narrator vector are enforced
+        # locally rather than by the prompt
+        stats = Counter()
+        all_entries = postprocess_entries(all_entries, stats=stats)
+        self._log(f"[章节 {idx}] {describe_stats(stats)}")
 
         # Prepend chapter title
         if title and title != "扉页":
@@ -112,8 +408,8 @@ class JsonGenWorker(QThread):
         }
         all_entries.insert(0, title_entry)
 
-        self.log_message.emit(f"[章节 {idx}] 完成，共生成 {len(all_entries)} 条数据")
-        self.chapter_progress.emit(idx, "done", f"完成: {title} ({len(all_entries)}条)")
+        self._log(f"[章节 {idx}] 完成，共生成 {len(all_entries)} 条数据")
+        self._updates.progress(idx, "done", f"完成: {title} ({len(all_entries)}条)")
 
         return {
             "chapter_index": idx,
@@ -124,54 +420,148 @@ class JsonGenWorker(QThread):
 
     def run(self):
         try:
-            client = OpenAI(api_key=self._api_key, base_url=self._base_url)
+            if self._use_cache:
+                self._cache = ResponseCache(self._cache_path)
+            if self._journal_path:
+                self._journal = ChunkJournal(self._journal_path, resume=self._resume)
+            asyncio.run(self._run_publishing())
+        except Exception as e:
+            self._flush_updates()
+            self.error.emit(f"生成出错: {str(e)}")
+        finally:
+            if self._cache is not None:
+                self._cache.close()
+                self._cache = None
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+    async def _run(self):
+        # Filter chapters by selected indices
+        to_process = [ch for ch in self._chapters if ch["index"] in self._selected_indices]
+
+        if not to_process:
+            self._flush_updates()
+            self.error.emit("没有选中任何章节")
+            return
+
+        # Every chunk of every chapter is an independent job, so one huge
+        # chapter no longer leaves the rest of the pool idle at the end
+        self._metrics = PipelineMetrics()
+        jobs = []
+        pending = {}        # chapter index -> chunks still outstanding
+        chunk_results = {}  # chapter index -> per-chunk entries, in order
+        chapters_by_index = {}
+        replayed = 0
+        for ch in to_process:
+            with self._metrics.stage("chunking", ch["index"]):
+                chunk_texts = [c for c in self._chapter_chunks(ch["content"]) if c.strip()]
+            chapters_by_index[ch["index"]] = ch
+            pending[ch["index"]] = len(chunk_texts)
+            chunk_results[ch["index"]] = [None] * len(chunk_texts)
+            for i, chunk_text in enumerate(chunk_texts):
+                # Chunks already in the journal are not requested again
+                done = self._journal.get(ch["index"], i, chunk_text) if self._journal else None
+                if done is not None:
+                    chunk_results[ch["index"]][i] = done
+                    pending[ch["index"]] -= 1
+                    replayed += 1
+                    continue
+                jobs.append({"chapter_index": ch["index"], "chunk_no": i, "text": chunk_text})
+
+        if replayed:
+            self._log(f"从断点日志恢复 {replayed} 个片段")
 
-            # Filter chapters by selected indices
-            to_process = [ch for ch in self._chapters if ch["index"] in self._selected_indices]
+        # Longest first: the slowest requests start early instead of
+        # becoming the tail of the run
+        jobs.sort(key=lambda job: len(job["text"]), reverse=True)
 
-            if not to_process:
-                self.error.emit("没有选中任何章节")
-                return
+        endpoints = self._endpoints()
+        self._preflight([job["text"] for job in jobs], endpoints)
 
-            self.log_message.emit(f"开始处理 {len(to_process)} 个章节 (并发数: {self._max_workers})")
+        self._log(
+            f"开始处理 {len(to_process)} 个章节，共 {len(jobs)} 个片段 (并发数: {self._max_workers})"
+        )
 
-            results = []
+        results = []
 
-            # Mark all as pending
-            for ch in to_process:
-                self.chapter_progress.emit(ch["index"], "pending", f"等待中: {ch['title']}")
+        # Mark all as pending; chapters with nothing left to request are
+        # done at once
+        for ch in to_process:
+            self._updates.progress(ch["index"], "pending", f"等待中: {ch['title']}")
+            if pending[ch["index"]] == 0:
+                results.append(self._finish_chapter(ch, chunk_results[ch["index"]]))
 
-            # Process in parallel
-            workers = min(len(to_process), self._max_workers)
-            with ThreadPoolExecutor(max_workers=workers) as executor:
-                futures = {
-                    executor.submit(self._process_chapter, client, ch): ch
-                    for ch in to_process
-                }
+        started = set()
 
-                for future in as_completed(futures):
+        async def run_job(job):
+            idx = job["chapter_index"]
+            if idx not in started:
+                started.add(idx)
+                title = chapters_by_index[idx]["title"]
+                self._updates.progress(idx, "processing", f"正在处理: {title}")
+                self._log(f"[章节 {idx}] 开始处理: {title}")
+            # Requests made for this job (and its hedges) count towards its chapter
+            with chapter_scope(idx):
+                return await self._process_chunk(engine, job)
+
+        if self._fallbacks:
+            self._log(
+                "多服务商对冲: " + " → ".join(endpoint["provider"] for endpoint in endpoints)
+            )
+
+        budget = BudgetGovernor(self._budget, on_event=self._log)
+        async with build_router(
+            endpoints, concurrency=self._max_workers, on_event=self._log,
+            metrics=self._metrics, budget=budget,
+        ) as engine:
+            completed = iter_completed(jobs, run_job, limit=_JOBS_PER_SLOT * self._max_workers)
+            try:
+                async for job, result in completed:
+                    # Journal first, so work finished while cancelling is kept
+                    if isinstance(result, list) and self._journal is not None:
+                        self._journal.record(
+                            job["chapter_index"], job["chunk_no"], job["text"], result,
+                        )
                     if self._cancelled:
                         break
-                    try:
-                        result = future.result()
-                        results.append(result)
-                    except Exception as e:
-                        ch = futures[future]
-                        self.chapter_progress.emit(ch["index"], "error", f"错误: {str(e)}")
-                        self.log_message.emit(f"[章节 {ch['index']}] 处理异常: {e}")
+                    idx = job["chapter_index"]
+                    if pending[idx] is None:
+                        continue  # chapter already failed
+                    if isinstance(result, Exception):
+                        ch = chapters_by_index[idx]
+                        pending[idx] = None
+                        self._updates.progress(idx, "error", f"错误: {str(result)}")
+                        self._log(f"[章节 {idx}] 处理异常: {result}")
                         results.append({
-                            "chapter_index": ch["index"],
+                            "chapter_index": idx,
                             "chapter_title": ch["title"],
                             "entries": [],
                             "status": "error",
-                            "error_message": str(e)
+                            "error_message": str(result)
                         })
+                        continue
 
-            # Sort results by chapter index
-            results.sort(key=lambda r: r["chapter_index"])
+                    chunk_results[idx][job["chunk_no"]] = result
+                    pending[idx] -= 1
+                    if pending[idx] == 0:
+                        results.append(
+                            self._finish_chapter(chapters_by_index[idx], chunk_results[idx])
+                        )
+            finally:
+                await completed.aclose()
 
-            self.log_message.emit(f"全部处理完成! 共 {len(results)} 个章节")
-            self.finished.emit(results)
+        # Sort results by chapter index
+        results.sort(key=lambda r: r["chapter_index"])
 
-        except Exception as e:
-            self.error.emit(f"生成出错: {str(e)}")
+        if self._cache is not None:
+            self._log(self._cache.report())
+        if self._fallbacks:
+            self._log(engine.report())
+        self._log(engine.usage.report())
+        self._log(budget.report())
+        self._log(self._metrics.summary())
+        self.metrics_updated.emit(self._metrics.snapshot())
+        self._log(f"全部处理完成! 共 {len(results)} 个章节")
+        self._flush_updates()
+        self.finished.emit(results)
@@ -1,8 +1,8 @@
 from __future__ import annotations
+import asyncio
 import json
-import time
 from PyQt6.QtCore import QThread, pyqtSignal
-from openai import OpenAI
+from gui.core.llm_engine import LLMEngine, is_throttle_error
 from gui.core.pipeline import (
     extract_speakers_from_entries,
     build_classify_prompt,
@@ -35,34 +35,43 @@ class SpeakerClassifyWorker(QThread):
     finished = pyqtSignal(dict)   # classifications dict
     error = pyqtSignal(str)
 
-    def __init__(self, speaker_names: list, api_key: str, base_url: str, model: str):
+    def __init__(
+        self, speaker_names: list, api_key: str, base_url: str, model: str,
+        provider: str = "openrouter",
+    ):
         super().__init__()
         self._speaker_names = speaker_names
         self._api_key = api_key
         self._base_url = base_url
         self._model = model
+        self._provider = provider
 
     def run(self):
         try:
-            # Filter out narration
-            names = [n for n in self._speaker_names if n != "旁白"]
-            if not names:
-                self.finished.emit({})
-                return
+            asyncio.run(self._run())
+        except Exception as e:
+            self.error.emit(f"分类出错: {str(e)}")
+
+    async def _run(self):
+        # Filter out narration
+        names = [n for n in self._speaker_names if n != "旁白"]
+        if not names:
+            self.finished.emit({})
+            return
 
-            prompt = build_classify_prompt(names)
-            client = OpenAI(api_key=self._api_key, base_url=self._base_url)
+        prompt = build_classify_prompt(names)
 
+        async with LLMEngine(
+            self._api_key, self._base_url, self._model, concurrency=1, provider=self._provider,
+        ) as engine:
             max_retries = 3
             for attempt in range(max_retries):
                 try:
-                    response = client.chat.completions.create(
-                        model=self._model,
-                        messages=[{"role": "user", "content": prompt}],
+                    raw = await engine.complete(
+                        prompt,
                         temperature=0.1,
                         max_tokens=600000,
                     )
-                    raw = response.choices[0].message.content
 
                     # Clean markdown blocks
                     text = raw.strip()
@@ -79,11 +88,10 @@ class SpeakerClassifyWorker(QThread):
                     return
                 except Exception as e:
                     if attempt < max_retries - 1:
-                        time.sleep(2)
+                        if not is_throttle_error(e):
+                            await asyncio.sleep(2)
                     else:
                         self.error.emit(f"AI分类失败: {str(e)}")
-        except Exception as e:
-            self.error.emit(f"分类出错: {str(e)}")
 
 
 class SpeakerReplaceWorker(QThread):
@@ -0,0 +1,94 @@
+from __future__ import annotations
+from PyQt6.QtCore import QThread, pyqtSignal
+from gui.core.pipeline import (
+    SplitScoreTable,
+    split_by_heading_patterns,
+    split_by_title_alignment,
+)
+
+
+class SplitWorker(QThread):
+    progress = pyqtSignal(int, str)   # percentage, message
+    finished = pyqtSignal(list)        # list of chapter dicts
+    table_ready = pyqtSignal(object)   # SplitScoreTable for live re-splits
+    error = pyqtSignal(str)
+
+    def __init__(self, content: str, titles: list, threshold: int, workers: int = 1,
+                 method: str = "fuzzy", floor: int = 20):
+        super().__init__()
+        self._content = content
+        self._titles = titles
+        self._threshold = threshold
+        self._workers = workers
+        self._method = method
+        self._floor = min(floor, threshold)
+
+    def run(self):
+        try:
+            if not self._titles:
+                self.error.emit("章节目录为空，请先输入章节标题")
+                return
+
+            self.progress.emit(10, "正在匹配章节标题...")
+            lines = self._content.splitlines()
+            if self._method == "aligned":
+                chapters = split_by_title_alignment(
+                    lines, self._titles, self._threshold, workers=self._workers,
+                )
+                self.progress.emit(100, "分割完成")
+                self.finished.emit(chapters)
+                return
+
+            # Score once at the slider's lower bound so later threshold
+            # changes only filter the cached table
+            table = SplitScoreTable(
+                lines, self._titles, floor=self._floor, workers=self._workers,
+            )
+            chapters = table.split(self._threshold)
+            self.progress.emit(100, "分割完成")
+            self.table_ready.emit(table)
+            self.finished.emit(chapters)
+        except Exception as e:
+            self.error.emit(f"分割章节失败: {str(e)}")
+
+
+class TitleUpdateWorker(QThread):
+    finished = pyqtSignal(object, list)  # updated SplitScoreTable, list of chapter dicts
+    error = pyqtSignal(str)
+
+    def __init__(self, table: SplitScoreTable, titles: list, threshold: int):
+        super().__init__()
+        # The GUI keeps splitting from the original table until this one is done
+        self._table = table.copy()
+        self._titles = titles
+        self._threshold = threshold
+
+    def run(self):
+        try:
+            self._table.update_titles(self._titles)
+            chapters = self._table.split(self._threshold)
+            self.finished.emit(self._table, chapters)
+        except Exception as e:
+            self.error.emit(f"更新章节目录失败: {str(e)}")
+
+
+class HeadingSplitWorker(QThread):
+    progress = pyqtSignal(int, str)   # percentage, message
+    finished = pyqtSignal(list)        # list of chapter dicts
+    error = pyqtSignal(str)
+
+    def __init__(self, content: str, patterns: list):
+        super().__init__()
+        self._content = content
+        self._patterns = patterns
+
+    def run(self):
+        try:
+            self.progress.emit(10, "正在识别章节标题...")
+            chapters = split_by_heading_patterns(self._content, self._patterns)
+            self.progress.emit(100, "分割完成")
+            self.finished.emit(chapters)
+        except ValueError as e:
+            self.error.emit(f"标题正则表达式无效: {str(e)}")
+        except Exception as e:
+            self.error.emit(f"分割章节失败: {str(e)}")
@@ -1,7 +1,14 @@
-import re
-from fuzzywuzzy import fuzz
+import argparse
 import os
 import config
+from gui.core.pipeline import (
+    HEADING_PATTERNS,
+    compile_heading_patterns,
+    split_by_fuzzy_matching,
+    split_by_heading_patterns,
+    split_by_title_alignment,
+)
+from gui.core.stream_split import split_file_streaming
 
 # 创建保存章节文件的文件夹
 def create_output_dir(directory):
@@ -14,7 +21,7 @@ def load_chapter_titles(chap_list_file):
         return [line.strip() for line in file.readlines()]
 
 # 逐行读取小说并进行章节分割
-def split_novel_by_fuzzy_matching(novel_file, chap_list_file):
+def split_novel_by_fuzzy_matching(novel_file, chap_list_file, threshold=40, workers=1, aligned=False):
     # 读取章节标题
     chapter_titles = load_chapter_titles(chap_list_file)
 
@@ -22,90 +29,89 @@ def split_novel_by_fuzzy_matching(novel_file, chap_list_file):
     with open(novel_file, 'r', encoding='utf-8') as file:
         novel_lines = file.readlines()
 
-    # 收集潜在分割点：title -> list of (line_index, score)
-    split_points = {title: [] for title in chapter_titles}
-
-    # 逐行检查每一行与目录中章节的模糊匹配
-    for idx, line in enumerate(novel_lines):
-        line = line.strip()
+    # 模糊匹配与分割（与 GUI 共用实现，先用标题索引筛掉不可能达到阈值的标题）
+    # workers > 1 时按连续行块分片，在多进程中并行打分
+    # aligned 时按目录顺序对齐标题与行（总分最高且顺序不乱）
+    split = split_by_title_alignment if aligned else split_by_fuzzy_matching
+    chapters = split(novel_lines, chapter_titles, threshold, workers=workers)
 
-        if not line:
-            continue  # 跳过空行
+    # 根据小说文件名创建输出文件夹
+    novel_name = os.path.splitext(os.path.basename(novel_file))[0]
+    output_dir = f"{novel_name}_chapters"
+    create_output_dir(output_dir)
 
-        # 对当前行与所有章节标题进行模糊匹配
-        best_match_score = 0
-        best_match_title = ""
+    # 保存每个章节
+    for chapter in chapters:
+        chapter_num = chapter["index"]
+        current_chapter_title = chapter["title"]
+        chapter_filename = os.path.join(output_dir, f"P{str(chapter_num).zfill(2)}_{current_chapter_title}.txt")
+        with open(chapter_filename, 'w', encoding='utf-8') as chapter_file:
+            chapter_file.write(chapter["content"])
+        print(f"Chapter {chapter_num}: {current_chapter_title} saved as {chapter_filename}")
 
-        for title in chapter_titles:
-            score = fuzz.ratio(line, title)
-            if score > best_match_score:
-                best_match_score = score
-                best_match_title = title
+# 流式分割：内存映射读取小说，边扫描边写出章节文件，适合上百 MB 的大文件
+def split_novel_streaming(novel_file, chap_list_file, threshold=40, workers=1, aligned=False):
+    chapter_titles = load_chapter_titles(chap_list_file)
 
-        # 如果匹配得分高于某个阈值，记录为潜在分割点
-        if best_match_score >= 40:  # 阈值可以根据实际情况调整
-            split_points[best_match_title].append((idx, best_match_score))
+    novel_name = os.path.splitext(os.path.basename(novel_file))[0]
+    output_dir = f"{novel_name}_chapters"
 
-    # 对于每个标题，选择得分最高的分割点
-    final_split_points = []
-    for title, points in split_points.items():
-        if points:
-            # 选择得分最高的
-            best_point = max(points, key=lambda x: x[1])
-            final_split_points.append((best_point[0], title))
+    chapters = split_file_streaming(novel_file, chapter_titles, output_dir, threshold,
+                                    workers=workers, aligned=aligned)
+    for chapter in chapters:
+        print(f"Chapter {chapter['index']}: {chapter['title']} saved as {chapter['path']} "
+              f"(bytes {chapter['byte_start']}-{chapter['byte_end']})")
+    return chapters
 
-    # 按行号排序分割点
-    final_split_points.sort(key=lambda x: x[0])
+# 按标题格式（正则）分割：无需目录文件，单次扫描全文
+def split_novel_by_headings(novel_file, patterns):
+    with open(novel_file, 'r', encoding='utf-8') as file:
+        text = file.read()
 
-    current_chapter = []
-    chapter_num = 1
-    current_chapter_title = "扉页"  # 初始化 current_chapter_title
+    chapters = split_by_heading_patterns(text, patterns)
 
-    # 根据小说文件名创建输出文件夹
     novel_name = os.path.splitext(os.path.basename(novel_file))[0]
     output_dir = f"{novel_name}_chapters"
     create_output_dir(output_dir)
 
-    # 逐行处理，遇到分割点时分割
-    split_idx = 0
-    for idx, line in enumerate(novel_lines):
-        line = line.strip()
-
-        if not line:
-            continue  # 跳过空行
-
-        # 检查是否是分割点
-        if split_idx < len(final_split_points) and idx == final_split_points[split_idx][0]:
-            if current_chapter:
-                # 保存当前章节内容
-                chapter_filename = os.path.join(output_dir, f"P{str(chapter_num).zfill(2)}_{current_chapter_title}.txt")
-                with open(chapter_filename, 'w', encoding='utf-8') as chapter_file:
-                    chapter_file.write("\n".join(current_chapter))
-                print(f"Chapter {chapter_num}: {current_chapter_title} saved as {chapter_filename}")
-
-                # 重置当前章节内容
-                current_chapter = []
-
-            # 更新章节编号，并将当前行作为章节内容开始
-            current_chapter_title = final_split_points[split_idx][1]
-            current_chapter.append(line)
-            chapter_num += 1
-            split_idx += 1
-        else:
-            # 如果当前行不是章节标题，将其视为章节内容
-            current_chapter.append(line)
-
-    # 处理最后一个章节
-    if current_chapter:
+    for chapter in chapters:
+        chapter_num = chapter["index"]
+        current_chapter_title = chapter["title"]
         chapter_filename = os.path.join(output_dir, f"P{str(chapter_num).zfill(2)}_{current_chapter_title}.txt")
         with open(chapter_filename, 'w', encoding='utf-8') as chapter_file:
-            chapter_file.write("\n".join(current_chapter))
+            chapter_file.write(chapter["content"])
         print(f"Chapter {chapter_num}: {current_chapter_title} saved as {chapter_filename}")
 
 # 调用函数
-
-txtname = config.book_name+".txt"
-split_novel_by_fuzzy_matching(
-    txtname,       # 小说文本文件
-    "chap_list.txt",        # 目录文件
-)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="按目录模糊匹配分割小说章节")
+    parser.add_argument("--novel", default=config.book_name + ".txt", help="小说文本文件")
+    parser.add_argument("--chap-list", default="chap_list.txt", help="目录文件")
+    parser.add_argument("--threshold", type=int, default=40, help="相似度阈值")
+    parser.add_argument("--workers", type=int, default=getattr(config, 'split_workers', 1),
+                        help="并行打分的进程数")
+    parser.add_argument("--stream", action="store_true",
+                        help="流式分割（内存映射，不整本读入内存）")
+    parser.add_argument("--aligned", action="store_true",
+                        help="按目录顺序对齐标题（保证章节顺序与目录一致）")
+    parser.add_argument("--heading", action="append",
+                        help="按标题格式分割，不使用目录；可重复。预设: "
+                             + ", ".join(HEADING_PATTERNS) + "，或直接写正则")
+    args = parser.parse_args()
+
+    if args.heading:
+        # 先校验正则，空的或写错的标题格式直接报错，而不是把每一行都当成章节
+        try:
+            compile_heading_patterns(args.heading)
+        except ValueError as e:
+            parser.error(f"--heading 标题正则表达式无效: {e}")
+        split_novel_by_headings(args.novel, args.heading)
+    else:
+        split = split_novel_streaming if args.stream else split_novel_by_fuzzy_matching
+        split(
+            args.novel,       # 小说文本文件
+            args.chap_list,   # 目录文件
+            threshold=args.threshold,
+            workers=args.workers,
+            aligned=args.aligned,
+        )
@@ -0,0 +1,63 @@
+import pytest
+
+from gui.core.alignment import align_entries
+from gui.core.json_repair import DEFAULT_MIN_COVERAGE, coverage
+
+CHUNK = "夜色如墨，冷雨敲打着窗棂。林冲推开门，走进了风雪之中。他回头望了一眼那座破旧的山神庙。远处传来了马蹄声。"
+
+
+def entry(content, speaker="旁白"):
+    return {"speaker": speaker, "content": content}
+
+
+def test_complete_entries_cover_everything():
+    entries = [entry("夜色如墨，冷雨敲打着窗棂。"), entry("林冲推开门，走进了风雪之中。"),
+               entry("他回头望了一眼那座破旧的山神庙。"), entry("远处传来了马蹄声。")]
+    alignment = align_entries(CHUNK, entries)
+    assert alignment.coverage == 1.0
+    assert alignment.missing == []
+
+
+def test_punctuation_differences_do_not_count():
+    alignment = align_entries(CHUNK, [entry(CHUNK.replace("，", "...").replace("。", "！"))])
+    assert alignment.coverage == 1.0
+
+
+def test_dropped_sentence_is_reported_and_spliced_back():
+    entries = [entry("夜色如墨，冷雨敲打着窗棂。"), entry("林冲推开门，走进了风雪之中。"),
+               entry("远处传来了马蹄声。")]
+    alignment = align_entries(CHUNK, entries)
+    assert alignment.coverage < 1.0
+    assert [CHUNK[a:z] for a, z in alignment.missing] == ["他回头望了一眼那座破旧的山神庙。"]
+
+    fill = [entry("他回头望了一眼那座破旧的山神庙。")]
+    spliced = alignment.splice(entries, [fill])
+    assert [e["content"] for e in spliced] == [
+        "夜色如墨，冷雨敲打着窗棂。", "林冲推开门，走进了风雪之中。",
+        "他回头望了一眼那座破旧的山神庙。", "远处传来了马蹄声。",
+    ]
+
+
+def test_failed_fill_leaves_gap():
+    entries = [entry("夜色如墨，冷雨敲打着窗棂。"), entry("远处传来了马蹄声。")]
+    alignment = align_entries(CHUNK, entries)
+    assert alignment.splice(entries, [None] * len(alignment.missing)) == entries
+
+
+def test_short_rewording_is_not_missing_text():
+    reworded = CHUNK.replace("破旧的", "旧")
+    alignment = align_entries(CHUNK, [entry(reworded)])
+    assert alignment.missing == []
+    assert alignment.coverage == pytest.approx(43 / 46)
+
+
+def test_truncated_response_coverage_is_below_threshold():
+    head = [entry("夜色如墨，冷雨敲打着窗棂。"), entry("林冲推开门，走进了风雪之中。")]
+    assert coverage(CHUNK, head) < DEFAULT_MIN_COVERAGE
+    assert coverage(CHUNK, head) == pytest.approx(22 / 44)
+
+
+def test_complete_response_coverage_passes_threshold():
+    entries = [entry(CHUNK[:13]), entry(CHUNK[13:])]
+    assert coverage(CHUNK, entries) >= DEFAULT_MIN_COVERAGE
+    assert coverage("", []) == 1.0
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+
+import pytest
+
+from gui.core.budget import BudgetExceeded, BudgetGovernor
+
+
+def test_unlimited_budget_only_tracks_spend():
+    async def run():
+        governor = BudgetGovernor(0)
+        for _ in range(5):
+            await governor.acquire(10.0)
+            governor.settle(10.0, 1.0)
+        return governor
+
+    governor = asyncio.run(run())
+    assert governor.requests == 5
+    assert governor.spent == pytest.approx(5.0)
+    assert not governor.stopped
+
+
+def test_request_that_could_overshoot_raises():
+    events = []
+
+    async def run():
+        governor = BudgetGovernor(1.0, on_event=events.append)
+        await governor.acquire(0.6)
+        governor.settle(0.6, 0.6)
+        with pytest.raises(BudgetExceeded):
+            await governor.acquire(0.6)
+        with pytest.raises(BudgetExceeded):
+            await governor.acquire(0.01)
+        return governor
+
+    governor = asyncio.run(run())
+    assert governor.stopped
+    assert governor.in_flight == 0
+    assert len(events) == 1
+
+
+def test_waiter_is_granted_when_in_flight_request_settles_under_reservation():
+    async def run():
+        governor = BudgetGovernor(1.0)
+        await governor.acquire(0.7)
+        waiting = asyncio.ensure_future(governor.acquire(0.5))
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        governor.settle(0.7, 0.1)
+        await asyncio.wait_for(waiting, 1)
+        return governor
+
+    governor = asyncio.run(run())
+    assert governor.in_flight == 1
+    assert governor.reserved == pytest.approx(0.5)
+
+
+def test_waiter_raises_when_settled_request_used_its_reservation():
+    async def run():
+        governor = BudgetGovernor(1.0)
+        await governor.acquire(0.7)
+        waiting = asyncio.ensure_future(governor.acquire(0.5))
+        await asyncio.sleep(0)
+        governor.settle(0.7, 0.7)
+        with pytest.raises(BudgetExceeded):
+            await asyncio.wait_for(waiting, 1)
+
+    asyncio.run(run())
+
+
+def test_slow_down_sends_one_request_at_a_time():
+    async def run():
+        governor = BudgetGovernor(10.0, slow_down_at=0.5)
+        await governor.acquire(6.0)
+        governor.settle(6.0, 6.0)
+        await governor.acquire(1.0)
+        waiting = asyncio.ensure_future(governor.acquire(1.0))
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        governor.cancel(1.0)
+        await asyncio.wait_for(waiting, 1)
+        return governor
+
+    governor = asyncio.run(run())
+    assert governor.slowed
+    assert governor.in_flight == 1
+
+
+def test_settle_from_another_thread_wakes_waiter():
+    async def run():
+        governor = BudgetGovernor(1.0)
+        await governor.acquire(0.7)
+        waiting = asyncio.ensure_future(governor.acquire(0.5))
+        await asyncio.sleep(0)
+        threading.Thread(target=governor.settle, args=(0.7, 0.1)).start()
+        await asyncio.wait_for(waiting, 1)
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_is_withdrawn():
+    async def run():
+        governor = BudgetGovernor(1.0)
+        await governor.acquire(0.7)
+        waiting = asyncio.ensure_future(governor.acquire(0.5))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        return governor
+
+    governor = asyncio.run(run())
+    assert not governor._waiters
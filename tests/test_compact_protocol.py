@@ -0,0 +1,50 @@
+from gui.core.compact_protocol import (
+    NARRATOR,
+    decode_compact,
+    decode_emotion,
+    encode_compact,
+    encode_emotion,
+)
+
+
+def test_emotion_codes_round_trip():
+    vector = decode_emotion("哀2低1")
+    assert vector == [0, 0, 0.2, 0, 0, 0.1, 0, 0]
+    assert encode_emotion(vector) == "哀2低1"
+    assert decode_emotion("-") == [0.0] * 8
+    assert encode_emotion([0.0] * 8) == "-"
+
+
+def test_entries_round_trip():
+    entries = [
+        {"speaker": NARRATOR, "content": "夜色如墨。", "emo_vector": [0.0] * 8, "delay": 800},
+        {"speaker": "林冲", "content": "我等这一天。", "emo_vector": decode_emotion("哀2"), "delay": 900},
+        {"speaker": NARRATOR, "content": "他转身离去。", "emo_vector": [0.0] * 8, "delay": 500},
+    ]
+    result = decode_compact(encode_compact(entries))
+    assert result.complete
+    assert result.skipped == 0
+    assert [(e["speaker"], e["content"], e["delay"]) for e in result.entries] == [
+        (e["speaker"], e["content"], e["delay"]) for e in entries
+    ]
+    assert result.entries[1]["emo_vector"] == entries[1]["emo_vector"]
+
+
+def test_truncated_response_drops_last_row():
+    result = decode_compact("@角色\n0=旁白\n@正文\n0|500|-|第一句。\n0|500|-|第二")
+    assert not result.complete
+    assert [e["content"] for e in result.entries] == ["第一句。"]
+    assert result.skipped == 1
+
+
+def test_undefined_speaker_number_falls_back_to_narrator():
+    result = decode_compact("@角色\n0=旁白\n1=林冲\n@正文\n1|500|-|甲。\n7|500|-|乙。\n@完")
+    assert [e["speaker"] for e in result.entries] == ["林冲", NARRATOR]
+    assert result.unknown_speakers == 1
+    assert "未定义角色编号 1 行" in result.summary()
+
+
+def test_speaker_named_directly_keeps_name():
+    result = decode_compact("@正文\n林冲|500|-|甲。\n|500|-|乙。\n@完")
+    assert [e["speaker"] for e in result.entries] == ["林冲", NARRATOR]
+    assert result.unknown_speakers == 0
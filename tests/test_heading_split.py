@@ -0,0 +1,34 @@
+import pytest
+
+from gui.core.pipeline import compile_heading_patterns, split_by_heading_patterns
+
+
+def test_blank_or_missing_patterns_are_rejected():
+    with pytest.raises(ValueError):
+        compile_heading_patterns([])
+    with pytest.raises(ValueError):
+        compile_heading_patterns(["", "  "])
+
+
+def test_invalid_pattern_is_rejected():
+    with pytest.raises(ValueError):
+        compile_heading_patterns(["第(章"])
+
+
+def test_inline_global_flag_in_combination_is_rejected():
+    with pytest.raises(ValueError):
+        compile_heading_patterns(["(?i)chapter", "^#+ "])
+
+
+def test_split_at_chinese_headings():
+    text = "序言\n\n  第一章 开始\n　　他来了。  \n\n\n第二章 结束\n她走了。\n"
+    chapters = split_by_heading_patterns(text, ["chinese"])
+    assert [c["title"] for c in chapters] == ["扉页", "第一章 开始", "第二章 结束"]
+    assert chapters[1]["content"] == "第一章 开始\n他来了。"
+    assert chapters[2]["content"] == "第二章 结束\n她走了。"
+    assert [(c["line_start"], c["line_end"]) for c in chapters] == [(0, 1), (2, 5), (6, 7)]
+
+
+def test_markdown_marks_are_removed_from_titles():
+    chapters = split_by_heading_patterns("# 第一部分\n正文\n## 小节\n更多", ["markdown2"])
+    assert [c["title"] for c in chapters] == ["第一部分", "小节"]
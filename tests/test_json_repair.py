@@ -0,0 +1,66 @@
+from gui.core.json_repair import repair_json_array
+
+
+def test_trailing_comma_after_string():
+    result = repair_json_array('[{"speaker":"旁白","content":"a",}]')
+    assert result.entries == [{"speaker": "旁白", "content": "a"}]
+    assert result.fixes["trailing_comma"] == 1
+    assert result.complete
+
+
+def test_trailing_comma_after_string_keeps_next_object():
+    result = repair_json_array(
+        '[{"speaker":"旁白","content":"a", }, {"speaker":"b","content":"c"}]'
+    )
+    assert result.entries == [
+        {"speaker": "旁白", "content": "a"},
+        {"speaker": "b", "content": "c"},
+    ]
+    assert result.fixes["inner_quote"] == 0
+
+
+def test_trailing_comma_after_number_and_object():
+    result = repair_json_array('[{"speaker":"a","content":"x","n":1,}, {"speaker":"b","content":"y"},]')
+    assert result.entries == [
+        {"speaker": "a", "content": "x", "n": 1},
+        {"speaker": "b", "content": "y"},
+    ]
+    assert result.fixes["trailing_comma"] == 2
+
+
+def test_missing_comma_between_objects():
+    result = repair_json_array('[{"speaker":"a","content":"x"} {"speaker":"b","content":"y"}]')
+    assert [e["speaker"] for e in result.entries] == ["a", "b"]
+    assert result.fixes["missing_comma"] == 1
+
+
+def test_unescaped_inner_quote():
+    result = repair_json_array('[{"speaker":"旁白","content":"他说"你好"然后走了"}]')
+    assert result.entries == [{"speaker": "旁白", "content": '他说"你好"然后走了'}]
+    assert result.fixes["inner_quote"] == 2
+
+
+def test_raw_newline_and_invalid_escape():
+    result = repair_json_array('[{"speaker":"旁白","content":"一行\n两行\\q"}]')
+    assert result.entries == [{"speaker": "旁白", "content": "一行\n两行\\q"}]
+    assert result.fixes["control_char"] == 1
+    assert result.fixes["invalid_escape"] == 1
+
+
+def test_truncated_last_object_costs_only_itself():
+    result = repair_json_array('[{"speaker":"a","content":"x"}, {"speaker":"b","cont')
+    assert result.entries == [{"speaker": "a", "content": "x"}]
+    assert result.fixes["truncated_object"] == 1
+    assert not result.complete
+
+
+def test_missing_bracket_and_leading_prose():
+    result = repair_json_array('结果如下：{"speaker":"a","content":"x"}]')
+    assert result.entries == [{"speaker": "a", "content": "x"}]
+    assert result.fixes["missing_bracket"] == 1
+
+
+def test_no_array_gives_nothing():
+    result = repair_json_array("抱歉，我无法处理。")
+    assert result.entries == []
+    assert not result.complete
@@ -0,0 +1,39 @@
+from gui.core.postprocess import filter_punctuation
+
+
+def test_terminal_mark_absorbs_following_clause_mark():
+    assert filter_punctuation("你好！，他说") == "你好！他说"
+
+
+def test_mixed_terminal_run_keeps_first_mark():
+    assert filter_punctuation("什么？！") == "什么？"
+    assert filter_punctuation("好?!") == "好？"
+    assert filter_punctuation("走吧。！") == "走吧。"
+
+
+def test_clause_mark_before_terminal_is_dropped():
+    assert filter_punctuation("我，。") == "我。"
+
+
+def test_repeated_marks_collapse():
+    assert filter_punctuation("嗯，，、好。。") == "嗯，好。"
+
+
+def test_abbreviation_period_is_kept():
+    assert filter_punctuation("Mr. Smith来了") == "Mr. Smith来了"
+    assert filter_punctuation("J. K. Rowling") == "J. K. Rowling"
+
+
+def test_decimal_point_is_kept():
+    assert filter_punctuation("价格是3.5元") == "价格是3.5元"
+    assert filter_punctuation("版本v2.0发布了") == "版本v2.0发布了"
+
+
+def test_sentence_final_period_is_converted():
+    assert filter_punctuation("他走了.然后") == "他走了。然后"
+    assert filter_punctuation("价格是3.5元.") == "价格是3.5元。"
+
+
+def test_ellipsis_survives():
+    assert filter_punctuation("等等……好") == "等等...好"
+    assert filter_punctuation("等等，...好") == "等等...好"
@@ -0,0 +1,150 @@
+import asyncio
+
+import pytest
+
+from gui.core.router import ProviderRouter
+from gui.core.usage import UsageStats
+
+
+class FakeEngine:
+    """Answers with its model name after *delay* seconds, or fails."""
+
+    def __init__(self, model, delay=0.0, fail=False, block=False):
+        self.model = model
+        self.delay = delay
+        self.fail = fail
+        self.block = block
+        self.limiter = None
+        self.usage = UsageStats()
+        self.calls = 0
+
+    async def complete(self, prompt, on_send=None, **params):
+        if self.block:  # stuck waiting for a slot
+            await asyncio.sleep(3600)
+        self.calls += 1
+        if on_send is not None:
+            on_send()
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.model} failed")
+        return self.model
+
+    async def stream(self, prompt, on_send=None, **params):
+        if on_send is not None:
+            on_send()
+        if self.fail:
+            raise RuntimeError(f"{self.model} failed")
+        yield self.model
+
+    async def aclose(self):
+        pass
+
+
+def router(*engines, **kwargs):
+    return ProviderRouter([(e.model, e) for e in engines], **kwargs)
+
+
+def test_failed_primary_is_retried_on_next_provider():
+    a, b = FakeEngine("a", fail=True), FakeEngine("b")
+    answers = []
+
+    async def run():
+        return await router(a, b).complete("x", on_answer=lambda *args: answers.append(args))
+
+    assert asyncio.run(run()) == "b"
+    assert answers == [("b", "b")]
+
+
+def test_every_provider_failing_raises_first_error():
+    async def run():
+        await router(FakeEngine("a", fail=True), FakeEngine("b", fail=True)).complete("x")
+
+    with pytest.raises(RuntimeError, match="a failed"):
+        asyncio.run(run())
+
+
+def test_rejected_reply_fails_over_and_first_reply_is_the_fallback():
+    async def run():
+        r = router(FakeEngine("a"), FakeEngine("b"))
+        accepted = await r.complete("x", accept=lambda text: text == "b")
+        salvaged = await r.complete("x", accept=lambda text: False)
+        return accepted, salvaged
+
+    assert asyncio.run(run()) == ("b", "a")
+
+
+def test_late_primary_is_hedged_and_backup_wins():
+    a, b = FakeEngine("a", delay=0.001), FakeEngine("b")
+    answers = []
+
+    async def run():
+        r = router(a, b, max_hedge_ratio=0.5)
+        for _ in range(10):  # latency samples for the primary
+            await r.complete("x")
+        a.delay = 5.0
+        text = await asyncio.wait_for(
+            r.complete("x", on_answer=lambda *args: answers.append(args)), 2,
+        )
+        return r, text
+
+    r, text = asyncio.run(run())
+    assert text == "b"
+    assert (r.hedges, r.hedge_wins) == (1, 1)
+    assert answers == [("b", "b")]
+
+
+def test_no_hedge_without_latency_samples():
+    a, b = FakeEngine("a", delay=0.05), FakeEngine("b")
+
+    async def run():
+        r = router(a, b, max_hedge_ratio=1.0)
+        return r, await r.complete("x")
+
+    r, text = asyncio.run(run())
+    assert text == "a"
+    assert r.hedges == 0
+    assert b.calls == 0
+
+
+def test_failing_provider_is_taken_out_of_rotation():
+    a, b = FakeEngine("a", fail=True), FakeEngine("b")
+    events = []
+
+    async def run():
+        r = router(a, b, error_threshold=0.5, cooldown=60, on_event=events.append)
+        for _ in range(6):
+            await r.complete("x")
+        calls = a.calls
+        await r.complete("x")
+        return r, calls
+
+    r, calls = asyncio.run(run())
+    assert r.failovers == 1
+    assert a.calls == calls  # skipped while cooling down
+    assert len(events) == 1
+
+
+def test_queued_request_is_rerouted_when_its_provider_fails():
+    a, b = FakeEngine("a", block=True), FakeEngine("b")
+
+    async def run():
+        r = router(a, b, error_threshold=0.1, cooldown=60)
+        queued = asyncio.ensure_future(r.complete("x"))
+        await asyncio.sleep(0.01)
+        assert not queued.done()
+        a.block, a.fail = False, True
+        await asyncio.gather(*(r.complete("y") for _ in range(6)))
+        return await asyncio.wait_for(queued, 1)
+
+    assert asyncio.run(run()) == "b"
+
+
+def test_stream_reports_answering_provider():
+    answers = []
+
+    async def run():
+        r = router(FakeEngine("a"), FakeEngine("b"))
+        return [d async for d in r.stream("x", on_answer=lambda *args: answers.append(args))]
+
+    assert asyncio.run(run()) == ["a"]
+    assert answers == [("a", "a")]
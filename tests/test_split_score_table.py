@@ -0,0 +1,55 @@
+from gui.core.pipeline import SplitScoreTable, split_by_fuzzy_matching
+
+TITLES = ["第一章 风雪山神庙", "第二章 林冲夜奔", "第三章 火烧草料场", "第四章 梁山泊"]
+
+LINES = [
+    "序",
+    "第一章 风雪山神庙",
+    "雪下得正紧。",
+    "第二章 林冲夜奔",
+    "林冲连夜出了城。",
+    "",
+    "第三章 火烧草料场",
+    "草料场火起。",
+    "第四章 梁山泊",
+    "水泊连天。",
+    "第五章 智取生辰纲",
+    "天气炎热。",
+]
+
+
+def test_split_matches_fuzzy_matching_at_every_threshold():
+    table = SplitScoreTable(LINES, TITLES, floor=20)
+    for threshold in (20, 40, 60, 80, 100):
+        assert table.split(threshold) == split_by_fuzzy_matching(LINES, TITLES, threshold)
+
+
+def test_threshold_below_floor_rescores():
+    table = SplitScoreTable(LINES, TITLES, floor=60)
+    assert table.split(30) == split_by_fuzzy_matching(LINES, TITLES, 30)
+    assert table.floor == 30
+
+
+def test_incremental_title_updates_match_a_fresh_table():
+    table = SplitScoreTable(LINES, TITLES, floor=20)
+    for titles in (
+        TITLES + ["第五章 智取生辰纲"],
+        ["第一章 风雪山神庙", "第三章 火烧草料场", "第五章 智取生辰纲"],
+        ["第一章 风雪山神庙", "第三章 火烧", "第五章 智取生辰纲", "第六章 火烧"],
+        ["第三章 火烧草料场", "第一章 风雪山神庙"],  # reordered
+    ):
+        table.update_titles(titles)
+        fresh = SplitScoreTable(LINES, titles, floor=20)
+        assert table._best == fresh._best
+        for threshold in (20, 50, 90):
+            assert table.split(threshold) == fresh.split(threshold)
+
+
+def test_copy_is_updated_independently():
+    table = SplitScoreTable(LINES, TITLES, floor=20)
+    before = table.split(60)
+    clone = table.copy()
+    clone.update_titles(TITLES[:2])
+    assert table.split(60) == before
+    assert clone.titles == TITLES[:2]
+    assert clone.text_lines is table.text_lines
@@ -0,0 +1,57 @@
+import random
+
+from gui.core.pipeline import (
+    _align_candidate_pairs,
+    align_titles_to_lines,
+    split_by_title_alignment,
+)
+
+
+def best_chain_total(pairs):
+    """Quadratic reference: heaviest chain with increasing line and title."""
+    best = []
+    for k, (idx, pos, score) in enumerate(pairs):
+        prev = [best[j] for j in range(k) if pairs[j][0] < idx and pairs[j][1] < pos]
+        best.append(score + max(prev, default=0))
+    return max(best, default=0)
+
+
+def test_dp_finds_heaviest_increasing_chain():
+    rng = random.Random(3)
+    for _ in range(200):
+        n_titles = rng.randint(1, 8)
+        titles = [f"t{i}" for i in range(n_titles)]
+        # one score per (line, title), ordered like candidate_pairs
+        scores = {
+            (rng.randint(0, 15), rng.randrange(n_titles)): rng.randint(40, 100)
+            for _ in range(rng.randint(0, 25))
+        }
+        pairs = sorted((idx, pos, s) for (idx, pos), s in scores.items())
+        chosen = _align_candidate_pairs(pairs, titles)
+        score_of = {(idx, titles[pos]): s for idx, pos, s in pairs}
+
+        lines = [idx for idx, _ in chosen]
+        positions = [titles.index(title) for _, title in chosen]
+        assert lines == sorted(set(lines))
+        assert positions == sorted(set(positions))
+        assert sum(score_of[point] for point in chosen) == best_chain_total(pairs)
+
+
+def test_out_of_order_match_is_left_out():
+    lines = ["第一章 风雪", "正文", "第三章 火烧", "正文", "第二章 夜奔", "正文", "第四章 梁山"]
+    titles = ["第一章 风雪", "第二章 夜奔", "第三章 火烧", "第四章 梁山"]
+    points = align_titles_to_lines(lines, titles, threshold=90)
+    assert [title for _, title in points] in (
+        ["第一章 风雪", "第二章 夜奔", "第四章 梁山"],
+        ["第一章 风雪", "第三章 火烧", "第四章 梁山"],
+    )
+    assert [idx for idx, _ in points] == sorted(idx for idx, _ in points)
+
+
+def test_repeated_title_mention_does_not_reorder_chapters():
+    lines = ["第一章 风雪", "他想起第二章 夜奔", "第二章 夜奔", "正文", "第一章 风雪"]
+    titles = ["第一章 风雪", "第二章 夜奔"]
+    chapters = split_by_title_alignment(lines, titles, threshold=90)
+    assert [(c["title"], c["line_start"]) for c in chapters] == [
+        ("第一章 风雪", 0), ("第二章 夜奔", 2),
+    ]
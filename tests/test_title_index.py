@@ -0,0 +1,50 @@
+import random
+
+from fuzzywuzzy import fuzz
+
+from gui.core.pipeline import TitleIndex, _best_title, score_lines
+
+ALPHABET = "第一二三章回风雪山神庙林冲夜奔"
+
+
+def random_text(rng, low, high):
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(low, high)))
+
+
+def test_candidates_keep_every_title_reaching_threshold():
+    rng = random.Random(1)
+    titles = [random_text(rng, 2, 12) for _ in range(60)]
+    index = TitleIndex(titles)
+    for _ in range(150):
+        line = random_text(rng, 1, 30)
+        for threshold in (20, 40, 60, 80, 100):
+            candidates = set(index.candidates(line, threshold))
+            reaching = {t for t in titles if fuzz.ratio(line, t) >= threshold}
+            assert reaching <= candidates
+
+
+def test_candidates_keep_title_order():
+    titles = ["第三章 林冲", "第一章 林冲", "第二章 林冲"]
+    assert TitleIndex(titles).candidates("第二章 林冲", 40) == titles
+
+
+def test_best_title_matches_brute_force():
+    rng = random.Random(2)
+    titles = [random_text(rng, 3, 10) for _ in range(40)]
+    index = TitleIndex(titles)
+    for _ in range(150):
+        line = random_text(rng, 1, 20)
+        threshold = rng.choice((30, 50, 70))
+        scores = [fuzz.ratio(line, t) for t in titles]
+        best = max(scores)
+        title, score = _best_title(line, index, threshold)
+        if best >= threshold:
+            assert (title, score) == (titles[scores.index(best)], best)
+        else:
+            assert score < threshold
+
+
+def test_score_lines_skips_blank_lines_and_offsets_indices():
+    lines = ["第一章 风雪", "", "  林冲夜奔  ", "无关的一行文字"]
+    matches = score_lines(lines, ["第一章 风雪", "林冲夜奔"], threshold=80, offset=10)
+    assert matches == [(10, "第一章 风雪", 100), (12, "林冲夜奔", 100)]
@@ -13,8 +13,6 @@
 
 import os
 import json
-import re
-import time
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
@@ -26,6 +24,10 @@ from google.generativeai import types
 os.environ["HTTP_PROXY"] = "http://127.0.0.1:7899"
 os.environ["HTTPS_PROXY"] = "http://127.0.0.1:7899"
 import config
+from gui.core.metrics import PipelineMetrics
+from gui.core.pipeline import extract_json_from_response
+from gui.core.rate_limit import get_provider_limiter
+from gui.core.tokens import get_token_estimator
 API_KEY = config.gemini_api_key
 BASE_URL = config.gemini_base_url
 if not API_KEY:
@@ -44,68 +46,72 @@ gen_config = types.GenerationConfig(
     temperature=0.2,
 )
 
-model = genai.GenerativeModel(
-    model_name=MODEL_NAME,
-    generation_config=gen_config,
-)
-
 # ========== 读取原文 ==========
 def process_single_file(txt_path):
     """处理单个TXT文件，转换为JSON"""
     print(f"开始处理: {txt_path}")
     text = txt_path.read_text(encoding="utf-8")
 
-    # 构造最终提示
-    user_prompt = (
-        "你是一个严格的格式化器。"
-        "根据下述【规范】将【原文】转换为 index-tts v2 有声书 JSON，必须只输出有效 JSON 数组，不要任何额外说明：\n"
-        "【规范】如下：\n" + SPEC_PROMPT + "\n"
-        "【原文】如下：\n" + text + "\n"
-        "请确保输出是纯净的JSON数组格式。"
-    )
+    # 构造最终提示（指令与规范已作为 system_instruction 发送）
+    user_prompt = "【原文】如下：\n" + text + "\n请确保输出是纯净的JSON数组格式。"
 
     max_retries = 5  # 最大重试次数
     retry_delay = 25  # 初始重试延迟（秒）
 
+    # 所有线程共用 Gemini 的限流器（请求/分钟、token/分钟、自适应并发）
+    limiter = get_provider_limiter("gemini")
+    prompt_tokens = get_token_estimator("gemini").count(SYSTEM_INSTRUCTION + user_prompt)
+
     for attempt in range(max_retries):
+        with METRICS.stage("rate_limit", txt_path.name):
+            limiter.acquire_blocking(prompt_tokens)
+        METRICS.count("requests")
         try:
             # 调用生成
-            resp = model.generate_content(user_prompt)
+            with METRICS.stage("network", txt_path.name):
+                resp = model.generate_content(user_prompt)
 
             # 取文本
             raw = resp.text if hasattr(resp, "text") else str(resp)
+            usage = getattr(resp, "usage_metadata", None)
+            if usage is not None:
+                # 换成 OpenAI 风格的字段，计入全局与本文件的 token 统计
+                METRICS.record_usage({
+                    "prompt_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+                    "prompt_tokens_details": {
+                        "cached_tokens": getattr(usage, "cached_content_token_count", 0) or 0,
+                    },
+                    "completion_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+                }, chapter=txt_path.name)
+            limiter.release(
+                "ok",
+                reserved_tokens=prompt_tokens,
+                used_tokens=getattr(usage, "total_token_count", None),
+            )
             break  # 成功则跳出重试循环
 
         except Exception as e:
             error_str = str(e)
             if "429" in error_str or "quota" in error_str.lower() or "rate limit" in error_str.lower():
+                # 限流器降低并发并暂停新请求，下次 acquire 会自动等待
+                limiter.release("throttled", retry_after=retry_delay)
+                METRICS.count("throttled")
                 if attempt < max_retries - 1:
                     print(f"处理失败 (尝试 {attempt + 1}/{max_retries}): {e}")
                     print(f"等待 {retry_delay} 秒后重试...")
-                    time.sleep(retry_delay)
                     retry_delay *= 2  # 指数退避
                     continue
                 else:
                     raise RuntimeError(f"达到最大重试次数，处理失败: {e}")
             else:
+                limiter.release("error")
+                METRICS.count("errors")
                 # 其他错误直接抛出
                 raise e
 
     # 兜底：确保拿到合法 JSON
-    def extract_json(s: str):
-        try:
-            return json.loads(s)
-        except Exception:
-            pass
-        m = re.search(r"(\[.*\]|\{.*\})", s, flags=re.S)
-        if m:
-            try:
-                return json.loads(m.group(1))
-            except Exception:
-                return None
-        return None
-
-    data = extract_json(raw)
+    with METRICS.stage("parse", txt_path.name):
+        data = extract_json_from_response(raw)
     if not isinstance(data, list):
         raise ValueError(f"模型未返回预期的 JSON 数组，请检查 {txt_path} 或重试。")
 
@@ -122,7 +128,9 @@ def process_single_file(txt_path):
             and isinstance(item["delay"], int)
         )
 
-    if not all(minimally_valid(x) for x in data):
+    with METRICS.stage("validate", txt_path.name):
+        all_valid = all(minimally_valid(x) for x in data)
+    if not all_valid:
         print(f"警告：{txt_path} 部分项不完全符合字段/类型要求，请检查结果。")
 
     # 保存结果
@@ -202,6 +210,23 @@ JSON
 ]
 """
 
+# 指令与规范作为逐字节不变的 system_instruction，Gemini 2.5 的隐式上下文缓存可在文件之间复用这段前缀
+SYSTEM_INSTRUCTION = (
+    "你是一个严格的格式化器。"
+    "根据下述【规范】将用户给出的【原文】转换为 index-tts v2 有声书 JSON，必须只输出有效 JSON 数组，不要任何额外说明：\n"
+    "【规范】如下：\n" + SPEC_PROMPT
+)
+
+model = genai.GenerativeModel(
+    model_name=MODEL_NAME,
+    generation_config=gen_config,
+    system_instruction=SYSTEM_INSTRUCTION,
+)
+
+# 所有线程共用的分阶段耗时与 token 统计（含缓存命中）；设置 metrics_path 后导出（.prom 为 Prometheus 文本格式，其余为 JSON）
+METRICS = PipelineMetrics()
+METRICS_PATH = getattr(config, 'metrics_path', None)
+
 # ========== 主函数：并行处理目录下的所有TXT文件 ==========
 def main():
     chapters_dir = Path(config.input_dir)
@@ -239,6 +264,11 @@ def main():
             except Exception as e:
                 print(f"处理失败: {e}")
 
+    print(METRICS.usage.report())
+    print(METRICS.summary())
+    if METRICS_PATH:
+        METRICS.export(METRICS_PATH)
+        print(f"阶段指标已写入 {METRICS_PATH}")
     print("所有文件处理完成！")
 
 if __name__ == "__main__":
@@ -4,15 +4,29 @@
 修改版：采用分块处理（Chunking）策略，彻底解决长文本截断导致的 JSON 解码失败问题。
 """
 
+import argparse
 import os
 import json
-import re
-import time
+import asyncio
+import copy
+from collections import Counter
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from openai import OpenAI
 import config
+from gui.core.alignment import align_entries
+from gui.core.budget import BudgetExceeded, BudgetGovernor, estimate_run, get_price, max_tokens_for
+from gui.core.compact_protocol import (
+    COMPACT_ENTRY_OVERHEAD, COMPACT_SPEC_PROMPT, build_compact_messages, decode_compact,
+)
+from gui.core.journal import JOURNAL_NAME, ChunkJournal
+from gui.core.json_repair import DEFAULT_MIN_COVERAGE, coverage, repair_json_array
+from gui.core.llm_engine import is_throttle_error
+from gui.core.metrics import PipelineMetrics, chapter_scope
+from gui.core.pipeline import extract_json_from_response, iter_chunks
+from gui.core.postprocess import describe_stats, postprocess_entries
+from gui.core.response_cache import DEFAULT_CACHE_DIR, ResponseCache, cache_key, prompt_fingerprint
+from gui.core.router import build_router
+from gui.core.tokens import get_token_estimator, iter_token_chunks
 
 # # ========== 基本配置 ==========
 # 代理（按需注释掉）
@@ -27,15 +41,42 @@ MODEL_NAME = config.openrouter_model
 # 核心参数：切片大小（字符数）
 # 建议设置在 1200-1500 之间，留出足够的 Token 给 Output JSON
 MAX_CHUNK_SIZE = 8000 
+# 设为 True 时按 OpenRouter 的 token 预算切片（忽略 MAX_CHUNK_SIZE）
+CHUNK_BY_TOKENS = getattr(config, 'chunk_by_tokens', False)
+
+# 响应缓存：片段文本、规范、模型与采样参数都未变时直接复用上次的结果
+USE_CACHE = getattr(config, 'llm_cache', True)
+CACHE_PATH = getattr(config, 'llm_cache_path', str(DEFAULT_CACHE_DIR / "responses.sqlite3"))
+CACHE_MAX_MB = getattr(config, 'llm_cache_max_mb', 512)
+
+# JSON 不合法时先本地修复；修复出的条目覆盖片段原文的比例达到该值才直接采用，否则重试
+REPAIR_MIN_COVERAGE = getattr(config, 'repair_min_coverage', DEFAULT_MIN_COVERAGE)
+
+# 把生成的条目对齐回原文，遗漏的句子单独补请求（而不是整段重跑）
+VERIFY_COVERAGE = getattr(config, 'verify_coverage', True)
+
+# 紧凑协议：精简规范作为固定的系统消息发送，模型按 "编号|停顿|情感|文本" 逐行输出，本地还原为 JSON
+COMPACT_PROTOCOL = getattr(config, 'compact_protocol', False)
+
+# 备用服务商：[{"provider": "qwen", "api_key": ..., "base_url": ..., "model": ...}, ...]
+# 片段耗时超过近期 p95 时向下一个服务商发副本，取先返回有效结果者；错误率过高的服务商暂停使用
+FALLBACK_PROVIDERS = getattr(config, 'fallback_providers', [])
+
+# 分阶段耗时与 token 指标：结束时打印汇总；设置路径后导出（.prom 为 Prometheus 文本格式，其余为 JSON）
+METRICS_PATH = getattr(config, 'metrics_path', None)
+METRICS = PipelineMetrics()
+
+# 费用预算（美元）：接近时逐个发送请求，达到后停止发送新请求（已完成的片段在断点日志中，加大预算后 --resume 继续）；0 表示不限
+BUDGET_USD = getattr(config, 'budget_usd', 0)
+
+# 每个片段的采样参数（同时参与缓存键）；max_tokens 按片段的预期输出逐个计算
+CHUNK_PARAMS = {
+    "temperature": 0.2, # 低温度保证格式稳定
+}
 
 if not API_KEY:
     raise RuntimeError("未检测到 OPENROUTER_API_KEY，请先在 config.py 中设置。")
 
-client = OpenAI(
-    api_key=API_KEY,
-    base_url=BASE_URL,
-)
-
 # ========== 工具函数：提取章节标题 ==========
 def extract_chapter_title(filename):
     """
@@ -53,58 +94,154 @@ def extract_chapter_title(filename):
             return f"第{num}章 {title_part}"
     return None
 
-# ========== 工具函数：智能切分文本 ==========
-def split_text_into_chunks(text, max_size=1500):
-    """
-    按标点符号智能切分长文本，防止截断句子。
-    """
-    # 正则：按换行、句号、问号、感叹号切分，并保留分隔符
-    # 这里的 pattern 会捕获分隔符，所以 split 后列表会是 [文, 标点, 文, 标点...]
-    sentences = re.split(r'([。！？!?\n]+)', text)
-    
-    chunks = []
-    current_chunk = ""
-    
-    for i in range(0, len(sentences), 2):
-        sentence_text = sentences[i]
-        # 获取对应的标点（如果是最后一段可能没有）
-        punctuation = sentences[i+1] if i+1 < len(sentences) else ""
-        full_sentence = sentence_text + punctuation
-        
-        # 如果当前块 + 新句子 超过限制，则先保存当前块，开启新块
-        if len(current_chunk) + len(full_sentence) > max_size:
-            if current_chunk:
-                chunks.append(current_chunk)
-            current_chunk = full_sentence
-        else:
-            current_chunk += full_sentence
-            
-    if current_chunk:
-        chunks.append(current_chunk)
-        
-    return chunks
-
-# ========== 工具函数：JSON 提取与清洗 ==========
-def extract_json_from_response(content):
-    """尝试从 LLM 回复中提取并解析 JSON"""
-    try:
-        return json.loads(content)
-    except Exception:
-        pass
-    
-    # 尝试提取 markdown 代码块或纯数组
-    # 匹配 [ ... ] 结构
-    m = re.search(r"(\[.*\])", content, flags=re.S)
-    if m:
+# ========== 工具函数：构造片段 Prompt ==========
+def build_chunk_messages(chunk_text):
+    """构造针对单个片段的消息：指令与规范放在逐字节不变的系统消息里（可命中服务商的前缀缓存），用户消息只含片段"""
+    system_prompt = (
+        "你是一个严格的格式化器。\n"
+        "根据下述【规范】将用户提供的【小说片段】转换为 index-tts v2 有声书 JSON。\n"
+        "注意：每个片段只是小说的一小部分，请只处理这段文字，不要编造开头或结尾，直接输出 JSON 数组。\n\n"
+        "【规范】如下：\n" + SPEC_PROMPT
+    )
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"【小说片段】如下：\n'''\n{chunk_text}\n'''\n\n请直接输出 JSON 数组："},
+    ]
+
+def build_chunk_request(chunk_text):
+    """按当前协议构造请求消息（规范都作为固定的系统消息发送）"""
+    if COMPACT_PROTOCOL:
+        return build_compact_messages(chunk_text)
+    return build_chunk_messages(chunk_text)
+
+def chunk_estimator(provider="openrouter"):
+    """按当前协议估算 token 的估算器（紧凑协议每条的额外开销远小于 JSON）"""
+    estimator = get_token_estimator(provider)
+    if COMPACT_PROTOCOL:
+        estimator = copy.copy(estimator)
+        estimator.entry_overhead = COMPACT_ENTRY_OVERHEAD
+    return estimator
+
+def request_params(chunk_text):
+    """片段的采样参数：max_tokens 取预期输出加余量，且不超过任何备用服务商的输出上限"""
+    cap = min(get_token_estimator(p).max_output_tokens for p in ["openrouter"] + [f["provider"] for f in FALLBACK_PROVIDERS])
+    return dict(CHUNK_PARAMS, max_tokens=min(max_tokens_for(chunk_text, chunk_estimator()), cap))
+
+def endpoints():
+    """主服务商与备用服务商，按路由顺序"""
+    return [{"provider": "openrouter", "api_key": API_KEY, "base_url": BASE_URL, "model": MODEL_NAME}] + FALLBACK_PROVIDERS
+
+def request_fingerprint():
+    """当前协议提示模板的指纹（参与缓存键）"""
+    return prompt_fingerprint(json.dumps(build_chunk_request(""), ensure_ascii=False))
+
+def parse_chunk_response(raw):
+    """解析模型回复，返回 (完整结果或 None, 可从中挽救条目的结果)"""
+    if COMPACT_PROTOCOL:
+        decoded = decode_compact(raw)
+        return (decoded.entries if decoded.complete else None), decoded
+    parsed = extract_json_from_response(raw)
+    if isinstance(parsed, list):
+        return parsed, None
+    return None, repair_json_array(raw)
+
+# ========== 工具函数：补请求遗漏的原文 ==========
+async def fill_missing_spans(engine, txt_path, i, chunk_text, entries, on_answer=None):
+    """把条目对齐回片段原文，只把遗漏的句子作为小请求发回模型，并按原文顺序插回"""
+    with METRICS.stage("validate"):
+        alignment = align_entries(chunk_text, entries)
+    if not alignment.missing:
+        return entries
+    print(f"    [校验] 片段 {i+1} 覆盖率 {alignment.coverage:.0%}，补请求 {len(alignment.missing)} 段遗漏文本")
+
+    async def request_span(span):
         try:
-            return json.loads(m.group(1))
-        except Exception:
-            pass
-    return None
+            span_text = chunk_text[span[0]:span[1]]
+            raw = await engine.complete(build_chunk_request(span_text), on_answer=on_answer, **request_params(span_text))
+        except Exception as e:
+            print(f"    [错误] {txt_path.name} 片段 {i+1} 补请求失败: {e}")
+            return None
+        with METRICS.stage("parse"):
+            parsed, salvage = parse_chunk_response(raw)
+        return parsed if parsed is not None else (salvage.entries or None)
+
+    fills = await asyncio.gather(*(request_span(span) for span in alignment.missing))
+    with METRICS.stage("validate"):
+        return alignment.splice(entries, fills)
+
+# ========== 核心逻辑：处理单个片段 ==========
+async def process_chunk(engine, cache, journal, txt_path, i, chunk_text):
+    """将单个片段转换为 JSON 列表，失败返回空列表"""
+    # 断点日志中已完成的片段直接复用
+    done = journal.get(txt_path.name, i, chunk_text)
+    if done is not None:
+        return done
+
+    if cache is not None:
+        # 本次运行的任一服务商都可能给出过这个片段的结果
+        cached = cache.get_any(
+            cache_key(endpoint["provider"], endpoint["model"], request_fingerprint(), chunk_text, CHUNK_PARAMS)
+            for endpoint in endpoints()
+        )
+        if cached is not None:
+            print(f"  > {txt_path.name} 的片段 {i+1} 命中缓存")
+            journal.record(txt_path.name, i, chunk_text, cached)
+            return cached
+
+    print(f"  > 正在处理 {txt_path.name} 的片段 {i+1} ({len(chunk_text)}字符)...")
+
+    request = build_chunk_request(chunk_text)
+    # 实际给出回复的服务商与模型（对冲/故障切换时可能不是主服务商），缓存键按它计算
+    answered = set()
+
+    def on_answer(provider, model):
+        answered.add((provider, model))
+
+    max_chunk_retries = 3 # 每个片段最多重试3次
+
+    for attempt in range(max_chunk_retries):
+        try:
+            raw_content = await engine.complete(
+                request, accept=lambda raw: parse_chunk_response(raw)[0] is not None, on_answer=on_answer,
+                **request_params(chunk_text),
+            )
+
+            # 尝试解析；失败时先在本地修复，覆盖率足够就不再重新请求
+            with METRICS.stage("parse"):
+                parsed_data, repaired = parse_chunk_response(raw_content)
+            if parsed_data is None:
+                if repaired.entries:
+                    print(f"    [修复] 片段 {i+1} {repaired.summary()}")
+                    with METRICS.stage("validate"):
+                        covered = coverage(chunk_text, repaired.entries) >= REPAIR_MIN_COVERAGE
+                    if covered:
+                        parsed_data = repaired.entries
+            if isinstance(parsed_data, list):
+                if VERIFY_COVERAGE:
+                    parsed_data = await fill_missing_spans(engine, txt_path, i, chunk_text, parsed_data, on_answer)
+                journal.record(txt_path.name, i, chunk_text, parsed_data) # 立即落盘
+                if cache is not None and len(answered) == 1: # 混合了多个服务商回复的结果不缓存
+                    provider, model = next(iter(answered))
+                    cache.put(cache_key(provider, model, request_fingerprint(), chunk_text, CHUNK_PARAMS), parsed_data)
+                return parsed_data # 成功
+            print(f"    [警告] 片段 {i+1} 第 {attempt+1} 次解析失败：未找到有效列表或修复后覆盖不足。重试中...")
+
+        except BudgetExceeded:
+            raise # 整个文件不保存，加大预算后 --resume 只请求缺失的片段
+        except Exception as e:
+            print(f"    [错误] 片段 {i+1} 第 {attempt+1} 次 API 调用出错: {e}")
+            if not is_throttle_error(e):
+                await asyncio.sleep(2) # 简单冷却；429/5xx 由限流器按 Retry-After 等待
+
+    print(f"!!! [严重错误] 文件 {txt_path.name} 的片段 {i+1} 处理彻底失败，跳过该片段 !!!")
+    # 记录错误日志，但继续处理下一个片段，以免前功尽弃
+    with open("error_logs.txt", "a", encoding="utf-8") as f:
+        f.write(f"文件: {txt_path} | 片段: {i+1}\n内容:\n{chunk_text}\n\n")
+    return []
 
 # ========== 核心逻辑：处理单个文件 ==========
-def process_single_file(txt_path):
-    """处理单个TXT文件：切分 -> 逐个转换 -> 合并 -> 保存"""
+async def process_single_file(engine, cache, journal, txt_path):
+    """处理单个TXT文件：切分 -> 并发转换 -> 按序合并 -> 保存"""
     print(f"开始处理: {txt_path.name}")
     try:
         full_text = txt_path.read_text(encoding="utf-8")
@@ -113,74 +250,26 @@ def process_single_file(txt_path):
         return None
 
     # 1. 切分文本
-    chunks = split_text_into_chunks(full_text, MAX_CHUNK_SIZE)
-    print(f"文件 {txt_path.name} 已切分为 {len(chunks)} 个片段。")
-
-    all_tts_data = [] # 存储最终合并的数据
-    
-    # 2. 逐个片段处理
-    for i, chunk_text in enumerate(chunks):
-        if not chunk_text.strip():
-            continue
-            
-        print(f"  > 正在处理片段 {i+1}/{len(chunks)} ({len(chunk_text)}字符)...")
-        
-        # 构造针对该片段的 Prompt
-        # 注意：这里我们告诉 LLM 这只是一个片段
-        user_prompt = (
-            "你是一个严格的格式化器。\n"
-            f"根据下述【规范】将提供的【小说片段】转换为 index-tts v2 有声书 JSON。\n"
-            "注意：这只是小说的一小部分，请只处理这段文字，不要编造开头或结尾，直接输出 JSON 数组。\n\n"
-            "【规范】如下：\n" + SPEC_PROMPT + "\n"
-            "【小说片段】如下：\n" 
-            f"'''\n{chunk_text}\n'''\n\n"
-            "请直接输出 JSON 数组："
-        )
-        
-        chunk_success = False
-        max_chunk_retries = 3 # 每个片段最多重试3次
-        
-        for attempt in range(max_chunk_retries):
-            try:
-                response = client.chat.completions.create(
-                    model=MODEL_NAME,
-                    messages=[{"role": "user", "content": user_prompt}],
-                    temperature=0.2, # 低温度保证格式稳定
-                    max_tokens=1000000, # 给输出留足空间
-                )
-                
-                raw_content = response.choices[0].message.content
-                
-                # 尝试解析
-                parsed_data = extract_json_from_response(raw_content)
-                # print(raw_content)
-                if isinstance(parsed_data, list):
-                    all_tts_data.extend(parsed_data)
-                    chunk_success = True
-                    break # 成功，跳出重试循环
-                else:
-                    print(f"    [警告] 片段 {i+1} 第 {attempt+1} 次解析失败：未找到有效列表。重试中...")
-            
-            except Exception as e:
-                print(f"    [错误] 片段 {i+1} 第 {attempt+1} 次 API 调用出错: {e}")
-                time.sleep(2) # 简单冷却
-        
-        if not chunk_success:
-            print(f"!!! [严重错误] 文件 {txt_path.name} 的片段 {i+1} 处理彻底失败，跳过该片段 !!!")
-            # 记录错误日志，但继续处理下一个片段，以免前功尽弃
-            with open("error_logs.txt", "a", encoding="utf-8") as f:
-                f.write(f"文件: {txt_path} | 片段: {i+1}\n内容:\n{chunk_text}\n\n")
+    with METRICS.stage("chunking", txt_path.name):
+        chunks = list(split_text(full_text))
 
-    # 3. 添加章节标题旁白
-    chapter_title = extract_chapter_title(txt_path.name)
-    if chapter_title:
-        title_entry = {
-            "speaker": "旁白",
-            "content": chapter_title,
-            "emo_vector": [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
-            "delay": 600
-        }
-        all_tts_data.insert(0, title_entry)
+    # 2. 所有片段同时提交，由引擎限制在途请求数；gather 保持片段顺序
+    # （任务继承章节上下文，请求耗时与 token 计入本文件）
+    with chapter_scope(txt_path.name):
+        tasks = [
+            asyncio.ensure_future(process_chunk(engine, cache, journal, txt_path, i, chunk_text))
+            for i, chunk_text in enumerate(chunks)
+            if chunk_text.strip()
+        ]
+    try:
+        chunk_results = await asyncio.gather(*tasks)
+    except BudgetExceeded:
+        # gather 不会取消其余片段，这里立即取消，避免在途请求继续花费
+        for task in tasks:
+            task.cancel()
+        raise
+    with METRICS.stage("merge", txt_path.name):
+        all_tts_data = merge_chunk_results(txt_path, chunk_results)
 
     # 4. 结果校验与保存
     if not all_tts_data:
@@ -200,6 +289,36 @@ def process_single_file(txt_path):
     print(f"已保存到 {json_path}")
     return json_path
 
+def split_text(full_text):
+    """按字符数（或 token 预算）把整章切成片段"""
+    if CHUNK_BY_TOKENS:
+        estimator = chunk_estimator()
+        # 规范 + 外层指令的固定开销
+        prompt_tokens = estimator.count(COMPACT_SPEC_PROMPT if COMPACT_PROTOCOL else SPEC_PROMPT) + 200
+        return iter_token_chunks(full_text, estimator, prompt_tokens)
+    return iter_chunks(full_text, MAX_CHUNK_SIZE)
+
+def merge_chunk_results(txt_path, chunk_results):
+    """按片段顺序合并结果，本地后处理并加上章节标题"""
+    all_tts_data = [item for entries in chunk_results for item in entries] # 存储最终合并的数据
+
+    # 本地执行长段落拆分、标点过滤与旁白零向量（不再依赖提示词）
+    stats = Counter()
+    all_tts_data = postprocess_entries(all_tts_data, stats=stats)
+    print(f"  > {txt_path.name} {describe_stats(stats)}")
+
+    # 3. 添加章节标题旁白
+    chapter_title = extract_chapter_title(txt_path.name)
+    if chapter_title:
+        title_entry = {
+            "speaker": "旁白",
+            "content": chapter_title,
+            "emo_vector": [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+            "delay": 600
+        }
+        all_tts_data.insert(0, title_entry)
+    return all_tts_data
+
 # ========== 任务提示词 (保持不变) ==========
 SPEC_PROMPT = r"""
 请将提供的小说文本转换为专门用于 index-tts v2 引擎的有声书JSON格式。必须严格遵循以下所有规范和原则。
@@ -247,12 +366,8 @@ delay: 整数，该语音结束后的停顿时间（毫秒）。
 抖包袱: [0.3, 0.0, 0.0, 0.0, 0.0, 0.0, 0.2, 0.0] （轻松愉快带惊喜）
 
 三、内容处理与技术要求
-长段落拆分:
-任何超过80个字的段落必须被拆分。
-拆分点应在自然的停顿处（如句号、逗号后），确保每段在60-80字以内。
-重要: 由同一个长段落拆分出的所有片段，其 speaker 和 emo_vector 必须完全相同。
-内容与标点:
-content 字段中只保留 ，、、、。、！、？ 和 ... 这几种标点符号。
+段落与标点:
+同一说话者、同一情感的连续文字合并为一个对象输出，不要拆分长段落，也不必删改标点（程序会统一拆分并整理标点）。
 原文中的所有英文引号 " 必须在JSON中转义为 \"。
 停顿 (delay):
 旁白 delay 通常在 300-800ms。
@@ -275,7 +390,23 @@ JSON
 """
 
 # ========== 主函数：并行处理目录下的所有TXT文件 ==========
-def main():
+def preflight(files, routes):
+    """估算把这些文件的所有片段各请求一次的 token 与费用，返回首选服务商的费用"""
+    texts = [
+        chunk_text
+        for txt_path in files
+        for chunk_text in split_text(txt_path.read_text(encoding="utf-8"))
+        if chunk_text.strip()
+    ]
+    costs = []
+    for endpoint in routes:
+        estimate = estimate_run(texts, build_chunk_request, chunk_estimator(endpoint["provider"]))
+        price = get_price(endpoint["provider"], endpoint["model"])
+        print(estimate.report(endpoint["provider"], price))
+        costs.append(estimate.cost(price))
+    return costs[0]
+
+async def main(resume=False, metrics_path=None, budget=BUDGET_USD, estimate_only=False):
     chapters_dir = Path(config.input_dir)
     if not chapters_dir.exists() or not chapters_dir.is_dir():
         raise FileNotFoundError(f"未找到 {config.input_dir} 目录，请确保拆分后的文件在此目录下。")
@@ -299,20 +430,68 @@ def main():
 
     print(f"找到 {len(files_to_process)} 个需要处理的TXT文件，开始并行处理...")
 
-    # 使用线程池并行处理
+    routes = endpoints()
+    # 预估（不含重试、补请求与缓存命中）
+    expected_cost = preflight(files_to_process, routes)
+    if estimate_only:
+        return
+    if budget > 0 and expected_cost > budget:
+        print(f"[警告] 预估费用 ${expected_cost:.2f} 超过预算 ${budget:.2f}，达到预算后将停止发送新请求")
+
+    # 所有文件共享一个连接池；max_workers 即同时在途的请求数，可设到数百
     max_workers = getattr(config, 'max_workers', 1) 
-    with ThreadPoolExecutor(max_workers=min(len(files_to_process), max_workers)) as executor:
-        futures = [executor.submit(process_single_file, txt_path) for txt_path in files_to_process]
+    cache = ResponseCache(CACHE_PATH, CACHE_MAX_MB * 1024 * 1024) if USE_CACHE else None
+    # 断点日志：每完成一个片段就追加并 fsync，--resume 时只请求缺失的片段
+    journal = ChunkJournal(chapters_dir / JOURNAL_NAME, resume=resume)
+    if resume:
+        print(f"从断点日志恢复 {len(journal)} 个已完成片段")
+    governor = BudgetGovernor(budget, on_event=print)
+    async with build_router(
+        routes, concurrency=max_workers, on_event=print, metrics=METRICS, budget=governor,
+    ) as engine:
+        tasks = [asyncio.ensure_future(process_single_file(engine, cache, journal, txt_path)) for txt_path in files_to_process]
 
-        for future in as_completed(futures):
+        for next_done in asyncio.as_completed(tasks):
             try:
-                result = future.result()
+                result = await next_done
                 if result:
                     print(f"完成: {result.name}")
+            except BudgetExceeded as e:
+                # 达到预算：取消其余文件的全部请求（已完成的片段保留在断点日志中）
+                print(f"{e}，取消其余请求")
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                break
             except Exception as e:
                 print(f"处理失败: {e}")
 
+    journal.close()
+    if cache is not None:
+        print(cache.report())
+        cache.close()
+    if FALLBACK_PROVIDERS:
+        print(engine.report())
+    print(engine.usage.report())
+    print(governor.report())
+    print(METRICS.summary())
+    if metrics_path:
+        METRICS.export(metrics_path)
+        print(f"阶段指标已写入 {metrics_path}")
     print("所有文件处理完成！")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="使用 OpenRouter 将章节 TXT 转换为有声书 JSON")
+    parser.add_argument("--resume", action="store_true",
+                        default=getattr(config, 'resume_generation', False),
+                        help="从断点日志继续，只请求上次未完成的片段")
+    parser.add_argument("--metrics", default=METRICS_PATH, metavar="PATH",
+                        help="把分阶段耗时与 token 指标写入 PATH（.prom 为 Prometheus 文本格式，其余为 JSON）")
+    parser.add_argument("--budget", type=float, default=BUDGET_USD, metavar="USD",
+                        help="费用上限（美元），接近时逐个发送请求，达到后停止；0 表示不限")
+    parser.add_argument("--estimate", action="store_true",
+                        help="只打印片段数、预期 token 与各服务商的预估费用，不发送请求")
+    args = parser.parse_args()
+    asyncio.run(main(
+        resume=args.resume, metrics_path=args.metrics, budget=args.budget, estimate_only=args.estimate,
+    ))
\ No newline at end of file
@@ -13,13 +13,13 @@
 
 import os
 import json
-import re
-import time
+import asyncio
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from openai import OpenAI
 import config
+from gui.core.llm_engine import LLMEngine, is_throttle_error
+from gui.core.metrics import PipelineMetrics, chapter_scope
+from gui.core.pipeline import extract_json_from_response
 
 # ========== 基本配置 ==========
 # 代理（按需注释掉）
@@ -34,53 +34,58 @@ MODEL_NAME = config.qwen_model
 if not API_KEY:
     raise RuntimeError("未检测到 QWEN_API_KEY，请先在 config.py 中设置。")
 
-client = OpenAI(
-    api_key=API_KEY,
-    base_url=BASE_URL,
-)
+# 分阶段耗时与 token 指标：结束时打印汇总；设置路径后导出（.prom 为 Prometheus 文本格式，其余为 JSON）
+METRICS_PATH = getattr(config, 'metrics_path', None)
+METRICS = PipelineMetrics()
 
 # ========== 生成配置 ==========
 # 使用 OpenAI 兼容接口，默认参数
 
 # ========== 读取原文 ==========
-def process_single_file(txt_path):
+async def process_single_file(engine, txt_path):
     """处理单个TXT文件，转换为JSON"""
     print(f"开始处理: {txt_path}")
     text = txt_path.read_text(encoding="utf-8")
 
-    # 构造最终提示
-    user_prompt = (
-        "你是一个严格的格式化器。"
-        "根据下述【规范】将【原文】转换为 index-tts v2 有声书 JSON，必须只输出有效 JSON 数组，不要任何额外说明：\n"
-        "【规范】如下：\n" + SPEC_PROMPT + "\n"
-        "【原文】如下：\n" + text + "\n"
-        "请确保输出是纯净的JSON数组格式。"
-    )
+    # 构造最终提示：指令与规范放在逐字节不变的系统消息里，Qwen 可在文件之间复用前缀缓存
+    messages = [
+        {
+            "role": "system",
+            "content": (
+                "你是一个严格的格式化器。"
+                "根据下述【规范】将用户给出的【原文】转换为 index-tts v2 有声书 JSON，必须只输出有效 JSON 数组，不要任何额外说明：\n"
+                "【规范】如下：\n" + SPEC_PROMPT
+            ),
+        },
+        {
+            "role": "user",
+            "content": "【原文】如下：\n" + text + "\n请确保输出是纯净的JSON数组格式。",
+        },
+    ]
 
     max_retries = 5  # 最大重试次数
     retry_delay = 60  # 初始重试延迟（秒）
 
     for attempt in range(max_retries):
         try:
-            # 调用生成
-            response = client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=[
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.2,
-                max_tokens=32768,  # Qwen Long 支持更长的上下文
-            )
-            raw = response.choices[0].message.content
+            # 调用生成（排队、限流与网络耗时计入本文件）
+            with chapter_scope(txt_path.name):
+                raw = await engine.complete(
+                    messages,
+                    temperature=0.2,
+                    max_tokens=32768,  # Qwen Long 支持更长的上下文
+                )
             break  # 成功则跳出重试循环
 
         except Exception as e:
             error_str = str(e)
-            if "429" in error_str or "quota" in error_str.lower() or "rate limit" in error_str.lower():
+            if is_throttle_error(e) or "quota" in error_str.lower() or "rate limit" in error_str.lower():
                 if attempt < max_retries - 1:
                     print(f"处理失败 (尝试 {attempt + 1}/{max_retries}): {e}")
+                    # 429/5xx 时限流器也会暂停并降低并发，但没有 Retry-After 的 5xx 暂停很短，
+                    # 仍按指数退避等待；限流器的暂停若更长，下次请求会继续等到它结束
                     print(f"等待 {retry_delay} 秒后重试...")
-                    time.sleep(retry_delay)
+                    await asyncio.sleep(retry_delay)
                     retry_delay *= 2  # 指数退避
                     continue
                 else:
@@ -90,20 +95,8 @@ def process_single_file(txt_path):
                 raise e
 
     # 兜底：确保拿到合法 JSON
-    def extract_json(s: str):
-        try:
-            return json.loads(s)
-        except Exception:
-            pass
-        m = re.search(r"(\[.*\]|\{.*\})", s, flags=re.S)
-        if m:
-            try:
-                return json.loads(m.group(1))
-            except Exception:
-                return None
-        return None
-
-    data = extract_json(raw)
+    with METRICS.stage("parse", txt_path.name):
+        data = extract_json_from_response(raw)
     if not isinstance(data, list):
         raise ValueError(f"模型未返回预期的 JSON 数组，请检查 {txt_path} 或重试。")
 
@@ -120,7 +113,9 @@ def process_single_file(txt_path):
             and isinstance(item["delay"], int)
         )
 
-    if not all(minimally_valid(x) for x in data):
+    with METRICS.stage("validate", txt_path.name):
+        all_valid = all(minimally_valid(x) for x in data)
+    if not all_valid:
         print(f"警告：{txt_path} 部分项不完全符合字段/类型要求，请检查结果。")
 
     # 保存结果
@@ -201,7 +196,7 @@ JSON
 """
 
 # ========== 主函数：并行处理目录下的所有TXT文件 ==========
-def main():
+async def main():
     chapters_dir = Path(config.input_dir)
     if not chapters_dir.exists() or not chapters_dir.is_dir():
         raise FileNotFoundError(f"未找到 {config.input_dir} 目录，请确保拆分后的文件在此目录下。")
@@ -225,19 +220,25 @@ def main():
 
     print(f"找到 {len(files_to_process)} 个需要处理的TXT文件，开始并行处理...")
 
-    # 使用线程池并行处理
+    # 所有文件共享一个连接池；max_workers 即同时在途的请求数
     max_workers = getattr(config, 'max_workers', 6)  # 默认6个并发，避免API限制
-    with ThreadPoolExecutor(max_workers=min(len(files_to_process), max_workers)) as executor:
-        futures = [executor.submit(process_single_file, txt_path) for txt_path in files_to_process]
+    async with LLMEngine(API_KEY, BASE_URL, MODEL_NAME, concurrency=max_workers, provider="qwen",
+                         metrics=METRICS) as engine:
+        tasks = [asyncio.ensure_future(process_single_file(engine, txt_path)) for txt_path in files_to_process]
 
-        for future in as_completed(futures):
+        for next_done in asyncio.as_completed(tasks):
             try:
-                result = future.result()
+                result = await next_done
                 print(f"完成: {result}")
             except Exception as e:
                 print(f"处理失败: {e}")
 
+    print(engine.usage.report())
+    print(METRICS.summary())
+    if METRICS_PATH:
+        METRICS.export(METRICS_PATH)
+        print(f"阶段指标已写入 {METRICS_PATH}")
     print("所有文件处理完成！")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file